@@ -1,5 +1,2 @@
-try:
-    from .tamper_monitor import start_tamper_monitor
-    start_tamper_monitor()
-except Exception:
-    pass
+# The binlog tamper monitor (tamper_monitor.py) is started by the
+# tamper_monitor app for web processes, or by `manage.py run_monitors`.
@@ -0,0 +1,20 @@
+"""
+ASGI config for Online_Voting_System project.
+
+The voter pages (dashboard, election detail, vote page), the JSON API and the
+alert counter are async views, so under ASGI a request waiting on the
+database or cache does not hold a worker thread. Background monitors are not
+started in ASGI workers; run them once, next to the web server:
+
+    uvicorn Online_Voting_System.asgi:application --workers 4
+    python manage.py run_monitors
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('VOTING_MONITORS_IN_WORKERS', '0')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Online_Voting_System.settings')
+
+application = get_asgi_application()
@@ -4,7 +4,6 @@ import time
 import traceback
 from django.conf import settings
 from django.utils import timezone
-from django.db import connection
 
 # binlog reader
 from pymysqlreplication import BinLogStreamReader
@@ -23,41 +22,26 @@ MYSQL_CONN = {
 SERVER_ID = 9999            # pick unique id
 DB_NAME = "votingdb"        # change if your DB name is different
 TABLE_NAME = "votes"
+ALERT_CHUNK_SIZE = 50       # recipients per outgoing alert email
 # ==========================================
 
 def get_running_voter_emails():
     """
     Get distinct emails of voters who are registered (is_approved=1)
     for elections whose status is 'running'.
+
+    Served from the in-memory recipient cache in voting_site.recipients,
+    so no join runs against the (possibly tampered / overloaded) DB here.
     """
-    emails = set()
     try:
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT DISTINCT v.email
-                FROM election_voters ev
-                JOIN voters v ON ev.voter_id = v.voter_id
-                JOIN elections e ON ev.election_id = e.election_id
-                WHERE e.status = 'running' AND ev.is_approved = 1
-            """)
-            rows = cursor.fetchall()
-            for r in rows:
-                if r and r[0]:
-                    emails.add(r[0])
+        from voting_site.recipients import running_recipient_emails
+        return running_recipient_emails()
     except Exception as e:
         print("Error fetching running voter emails:", e)
-    return list(emails)
-
-
-def notify_running_voters(reason_text):
-    emails = get_running_voter_emails()
-    if not emails:
-        print("No running-election voter emails found to notify.")
-        return
+        return []
 
-    subject = "⚠️ Tampering Alert in Voting System"
-    message = f"Dear voter,\n\nA possible vote tampering has been detected in a running election.\n\nDetails: {reason_text}\n\nPlease contact the administrator immediately.\n\n— Online Voting System Security"
 
+def _send_alert_chunk(subject, message, emails):
     # Prefer Django send_mail (if configured), but prefer our direct SMTP fallback for reliability
     try:
         # Try Django's send_mail first for consistency with settings
@@ -75,10 +59,65 @@ def notify_running_voters(reason_text):
             print("❌ Fallback SMTP failed:", info)
 
 
+def notify_running_voters(reason_text):
+    try:
+        from voting_site.recipients import iter_recipient_chunks
+        chunks = iter_recipient_chunks(ALERT_CHUNK_SIZE)
+    except Exception as e:
+        print("Error fetching running voter emails:", e)
+        return
+
+    subject = "⚠️ Tampering Alert in Voting System"
+    message = f"Dear voter,\n\nA possible vote tampering has been detected in a running election.\n\nDetails: {reason_text}\n\nPlease contact the administrator immediately.\n\n— Online Voting System Security"
+
+    sent_any = False
+    for emails in chunks:
+        _send_alert_chunk(subject, message, emails)
+        sent_any = True
+    if not sent_any:
+        print("No running-election voter emails found to notify.")
+
+
+def _archived_ids(binlog_event):
+    """
+    vote_ids in a DELETE event that voting_site.archive moved, unchanged,
+    to votes_archive: expected deletions, not tampering.
+    """
+    if not isinstance(binlog_event, DeleteRowsEvent):
+        return set()
+    try:
+        from voting_site.archive import archived_vote_ids
+        return archived_vote_ids([row.get("values", {}) for row in binlog_event.rows])
+    except Exception as e:
+        print("Error checking archived votes:", e)
+        return set()
+
+
+def handle_binlog_event(binlog_event):
+    # binlog_event.schema, binlog_event.table available
+    archived = _archived_ids(binlog_event)
+    for row in binlog_event.rows:
+        # row structure differs for UpdateRowsEvent vs DeleteRowsEvent
+        if isinstance(binlog_event, UpdateRowsEvent):
+            before = row.get("before_values")
+            after = row.get("after_values")
+            reason = f"UPDATE on {DB_NAME}.{TABLE_NAME} at {timezone.now()}: before={before} after={after}"
+            print("⚠️ Detected UPDATE:", reason)
+            notify_running_voters(reason)
+        elif isinstance(binlog_event, DeleteRowsEvent):
+            values = row.get("values")
+            if values.get("vote_id") in archived:
+                continue
+            reason = f"DELETE on {DB_NAME}.{TABLE_NAME} at {timezone.now()}: values={values}"
+            print("⚠️ Detected DELETE:", reason)
+            notify_running_voters(reason)
+
+
 def monitor():
     """
     Main loop — listen to binlog and detect UPDATE/DELETE on votes.
     """
+    from tamper_monitor.profiling import profile_iteration
     print("🔒 Tamper detection started... Monitoring votes table")
     while True:
         try:
@@ -93,20 +132,9 @@ def monitor():
             )
 
             for binlog_event in stream:
-                # binlog_event.schema, binlog_event.table available
-                for row in binlog_event.rows:
-                    # row structure differs for UpdateRowsEvent vs DeleteRowsEvent
-                    if isinstance(binlog_event, UpdateRowsEvent):
-                        before = row.get("before_values")
-                        after = row.get("after_values")
-                        reason = f"UPDATE on {DB_NAME}.{TABLE_NAME} at {timezone.now()}: before={before} after={after}"
-                        print("⚠️ Detected UPDATE:", reason)
-                        notify_running_voters(reason)
-                    elif isinstance(binlog_event, DeleteRowsEvent):
-                        values = row.get("values")
-                        reason = f"DELETE on {DB_NAME}.{TABLE_NAME} at {timezone.now()}: values={values}"
-                        print("⚠️ Detected DELETE:", reason)
-                        notify_running_voters(reason)
+                # Profiled only while the admin's sampling profiler is on
+                with profile_iteration('monitor'):
+                    handle_binlog_event(binlog_event)
 
         except Exception as e:
             print("Tamper monitor exception:", e)
@@ -114,6 +142,11 @@ def monitor():
             time.sleep(5)  # wait before reconnecting
 
 
+_monitor_thread = None
+
 def start_tamper_monitor():
-    t = threading.Thread(target=monitor, daemon=True)
-    t.start()
+    global _monitor_thread
+    if _monitor_thread and _monitor_thread.is_alive():
+        return
+    _monitor_thread = threading.Thread(target=monitor, daemon=True)
+    _monitor_thread.start()
@@ -0,0 +1,23 @@
+"""
+pytest-benchmark suite for chain verification and the detector's hashing
+and diffing, at the smallest size only. Use `manage.py benchmark_integrity`
+for the 10k / 100k / 1M sweep, peak memory and baseline comparison.
+"""
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+pytest.importorskip("pytest_django")
+
+from voting_site import integrity_benchmark as suite  # noqa: E402
+
+SIZE = 10_000
+
+
+@pytest.mark.parametrize("workload", suite.WORKLOADS)
+def test_integrity_workload(benchmark, workload):
+    fn = suite._workload(workload, SIZE, seed=0)
+    benchmark(fn)
+
+
+def test_synthetic_chain_verifies_clean():
+    assert suite.verify_chain(suite.synthetic_chain(1000), suite.SYNTHETIC_ELECTION) == []
@@ -0,0 +1,47 @@
+"""
+pytest-benchmark suite for the read side of the opening-hour rush, served
+through the WSGI handler (8 threads) and the ASGI handler (one event loop).
+
+Same requirements as test_vote_casting.py. A database across the network is
+simulated by adding DB_LATENCY_MS to every query; the ASGI rows should keep
+their throughput as that grows, the WSGI rows should not. For a readable
+report use `manage.py benchmark_votes --reads`.
+"""
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+pytest.importorskip("pytest_django")
+
+from voting_site import benchmark as harness  # noqa: E402
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+VOTERS = 100
+CONCURRENCY = 50
+THREADS = 8
+POLLS = 5
+
+
+@pytest.mark.parametrize("db_latency_ms", [0, 20])
+@pytest.mark.parametrize("mode", ["wsgi", "asgi"])
+def test_read_rush(benchmark, mode, db_latency_ms):
+    run = harness.seed(voters=VOTERS, positions=5, candidates=4)
+    results = {}
+
+    def replay():
+        recorder, wall = harness.drive_reads(
+            run, mode=mode, concurrency=CONCURRENCY, threads=THREADS, polls=POLLS, db_latency_ms=db_latency_ms,
+        )
+        results["report"] = harness.summarize(recorder, wall)
+
+    benchmark.pedantic(replay, rounds=3, iterations=1)
+    harness.cleanup(run)
+
+    report = results["report"]
+    requests = sum(stats["requests"] for stats in report["views"].values())
+    benchmark.extra_info.update({
+        "requests_per_s": round(requests / report["wall_seconds"], 2),
+        "views": report["views"],
+    })
+    assert requests == VOTERS * (3 + POLLS)
+    assert not any(stats["errors"] for stats in report["views"].values())
@@ -0,0 +1,54 @@
+"""
+pytest-benchmark suite for vote casting.
+
+Needs pytest-django and pytest-benchmark, and runs against whatever database
+the settings point at (SQLite or a local MySQL). On SQLite the concurrent
+rounds need OPTIONS = {'transaction_mode': 'IMMEDIATE'} and are skipped
+without it. E.g.:
+
+    DJANGO_SETTINGS_MODULE=Online_Voting_System.settings \
+        pytest benchmarks/ --benchmark-json=bench.json
+
+For ad-hoc runs with a readable report use `manage.py benchmark_votes`.
+"""
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+pytest.importorskip("pytest_django")
+
+from voting_site import benchmark as harness  # noqa: E402
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+VOTERS = 50
+POSITIONS = 5
+CANDIDATES = 4
+
+
+def _fresh_run():
+    # Each voter can only vote once, so every round needs its own seed.
+    return (harness.seed(voters=VOTERS, positions=POSITIONS, candidates=CANDIDATES),), {}
+
+
+@pytest.mark.parametrize("concurrency", [1, 4, 16])
+def test_vote_sessions(benchmark, concurrency):
+    if concurrency > 1 and harness.sqlite_deferred_writes():
+        pytest.skip("concurrent votes on SQLite need transaction_mode IMMEDIATE")
+    results = {}
+
+    def cast(run):
+        recorder, wall = harness.drive(run, concurrency=concurrency)
+        results["report"] = harness.summarize(recorder, wall)
+        results["run"] = run
+
+    benchmark.pedantic(cast, setup=_fresh_run, rounds=3, iterations=1)
+
+    report = results["report"]
+    benchmark.extra_info.update({
+        "votes_per_s": report["views"]["vote_candidate"]["throughput_per_s"],
+        "views": report["views"],
+        "chain": harness.check_chain(),
+    })
+    harness.cleanup(results["run"])
+    assert report["views"]["vote_candidate"]["requests"] == VOTERS * POSITIONS
+    assert not report["views"]["vote_candidate"]["errors"]
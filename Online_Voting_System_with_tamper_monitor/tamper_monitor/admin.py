@@ -1,8 +1,30 @@
 from django.contrib import admin
-from .models import TamperAlert
+from django.utils.html import format_html
+from . import profiling
+from .models import TamperAlert, ProfilerConfig
 
 @admin.register(TamperAlert)
 class TamperAlertAdmin(admin.ModelAdmin):
     list_display = ('created_at','summary','acknowledged')
     list_filter = ('acknowledged',)
     search_fields = ('summary','detail')
+
+@admin.register(ProfilerConfig)
+class ProfilerConfigAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'request_sample_rate', 'url_names', 'loop_sample_rate', 'updated_at')
+    readonly_fields = ('updated_at', 'hot_functions')
+    fields = ('enabled', 'request_sample_rate', 'url_names', 'loop_sample_rate', 'ring_size', 'updated_at', 'hot_functions')
+
+    @admin.display(description="Hot functions (all profiles on disk)")
+    def hot_functions(self, obj):
+        return format_html('<pre style="white-space: pre; overflow-x: auto">{}</pre>', profiling.format_summary(top=30))
+
+    def has_add_permission(self, request):
+        return not ProfilerConfig.objects.exists()
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        profiling.reload()  # this process at once; others within profiling.REFRESH_SECONDS
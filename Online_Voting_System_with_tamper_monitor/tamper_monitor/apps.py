@@ -5,10 +5,13 @@ class TamperMonitorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
 
     def ready(self):
+        from . import signals  # noqa: F401
         try:
+            from voting_site.monitors import start_binlog_monitor, start_in_web_process
             from .detector import start_monitor_thread
             import sys
-            if len(sys.argv) > 1 and sys.argv[1] in ('runserver', 'gunicorn', 'uwsgi'):
+            if start_in_web_process(sys.argv):
                 start_monitor_thread()
+                start_binlog_monitor()
         except Exception:
             pass
@@ -7,8 +7,11 @@ import time
 import difflib
 import logging
 import glob
+import tempfile
 import mysql.connector
 from datetime import datetime
+from .profiling import profile_iteration
+from .state_store import DetectorStateStore
 
 logger = logging.getLogger(__name__)
 
@@ -23,22 +26,34 @@ CONFIG = {
         'password': '',  # your MySQL password
         'database': 'votingdb',  # your DB name
     },
-    'poll_interval': 20,  # check every 20 seconds
-    'state_file': os.path.join(os.path.dirname(__file__), 'detector_state.json'),
+    # Optional read replica for the full-table snapshots (same keys as 'mysql').
+    # The binlog is always read from the primary.
+    'replica_mysql': None,
+    # Wake-ups: an incremental check runs when a probe sees a change or
+    # something wakes the detector (vote/voter saves, binlog writes), at most
+    # every min_check_interval. Idle, the probe interval doubles from
+    # probe_min_interval up to probe_max_interval, and a full check runs
+    # every full_check_interval in case a change slipped past the probes.
+    'probe_min_interval': 0.25,
+    'probe_max_interval': 20,
+    'min_check_interval': 0.5,
+    'full_check_interval': 300,
+    'binlog_dir': '/var/lib/mysql',
+    'state_db': os.path.join(os.path.dirname(__file__), 'detector_state.sqlite3'),
+    'state_file': os.path.join(os.path.dirname(__file__), 'detector_state.json'),  # legacy, imported once
+    'chunk_rows': 1000,  # snapshot rows per stored digest
+    'binlog_block': 1024 * 1024,  # binlog bytes per stored digest
     'alerts_dir': os.path.join(os.path.dirname(__file__), 'monitoring_alerts'),
 }
 
 # ---------------------- Helper Functions ----------------------
 
-def get_latest_binlog_path():
-    """Automatically find the latest MySQL binary log file."""
-    binlog_dir = '/var/lib/mysql'
-    files = sorted(glob.glob(os.path.join(binlog_dir, 'mysql-bin.*')))
+def _latest_binlog_file():
+    binlog_dir = CONFIG['binlog_dir']
+    files = sorted(glob.glob(os.path.join(binlog_dir, 'mysql-bin.[0-9]*')))
     if not files:
-        raise FileNotFoundError("No MySQL binary log files found in /var/lib/mysql/")
-    latest = files[-1]
-    print(f"[INFO] Using binary log file: {os.path.basename(latest)}")
-    return latest
+        raise FileNotFoundError(f"No MySQL binary log files found in {binlog_dir}/")
+    return files[-1]
 
 def sha256_of_bytes(b: bytes) -> str:
     h = hashlib.sha256()
@@ -48,16 +63,28 @@ def sha256_of_bytes(b: bytes) -> str:
 def ensure_dirs():
     os.makedirs(CONFIG['alerts_dir'], exist_ok=True)
 
-def load_state():
+def load_legacy_state():
+    """Read the old detector_state.json, if it is still around."""
     try:
         with open(CONFIG['state_file'], 'r') as f:
             return json.load(f)
     except Exception:
         return {}
 
-def save_state(state):
-    with open(CONFIG['state_file'], 'w') as f:
-        json.dump(state, f, indent=2)
+def open_state_store():
+    """Open the SQLite state store, importing detector_state.json the first time."""
+    store = DetectorStateStore(CONFIG['state_db'])
+    if store.is_empty():
+        legacy = load_legacy_state()
+        if legacy:
+            chunks = chunk_digests(legacy['last_snapshot']) if legacy.get('last_snapshot') else {}
+            store.save({
+                'last_hash': legacy.get('last_hash'),
+                'last_binlog_hash': legacy.get('last_binlog_hash'),
+                'last_checked': legacy.get('last_checked'),
+            }, chunks)
+            print(f"[INFO] Imported legacy detector state from {CONFIG['state_file']}")
+    return store
 
 def serialize_snapshot(obj):
     """Convert datetime objects in snapshot to strings for JSON serialization."""
@@ -72,132 +99,452 @@ def serialize_snapshot(obj):
 
 # ---------------------- Database Snapshot ----------------------
 
-def get_votes_snapshot():
-    """Fetch the current votes and voter data snapshot."""
-    conn = mysql.connector.connect(**CONFIG['mysql'])
-    cursor = conn.cursor(dictionary=True)
+SNAPSHOT_QUERIES = {
+    # Votes of sealed (archived) elections are covered by their ElectionArchive instead
+    'votes': (
+        "SELECT v.* FROM votes v WHERE v.vote_id >= %s AND NOT EXISTS ("
+        "SELECT 1 FROM votes_archive a JOIN election_archives e ON e.election_id = a.election_id "
+        "WHERE a.vote_id = v.vote_id) ORDER BY v.vote_id;"
+    ),
+    'voters': "SELECT * FROM voters WHERE voter_id >= %s ORDER BY voter_id;",
+}
+
+# Primary key of each snapshot table, used to group rows into chunks
+SNAPSHOT_KEYS = {'votes': 'vote_id', 'voters': 'voter_id'}
 
-    snapshot = {}
-    cursor.execute("SELECT * FROM votes;")
-    snapshot['votes'] = cursor.fetchall()
+def _connect():
+    return mysql.connector.connect(**(CONFIG['replica_mysql'] or CONFIG['mysql']))
 
-    cursor.execute("SELECT * FROM voters;")
-    snapshot['voters'] = cursor.fetchall()
+def _count_below(cursor, table, first_id):
+    cursor.execute(f"SELECT COUNT(*) AS n FROM {table} WHERE {SNAPSHOT_KEYS[table]} < %s;", (first_id,))
+    return cursor.fetchone()['n']
 
+def read_snapshot(marks=None):
+    """
+    Rows of the snapshot tables: all of them, or with `marks` (see table_marks)
+    only those from each table's mark boundary on.
+
+    Returns (snapshot, below, new_marks): `below` counts the rows under the
+    old boundaries, so the caller can tell whether anything there was added
+    or deleted; `new_marks` are the marks for the next incremental read.
+    """
+    conn = _connect()
+    cursor = conn.cursor(dictionary=True)
+    snapshot, below, new_marks = {}, {}, {}
+    for table, query in SNAPSHOT_QUERIES.items():
+        mark = (marks or {}).get(table)
+        first_id = mark['boundary'] if mark else 0
+        cursor.execute(query, (first_id,))
+        rows = cursor.fetchall()
+        if mark:
+            below[table] = _count_below(cursor, table, first_id)
+        top = rows[-1][SNAPSHOT_KEYS[table]] if rows else (mark['max'] if mark else 0)
+        boundary = top // CONFIG['chunk_rows'] * CONFIG['chunk_rows']
+        count = below[table] if mark and boundary == first_id else _count_below(cursor, table, boundary)
+        new_marks[table] = {'max': top, 'boundary': boundary, 'below': count}
+        snapshot[table] = rows
     conn.close()
+    return serialize_snapshot(snapshot), below, new_marks
 
-    # Convert datetime objects to strings
-    snapshot_serializable = serialize_snapshot(snapshot)
-    return snapshot_serializable
+def get_votes_snapshot():
+    """Fetch the current votes and voter data snapshot."""
+    return read_snapshot()[0]
+
+def get_new_archives(after_archive_id):
+    """(latest archive_id, vote_ids archived since after_archive_id) from election_archives."""
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(MAX(archive_id), 0) FROM election_archives;")
+    latest = cursor.fetchone()[0]
+    vote_ids = set()
+    if latest > after_archive_id:
+        cursor.execute(
+            "SELECT a.vote_id FROM votes_archive a JOIN election_archives e ON e.election_id = a.election_id "
+            "WHERE e.archive_id > %s;",
+            (after_archive_id,),
+        )
+        vote_ids = {vote_id for (vote_id,) in cursor.fetchall()}
+    conn.close()
+    return latest, vote_ids
 
 def snapshot_hash(snapshot):
     return hashlib.sha256(json.dumps(snapshot, sort_keys=True).encode()).hexdigest()
 
+def block_digest(block):
+    return hashlib.sha256(json.dumps(block, sort_keys=True).encode()).digest()
+
+def chunk_rows_of(table, rows, chunk_rows=None):
+    """{chunk_id: rows} over blocks of `chunk_rows` primary-key values."""
+    chunk_rows = chunk_rows or CONFIG['chunk_rows']
+    key = SNAPSHOT_KEYS.get(table)
+    blocks = {}
+    for i, row in enumerate(rows):
+        chunk_id = row[key] // chunk_rows if key and key in row else i // chunk_rows
+        blocks.setdefault(chunk_id, []).append(row)
+    return blocks
+
+def chunk_digests(snapshot, chunk_rows=None):
+    """{(table, chunk_id): sha256 digest} over blocks of `chunk_rows` primary-key values."""
+    return {
+        (table, chunk_id): block_digest(block)
+        for table, rows in snapshot.items()
+        for chunk_id, block in chunk_rows_of(table, rows, chunk_rows).items()
+    }
+
+def unexpected_chunks(table, blocks, prev_chunks, prev_max, first_chunk=0, prev_rows=None, archived_ids=()):
+    """
+    Chunks of `table` that differ from their stored digest in a way that an
+    insert cannot explain: a chunk may only gain rows above prev_max (the
+    highest id seen last check) or, when its previous rows are in
+    `prev_rows`, lose votes that were archived. Chunks below first_chunk
+    were not read and are left out. Returns (changed, removed, unexpected).
+    """
+    key = SNAPSHOT_KEYS[table]
+    prev_rows = prev_rows or {}
+    changed, unexpected = {}, []
+    for chunk_id, block in blocks.items():
+        digest = block_digest(block)
+        stored = prev_chunks.get((table, chunk_id))
+        if digest == stored:
+            continue
+        changed[(table, chunk_id)] = digest
+        old = [row for row in block if row[key] <= prev_max]
+        if (block_digest(old) if old else None) == stored:
+            continue  # only new rows
+        before = prev_rows.get((table, chunk_id))
+        if before is not None and [r for r in before if r.get('vote_id') not in archived_ids] == old:
+            continue  # archived votes left, maybe new rows came
+        unexpected.append((table, chunk_id))
+    removed = [k for k in prev_chunks if k[0] == table and k[1] >= first_chunk and k[1] not in blocks]
+    for k in removed:
+        before = prev_rows.get(k)
+        if before is None or any(r.get('vote_id') not in archived_ids for r in before):
+            unexpected.append(k)
+    return changed, removed, unexpected
+
+def describe_chunk_changes(changed, removed):
+    """Fallback alert detail when the previous snapshot is not in memory (e.g. after a restart)."""
+    lines = [f"Changed chunk: {table} rows {chunk_id * CONFIG['chunk_rows']}-{(chunk_id + 1) * CONFIG['chunk_rows'] - 1}"
+             for table, chunk_id in sorted(changed)]
+    lines += [f"Removed chunk: {table} rows {chunk_id * CONFIG['chunk_rows']}-{(chunk_id + 1) * CONFIG['chunk_rows'] - 1}"
+              for table, chunk_id in sorted(removed)]
+    return '\n'.join(lines)
+
+def diff_snapshots(prev_snapshot, new_snapshot):
+    """Unified diff of two snapshots, as written into alert.txt."""
+    diff = difflib.unified_diff(
+        json.dumps(prev_snapshot, indent=2).splitlines(),
+        json.dumps(new_snapshot, indent=2).splitlines(),
+        fromfile='previous_db',
+        tofile='current_db',
+        lineterm=''
+    )
+    return '\n'.join(diff)
+
+def diff_chunks(keys, prev_rows, blocks):
+    """Alert detail for the given chunks: a diff of each one whose previous rows are in memory."""
+    parts, unknown = [], []
+    for table, chunk_id in sorted(keys):
+        before = prev_rows.get((table, chunk_id))
+        if before is None:
+            unknown.append((table, chunk_id))
+        else:
+            after = blocks.get(table, {}).get(chunk_id, [])
+            parts.append(diff_snapshots({table: before}, {table: after}))
+    if unknown:
+        parts.append(describe_chunk_changes(unknown, []))
+    return '\n'.join(parts)
+
 # ---------------------- Binary Log ----------------------
 
-def dump_binlog_local():
-    """Read the latest binary log file contents."""
-    path = get_latest_binlog_path()
+BINLOG_TABLE = 'binlog'  # chunks table: one digest per binlog_block bytes
+
+def check_binlog(prev, prev_blocks, full=False):
+    """
+    Hash the latest binary log against the previous check. `prev` is the
+    stored {'path', 'size', 'tail'} (digest of the bytes after the last full
+    block), `prev_blocks` {block_no: digest}. Only bytes from the last full
+    block on are read unless `full`; appended bytes are expected, a changed
+    prefix or a shorter file is not.
+
+    Returns (problem or None, meta, new_prev, changed blocks, removed blocks).
+    """
+    path = _latest_binlog_file()
+    block_size = CONFIG['binlog_block']
+    changed, removed = {}, []
+    if prev and prev['path'] != path:
+        # Rotated: the old file is closed, start over on the new one
+        removed, prev, prev_blocks = list(prev_blocks), None, {}
+    old_size = prev['size'] if prev else 0
+    problem = None
+    tail = hashlib.sha256().hexdigest()
+    block_no = 0 if full or not prev else old_size // block_size
     with open(path, 'rb') as f:
-        b = f.read()
+        f.seek(block_no * block_size)
+        while True:
+            data = f.read(block_size)
+            if not data:
+                break
+            digest = hashlib.sha256(data).digest()
+            seen = min(old_size - block_no * block_size, block_size)  # bytes hashed before
+            if seen == block_size and prev_blocks.get(block_no) != digest:
+                problem = f"block {block_no} (bytes {block_no * block_size}-{(block_no + 1) * block_size - 1}) changed"
+            elif 0 < seen < block_size and sha256_of_bytes(data[:seen]) != prev['tail']:
+                problem = f"bytes {block_no * block_size}-{old_size - 1} changed"
+            if len(data) == block_size:
+                if prev_blocks.get(block_no) != digest:
+                    changed[block_no] = digest
+            else:
+                tail = sha256_of_bytes(data)
+            block_no += 1
+        size = os.fstat(f.fileno()).st_size
+    if size < old_size:
+        problem = f"file shrank from {old_size} to {size} bytes"
+    removed = [n for n in removed if n not in changed] + [n for n in prev_blocks if n >= block_no]
     meta = {
         'path': path,
-        'size': len(b),
+        'size': size,
         'dump_time': datetime.utcnow().isoformat() + 'Z'
     }
-    return b, meta
+    return problem, meta, {'path': path, 'size': size, 'tail': tail}, changed, removed
 
 # ---------------------- Alert Writer ----------------------
 
 def write_alert(reason, meta, diff_text=""):
-    ts = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
-    base = os.path.join(CONFIG['alerts_dir'], ts)
-    os.makedirs(base, exist_ok=True)
+    ts = datetime.utcnow().strftime('%Y%m%dT%H%M%S.%fZ')
+    # mkdtemp adds a random suffix, so alerts raised together never share a directory
+    base = tempfile.mkdtemp(prefix=f'{ts}-', dir=CONFIG['alerts_dir'])
     with open(os.path.join(base, 'alert.txt'), 'w') as f:
         f.write(f"[{ts}] ALERT: {reason}\n\n")
         f.write(diff_text)
     with open(os.path.join(base, 'meta.json'), 'w') as f:
         json.dump(meta, f, indent=2)
     print(f"\n🚨 [ALERT] {reason}\nDetails saved in: {base}\n")
+    return base
+
+# ---------------------- Change Probes ----------------------
+
+PROBE_TABLES = ('votes', 'voters')
+
+def probe_database():
+    """
+    Cheap fingerprint of the snapshot tables: MAX(id) and COUNT(*) catch
+    inserts and deletes, InnoDB's in-memory UPDATE_TIME catches updates.
+    """
+    conn = mysql.connector.connect(**(CONFIG['replica_mysql'] or CONFIG['mysql']))
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT (SELECT COALESCE(MAX(vote_id), 0) FROM votes), (SELECT COUNT(*) FROM votes), "
+        "(SELECT COALESCE(MAX(voter_id), 0) FROM voters), (SELECT COUNT(*) FROM voters);"
+    )
+    counts = cursor.fetchone()
+    cursor.execute(
+        "SELECT table_name, update_time FROM information_schema.tables "
+        "WHERE table_schema = DATABASE() AND table_name IN (%s, %s) ORDER BY table_name;",
+        PROBE_TABLES,
+    )
+    update_times = cursor.fetchall()
+    conn.close()
+    return tuple(counts), tuple(update_times)
+
+def probe_binlog():
+    """(file, size, mtime) of the latest binary log; every write to the database appends to it."""
+    try:
+        path = _latest_binlog_file()
+        st = os.stat(path)
+    except OSError:
+        return None
+    return path, st.st_size, st.st_mtime_ns
+
+def probe():
+    return probe_database(), probe_binlog()
+
+# ---------------------- Wake-ups ----------------------
+
+_wake_event = threading.Event()
+
+
+def wake_detector():
+    """Ask the detector to check now (something was written)."""
+    _wake_event.set()
+
+
+def watch_binlog_dir(stop_event):
+    """
+    Wake the detector whenever a file in the binlog directory is written,
+    created or removed. Needs the optional `inotify_simple` package (Linux);
+    without it the probes notice binlog growth instead.
+    """
+    try:
+        from inotify_simple import INotify, flags
+    except ImportError:
+        print("[INFO] inotify_simple not installed; binlog changes are found by polling.")
+        return
+    try:
+        inotify = INotify()
+        inotify.add_watch(CONFIG['binlog_dir'], flags.MODIFY | flags.CREATE | flags.DELETE | flags.MOVED_TO)
+    except OSError as e:
+        print(f"[INFO] Not watching {CONFIG['binlog_dir']}: {e}")
+        return
+    with inotify:
+        while not stop_event.is_set():
+            events = inotify.read(timeout=1000)  # ms, so stop_event is seen promptly
+            if any(event.name.startswith('mysql-bin.') for event in events):
+                wake_detector()
 
 # ---------------------- Detector Loop ----------------------
 
+def load_state(store):
+    """In-memory detector state, seeded from the store."""
+    digests = store.chunk_digests()
+    binlog = store.get('binlog')
+    return {
+        'prev_rows': {},  # {(table, chunk_id): rows} of the last check, only kept in memory
+        'prev_chunks': {k: d for k, d in digests.items() if k[0] != BINLOG_TABLE},
+        'binlog_blocks': {chunk_id: d for (tbl, chunk_id), d in digests.items() if tbl == BINLOG_TABLE},
+        'binlog': json.loads(binlog) if binlog else None,
+        'marks': json.loads(store.get('table_marks') or '{}'),
+        'last_archive_id': int(store.get('last_archive_id', 0)),
+    }
+
 def run_detector_loop(stop_event):
     ensure_dirs()
-    state = load_state()
-    prev_snapshot = state.get('last_snapshot')
-    prev_hash = state.get('last_hash')
-    prev_binlog_hash = state.get('last_binlog_hash')
+    store = open_state_store()
+    state = load_state(store)
 
     print("[INFO] Binary Log Tamper Detector started...")
 
+    interval = CONFIG['probe_min_interval']
+    last_probe = None
+    last_check = None
+    last_full = None
     while not stop_event.is_set():
+        woken = _wake_event.wait(interval)
+        if stop_event.is_set():
+            break
+        _wake_event.clear()
         try:
-            # --- Step 1: Check database state ---
-            new_snapshot = get_votes_snapshot()
-            new_hash = snapshot_hash(new_snapshot)
-
-            # --- Step 2: Check binary log changes ---
-            binlog_bytes, meta = dump_binlog_local()
-            new_binlog_hash = sha256_of_bytes(binlog_bytes)
-
-            # --- Step 3: Compare hashes ---
-            if prev_hash and new_hash != prev_hash:
-                # Detect unauthorized DB changes (not vote insert)
-                diff = difflib.unified_diff(
-                    json.dumps(prev_snapshot, indent=2).splitlines(),
-                    json.dumps(new_snapshot, indent=2).splitlines(),
-                    fromfile='previous_db',
-                    tofile='current_db',
-                    lineterm=''
-                )
-                diff_text = '\n'.join(diff)
-                write_alert("Unauthorized database table modification detected!", meta, diff_text)
-            
-            if prev_binlog_hash and new_binlog_hash != prev_binlog_hash:
-                write_alert("Binary log file content changed unexpectedly!", meta)
-
-            # --- Step 4: Save new state ---
-            state = {
-                'last_snapshot': new_snapshot,
-                'last_hash': new_hash,
-                'last_binlog_hash': new_binlog_hash,
-                'last_checked': datetime.utcnow().isoformat() + 'Z',
-            }
-            save_state(state)
-
-            prev_snapshot, prev_hash, prev_binlog_hash = new_snapshot, new_hash, new_binlog_hash
-
+            current = probe()
+            now = time.monotonic()
+            due = last_full is None or now - last_full >= CONFIG['full_check_interval']
+            if woken or due or current != last_probe:
+                # Coalesce bursts of writes into one check per min_check_interval
+                if last_check is not None and now - last_check < CONFIG['min_check_interval']:
+                    stop_event.wait(CONFIG['min_check_interval'] - (now - last_check))
+                    current = probe()
+                with profile_iteration('detector'):
+                    full = check_once(store, state, full=due)
+                last_probe, last_check = current, time.monotonic()
+                if full:
+                    last_full = last_check
+                interval = CONFIG['probe_min_interval']
+            else:
+                interval = min(interval * 2, CONFIG['probe_max_interval'])
         except Exception as e:
             print(f"[ERROR] {e}")
+            interval = min(interval * 2, CONFIG['probe_max_interval'])
 
-        # Sleep until next poll
-        for _ in range(CONFIG['poll_interval']):
-            if stop_event.is_set():
-                break
-            time.sleep(1)
-
+    store.close()
     print("[INFO] Binary Log Tamper Detector stopped.")
 
+
+def check_once(store, state, full=True):
+    """
+    Compare the snapshot tables and the binlog with the previous check and
+    alert on anything an insert or an archival cannot explain.
+
+    An incremental check (full=False) reads only each table's rows from the
+    chunk holding its highest id on, and the binlog from its last full block
+    on. It becomes a full check when there are no marks yet, elections were
+    archived, or the row count below the read boundary moved (a delete or an
+    insert with an old id). Returns whether the check was full.
+    """
+    new_archive_id, archived_ids = get_new_archives(state['last_archive_id'])
+    marks = state['marks']
+    full = full or not marks or bool(archived_ids)
+    snapshot, below, new_marks = read_snapshot(None if full else marks)
+    if not full and any(below[t] != marks[t]['below'] for t in below):
+        full = True
+        snapshot, below, new_marks = read_snapshot()
+
+    # --- Step 1: Check database state, chunk by chunk ---
+    prev_rows = state['prev_rows']
+    blocks, changed, removed, unexpected = {}, {}, [], []
+    for table, rows in snapshot.items():
+        first_chunk = 0 if full else marks[table]['boundary'] // CONFIG['chunk_rows']
+        # Without marks (first run, legacy state) every stored row counts as old
+        prev_max = marks[table]['max'] if table in marks else float('inf')
+        blocks[table] = chunk_rows_of(table, rows)
+        c, r, u = unexpected_chunks(
+            table, blocks[table], state['prev_chunks'], prev_max, first_chunk, prev_rows, archived_ids,
+        )
+        changed.update(c)
+        removed += r
+        unexpected += u
+
+    if archived_ids:
+        print(f"[INFO] {len(archived_ids)} votes left the snapshot by archival.")
+
+    # --- Step 2: Check binary log changes ---
+    problem, meta, new_binlog, binlog_changed, binlog_removed = check_binlog(
+        state['binlog'], state['binlog_blocks'], full,
+    )
+
+    if unexpected:
+        write_alert("Unauthorized database table modification detected!", meta,
+                    diff_chunks(unexpected, prev_rows, blocks))
+
+    if problem and state['binlog']:
+        write_alert("Binary log file content changed unexpectedly!", meta, problem)
+
+    # --- Step 3: Save new state (only what changed) ---
+    store.save(
+        {
+            'table_marks': json.dumps(new_marks),
+            'binlog': json.dumps(new_binlog),
+            'last_checked': datetime.utcnow().isoformat() + 'Z',
+            'last_archive_id': new_archive_id,
+        },
+        {**changed, **{(BINLOG_TABLE, n): d for n, d in binlog_changed.items()}},
+        removed + [(BINLOG_TABLE, n) for n in binlog_removed],
+    )
+
+    for key in removed:
+        state['prev_chunks'].pop(key, None)
+        prev_rows.pop(key, None)
+    state['prev_chunks'].update(changed)
+    for table, table_blocks in blocks.items():
+        prev_rows.update({(table, chunk_id): block for chunk_id, block in table_blocks.items()})
+    for n in binlog_removed:
+        state['binlog_blocks'].pop(n, None)
+    state['binlog_blocks'].update(binlog_changed)
+    state.update(marks=new_marks, binlog=new_binlog, last_archive_id=new_archive_id)
+    return full
+
 # ---------------------- Thread Management ----------------------
 
 _monitor_thread = None
+_watch_thread = None
 _stop_event = None
 
 def start_monitor_thread():
-    global _monitor_thread, _stop_event
+    global _monitor_thread, _watch_thread, _stop_event
     if _monitor_thread and _monitor_thread.is_alive():
         return
     _stop_event = threading.Event()
     _monitor_thread = threading.Thread(target=run_detector_loop, args=(_stop_event,), daemon=True)
     _monitor_thread.start()
+    _watch_thread = threading.Thread(target=watch_binlog_dir, args=(_stop_event,), daemon=True)
+    _watch_thread.start()
 
 def stop_monitor_thread():
     global _stop_event, _monitor_thread
     if _stop_event:
         _stop_event.set()
-    if _monitor_thread:
-        _monitor_thread.join(timeout=5)
+        wake_detector()
+    for thread in (_monitor_thread, _watch_thread):
+        if thread:
+            thread.join(timeout=5)
 
 # ---------------------- Main ----------------------
 
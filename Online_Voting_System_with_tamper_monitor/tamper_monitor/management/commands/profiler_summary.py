@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from tamper_monitor import profiling
+
+
+class Command(BaseCommand):
+    help = "Print the hottest functions across the sampling profiler's saved profiles."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=profiling.KINDS, help="Only request, detector or monitor profiles.")
+        parser.add_argument('--top', type=int, default=25)
+        parser.add_argument('--sort', choices=('tottime', 'cumtime'), default='tottime',
+                            help="Own time (default) or time including callees.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(profiling.format_summary(options['kind'], options['top'], options['sort']))
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:00
+
+import django.core.validators
+import tamper_monitor.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tamper_monitor', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfilerConfig',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('enabled', models.BooleanField(default=False)),
+                ('request_sample_rate', models.FloatField(default=0.01, help_text='Fraction of requests to profile (0-1).', validators=[django.core.validators.MinValueValidator(0.0), django.core.validators.MaxValueValidator(1.0)])),
+                ('url_names', models.CharField(blank=True, help_text="Comma-separated URL names to profile, each optionally name:rate (e.g. 'vote_candidate:0.5, dashboard'). Empty profiles every URL.", max_length=500, validators=[tamper_monitor.models.validate_url_rates])),
+                ('loop_sample_rate', models.FloatField(default=0.1, help_text='Fraction of detector and binlog monitor iterations to profile (0-1).', validators=[django.core.validators.MinValueValidator(0.0), django.core.validators.MaxValueValidator(1.0)])),
+                ('ring_size', models.PositiveIntegerField(default=200, help_text='Profiles kept on disk; the oldest go first.', validators=[django.core.validators.MinValueValidator(1)])),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'profiler',
+                'verbose_name_plural': 'profiler',
+            },
+        ),
+    ]
@@ -1,3 +1,5 @@
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 
 class TamperAlert(models.Model):
@@ -8,3 +10,53 @@ class TamperAlert(models.Model):
 
     def __str__(self):
         return f"{self.created_at.isoformat()} - {self.summary}"
+
+
+def validate_url_rates(value):
+    """'name, name:rate, ...' with rates between 0 and 1."""
+    for entry in value.split(','):
+        name, _, rate = entry.strip().partition(':')
+        if not rate.strip():
+            continue
+        try:
+            ok = 0.0 <= float(rate) <= 1.0
+        except ValueError:
+            ok = False
+        if not ok:
+            raise ValidationError(f"'{entry.strip()}': the rate after ':' must be a number from 0 to 1.")
+
+
+class ProfilerConfig(models.Model):
+    """
+    Switch for the sampling profiler (tamper_monitor.profiling). A single
+    row, edited in the admin; processes pick up changes within a few seconds.
+    """
+    enabled = models.BooleanField(default=False)
+    request_sample_rate = models.FloatField(
+        default=0.01, validators=[MinValueValidator(0.0), MaxValueValidator(1.0)],
+        help_text="Fraction of requests to profile (0-1).",
+    )
+    url_names = models.CharField(
+        max_length=500, blank=True, validators=[validate_url_rates],
+        help_text="Comma-separated URL names to profile, each optionally name:rate "
+                  "(e.g. 'vote_candidate:0.5, dashboard'). Empty profiles every URL.",
+    )
+    loop_sample_rate = models.FloatField(
+        default=0.1, validators=[MinValueValidator(0.0), MaxValueValidator(1.0)],
+        help_text="Fraction of detector and binlog monitor iterations to profile (0-1).",
+    )
+    ring_size = models.PositiveIntegerField(
+        default=200, validators=[MinValueValidator(1)], help_text="Profiles kept on disk; the oldest go first.",
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "profiler"
+        verbose_name_plural = "profiler"
+
+    def save(self, *args, **kwargs):
+        self.pk = 1  # one row
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"Profiler ({'on' if self.enabled else 'off'})"
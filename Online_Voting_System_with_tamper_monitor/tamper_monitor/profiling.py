@@ -0,0 +1,264 @@
+import asyncio
+import cProfile
+import glob
+import os
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.urls import Resolver404, resolve
+from .models import ProfilerConfig
+
+# On-demand sampling profiler, switched on and tuned in the admin
+# (tamper_monitor.ProfilerConfig):
+#
+#   - ProfilingMiddleware profiles a fraction of requests, per URL name
+#   - profile_iteration('detector' / 'monitor') wraps one iteration of the
+#     table/binlog detector and of the binlog monitor (incl. mail fan-out)
+#
+# Each profile is a cProfile dump in PROFILER_DIR:
+#
+#   <ns timestamp>-<kind>-<label>.prof
+#
+# kept as a ring of the newest ProfilerConfig.ring_size files. The admin page
+# and `manage.py profiler_summary` merge them into a hot-function table.
+#
+# Switched off, the cost is a clock comparison per request or iteration: the
+# config row is re-read at most every REFRESH_SECONDS per process. cProfile
+# hooks one thread, so for async views it sees the event loop's side of the
+# request (and whatever else the loop runs meanwhile), not the sync_to_async
+# worker threads.
+
+REFRESH_SECONDS = 5
+KINDS = ('request', 'detector', 'monitor')
+
+def profiler_dir():
+    return getattr(settings, 'PROFILER_DIR', os.path.join(os.path.dirname(__file__), 'profiles'))
+
+# ---------------------- Config ----------------------
+
+class _Snapshot:
+    """The parts of ProfilerConfig the hot paths need, parsed once."""
+    __slots__ = ('enabled', 'request_rate', 'url_rates', 'loop_rate', 'ring_size')
+
+    def __init__(self, config=None):
+        self.enabled = bool(config and config.enabled)
+        self.request_rate = config.request_sample_rate if config else 0.0
+        self.loop_rate = config.loop_sample_rate if config else 0.0
+        self.ring_size = config.ring_size if config else 0
+        self.url_rates = {}  # url name -> rate; empty means every URL at request_rate
+        for entry in (config.url_names if config else '').split(','):
+            name, _, rate = entry.strip().partition(':')
+            if name:
+                self.url_rates[name] = float(rate) if rate.strip() else self.request_rate
+
+    def request_rate_for(self, url_name):
+        if not self.url_rates:
+            return self.request_rate
+        return self.url_rates.get(url_name, 0.0)
+
+
+_snapshot = _Snapshot()
+_loaded_at = None
+_local = threading.local()  # .active: this thread is already being profiled
+
+
+def _stale():
+    return _loaded_at is None or time.monotonic() - _loaded_at >= REFRESH_SECONDS
+
+
+def _store(config):
+    global _snapshot, _loaded_at
+    _snapshot, _loaded_at = _Snapshot(config), time.monotonic()
+    return _snapshot
+
+
+def current():
+    if _stale():
+        try:
+            return _store(ProfilerConfig.objects.filter(pk=1).first())
+        except Exception as e:  # table missing before migrate, DB down: stay off
+            print(f"[ERROR] Profiler config unavailable: {e}")
+            return _store(None)
+    return _snapshot
+
+
+async def acurrent():
+    if _stale():
+        try:
+            return _store(await ProfilerConfig.objects.filter(pk=1).afirst())
+        except Exception as e:
+            print(f"[ERROR] Profiler config unavailable: {e}")
+            return _store(None)
+    return _snapshot
+
+
+def reload():
+    """Drop the cached config (the admin calls this after a change)."""
+    global _loaded_at
+    _loaded_at = None
+
+# ---------------------- Ring ----------------------
+
+def _safe(label):
+    return ''.join(c if c.isalnum() or c in '_.' else '_' for c in label)[:80] or '-'
+
+
+def save_profile(profiler, kind, label, ring_size):
+    """Write one profile and delete the oldest beyond ring_size."""
+    directory = profiler_dir()
+    os.makedirs(directory, exist_ok=True)
+    profiler.dump_stats(os.path.join(directory, f"{time.time_ns():020d}-{kind}-{_safe(label)}.prof"))
+    paths = profile_paths()
+    for path in paths[:max(0, len(paths) - ring_size)]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # another process trimmed it first
+
+
+def profile_paths(kind=None):
+    """Profiles on disk, oldest first."""
+    return sorted(glob.glob(os.path.join(profiler_dir(), f"*-{kind or '*'}-*.prof")))
+
+# ---------------------- Hooks ----------------------
+
+def _start():
+    if getattr(_local, 'active', False):
+        return None  # nested or overlapping (async) work on this thread
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:  # Python 3.12+: another thread's profile is running
+        return None
+    _local.active = True
+    return profiler
+
+
+def _stop(profiler):
+    profiler.disable()
+    _local.active = False
+
+
+def _save(profiler, kind, label, ring_size):
+    try:
+        save_profile(profiler, kind, label, ring_size)
+    except OSError as e:
+        print(f"[ERROR] Could not save profile: {e}")
+
+
+def _finish(profiler, kind, label, ring_size):
+    _stop(profiler)
+    _save(profiler, kind, label, ring_size)
+
+
+@contextmanager
+def profile_iteration(kind, label=''):
+    """Profile this block for a loop_sample_rate fraction of calls while the profiler is on."""
+    config = current()
+    if not config.enabled or random.random() >= config.loop_rate:
+        yield
+        return
+    profiler = _start()
+    try:
+        yield
+    finally:
+        if profiler:
+            _finish(profiler, kind, label or kind, config.ring_size)
+
+
+def _url_name(request):
+    try:
+        return resolve(request.path_info).url_name or ''
+    except Resolver404:
+        return ''
+
+
+class ProfilingMiddleware:
+    """Profiles a sampled fraction of requests while ProfilerConfig.enabled is set."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _sampled(self, config, request):
+        if not config.enabled:
+            return None
+        url_name = _url_name(request)
+        if random.random() >= config.request_rate_for(url_name):
+            return None
+        return url_name or 'unnamed'
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        config = current()
+        label = self._sampled(config, request)
+        profiler = label and _start()
+        if not profiler:
+            return self.get_response(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _finish(profiler, 'request', label, config.ring_size)
+
+    async def __acall__(self, request):
+        config = await acurrent()
+        label = self._sampled(config, request)
+        profiler = label and _start()
+        if not profiler:
+            return await self.get_response(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            _stop(profiler)
+            # Dumping, listing and trimming the ring is file IO: keep it off the event loop
+            await asyncio.to_thread(_save, profiler, 'request', label, config.ring_size)
+
+# ---------------------- Summary ----------------------
+
+def hot_functions(kind=None, top=25, sort='tottime'):
+    """
+    Merge the profiles on disk into the `top` functions by own time
+    (sort='tottime') or time including callees ('cumtime'). Returns
+    (profile count, [{function, calls, tottime, cumtime}]).
+    """
+    paths = profile_paths(kind)
+    stats = None
+    for path in paths:
+        try:
+            if stats is None:
+                stats = pstats.Stats(path)
+            else:
+                stats.add(path)
+        except (OSError, EOFError, ValueError, TypeError):
+            continue  # trimmed or half-written by another process
+    if stats is None:
+        return 0, []
+    column = 2 if sort == 'tottime' else 3
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][column], reverse=True)[:top]
+    return len(paths), [
+        {
+            'function': pstats.func_std_string(func),
+            'calls': nc,
+            'tottime': tt,
+            'cumtime': ct,
+        }
+        for func, (cc, nc, tt, ct, callers) in rows
+    ]
+
+
+def format_summary(kind=None, top=25, sort='tottime'):
+    count, rows = hot_functions(kind, top, sort)
+    if not rows:
+        return "No profiles recorded yet."
+    lines = [f"{count} profiles{f' ({kind})' if kind else ''}, top {len(rows)} by {sort}:", "",
+             f"{'calls':>10} {'tottime':>10} {'cumtime':>10}  function"]
+    lines += [f"{r['calls']:>10} {r['tottime']:>10.4f} {r['cumtime']:>10.4f}  {r['function']}" for r in rows]
+    return '\n'.join(lines)
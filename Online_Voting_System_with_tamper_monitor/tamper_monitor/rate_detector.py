@@ -0,0 +1,219 @@
+import math
+import threading
+import time
+import logging
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+# Vote-rate spike detection. Counts, baselines and alert cooldowns live in a
+# Django cache (VOTE_RATE_CACHE, default 'default'), so with a shared backend
+# (Memcached, Redis) every web worker adds to and checks one set of counters.
+# The backend needs an atomic incr; with the default per-process LocMemCache
+# each process only sees its own votes. Keys of idle elections and positions
+# expire after 'idle_expiry' seconds and restart their warm-up when votes
+# come back.
+
+# ---------------------- Configuration ----------------------
+
+RATE_CONFIG = {
+    # Sliding windows in seconds, each with the minimum count worth alerting on
+    'windows': {10: 30, 60: 120, 300: 400},
+    'alpha': 0.2,          # EWMA weight of the most recent completed window
+    'spike_factor': 4.0,   # alert when a window holds this many times its baseline
+    'warmup_windows': 3,   # completed windows before a baseline is trusted
+    'cooldown': 300,       # seconds between alerts for the same key and window
+    'idle_expiry': 3600,   # seconds without votes before a key's state is dropped
+}
+BUCKETS_PER_WINDOW = 10   # sliding counts move in steps of window/10 seconds
+
+def cache_alias():
+    return getattr(settings, 'VOTE_RATE_CACHE', 'default')
+
+# ---------------------- Window keys ----------------------
+
+class Window:
+    """
+    Cache keys of one sliding window of one election or position. The current
+    count is the sum of the last BUCKETS_PER_WINDOW buckets; the baseline is
+    folded in from the tracked key's shared totals (see Totals).
+    """
+    __slots__ = ('prefix', 'size', 'step', 'span')
+
+    def __init__(self, key, size):
+        self.prefix = f"vote-rate:{key[0]}:{key[1]}:{size}"
+        self.size = size
+        self.step = max(1, size // BUCKETS_PER_WINDOW)
+        self.span = size // self.step  # buckets per window
+
+    def bucket(self, sec):
+        return sec // self.step
+
+    def index(self, sec):
+        return self.bucket(sec) // self.span
+
+    def bucket_key(self, bucket):
+        return f"{self.prefix}:b:{bucket}"
+
+    def sliding_keys(self, sec):
+        last = self.bucket(sec)
+        return [self.bucket_key(b) for b in range(last - self.span + 1, last + 1)]
+
+    @property
+    def state_key(self):
+        return f"{self.prefix}:state"  # (window index, ewma, completed windows)
+
+    def roll_key(self, index):
+        return f"{self.prefix}:rolled:{index}"
+
+    @property
+    def alert_key(self):
+        return f"{self.prefix}:alerted"
+
+
+class Totals:
+    """
+    Tumbling-window totals of one election or position, shared by all its
+    windows: one counter per 'grain' seconds (the gcd of the window sizes),
+    summed into a window's total when it is folded into the baseline.
+    """
+    __slots__ = ('prefix', 'grain')
+
+    def __init__(self, key, sizes):
+        self.prefix = f"vote-rate:{key[0]}:{key[1]}:total"
+        self.grain = math.gcd(*sizes)
+
+    def key(self, sec):
+        return f"{self.prefix}:{sec // self.grain}"
+
+    def window_keys(self, w, index):
+        first = index * w.size // self.grain
+        return [f"{self.prefix}:{g}" for g in range(first, first + w.size // self.grain)]
+
+# ---------------------- Detector ----------------------
+
+class VoteRateDetector:
+    """
+    Per-election and per-position vote-rate tracking. Cache entries per
+    tracked key are bounded by the windows, however many votes it gets.
+
+    A vote costs one cache round trip per window (its bucket) plus one per
+    tracked key (its total) and a single get_many; rolls and alerts add more
+    only once per window.
+    """
+
+    def __init__(self, config=None, on_spike=None, cache=None):
+        self.config = dict(RATE_CONFIG, **(config or {}))
+        self.on_spike = on_spike or raise_rate_alert
+        self.cache = cache if cache is not None else caches[cache_alias()]
+
+    def _incr(self, key, n, timeout):
+        """Add n to a counter and return its new value."""
+        try:
+            return self.cache.incr(key, n)
+        except ValueError:  # not there yet (or expired)
+            if self.cache.add(key, n, timeout):
+                return n
+            return self.cache.incr(key, n)  # another process created it first
+
+    def observe(self, election_id, position_id, ts=None, n=1):
+        """Record n votes at unix time ts (default now). Returns the spikes raised."""
+        sec = int(ts if ts is not None else time.time())
+        sizes = list(self.config['windows'])
+        keys = (('election', election_id), ('position', position_id))
+        windows = [(key, Window(key, size)) for key in keys for size in sizes]
+        totals = {key: Totals(key, sizes) for key in keys}
+
+        # States and the earlier buckets of every window, in one round trip
+        wanted = [k for _, w in windows for k in [w.state_key] + w.sliding_keys(sec)[:-1]]
+        values = self.cache.get_many(wanted)
+
+        timeout = max(self.config['idle_expiry'], 2 * max(sizes))
+        for t in totals.values():
+            self._incr(t.key(sec), n, timeout)
+        spikes = []
+        for key, w in windows:
+            current = self._incr(w.bucket_key(w.bucket(sec)), n, w.size + 2 * w.step)
+            count = current + sum(values.get(k, 0) for k in w.sliding_keys(sec)[:-1])
+            state = values.get(w.state_key)
+            if state is None or state[0] < w.index(sec):
+                state = self._roll(w, totals[key], sec)
+            spike = self._check(key, w, count, state, sec)
+            if spike:
+                spikes.append(spike)
+        for spike in spikes:
+            try:
+                self.on_spike(spike)
+            except Exception as e:
+                print(f"[ERROR] Vote-rate alert failed: {e}")
+        return spikes
+
+    def _roll(self, w, totals, sec):
+        """Fold finished tumbling windows into the baseline; one process per window does it."""
+        index = w.index(sec)
+        if not self.cache.add(w.roll_key(index), 1, 2 * w.size):
+            return self.cache.get(w.state_key)
+        state = self.cache.get(w.state_key)
+        if state is None:
+            state = (index, 0.0, 0)
+        last, ewma, completed = state
+        elapsed = index - last
+        if elapsed > 0:
+            alpha = self.config['alpha']
+            total = sum(self.cache.get_many(totals.window_keys(w, last)).values())
+            ewma = alpha * total + (1 - alpha) * ewma
+            # Windows with no events at all only decay the baseline.
+            ewma *= (1 - alpha) ** (elapsed - 1)
+            completed += elapsed
+        if elapsed >= 0:
+            state = (index, ewma, completed)
+            self.cache.set(w.state_key, state, self.config['idle_expiry'])
+        return state
+
+    def _check(self, key, w, count, state, sec):
+        if state is None:
+            return None
+        _, ewma, completed = state
+        if count < self.config['windows'][w.size] or completed < self.config['warmup_windows']:
+            return None
+        if count < self.config['spike_factor'] * max(ewma, 1.0):
+            return None
+        # Only the first process to see the spike raises it
+        if not self.cache.add(w.alert_key, sec, self.config['cooldown']):
+            return None
+        return {
+            'scope': key[0],
+            'id': key[1],
+            'window': w.size,
+            'count': count,
+            'baseline': round(ewma, 2),
+            'at': sec,
+        }
+
+
+def raise_rate_alert(spike):
+    from .models import TamperAlert
+    summary = (
+        f"Vote-rate spike on {spike['scope']} {spike['id']}: "
+        f"{spike['count']} votes in {spike['window']}s (baseline {spike['baseline']})"
+    )
+    print(f"\n🚨 [ALERT] {summary}\n")
+    TamperAlert.objects.create(
+        summary=summary[:255],
+        detail=(
+            "Possible ballot stuffing: INSERT rate into votes exceeded "
+            f"{RATE_CONFIG['spike_factor']}x its exponentially weighted baseline.\n\n{spike}"
+        ),
+    )
+
+
+_detector = None
+_detector_lock = threading.Lock()
+
+def get_rate_detector():
+    global _detector
+    with _detector_lock:
+        if _detector is None:
+            _detector = VoteRateDetector()
+        return _detector
@@ -0,0 +1,50 @@
+from collections import Counter
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from voting_site.models import Vote, Voter
+from voting_site.signals import votes_bulk_created
+from .rate_detector import get_rate_detector
+
+
+def _observe(votes):
+    detector = get_rate_detector()
+    # One cache round per (election, position, second), not per vote
+    seconds = Counter((v.election_id, v.position_id, int(v.timestamp.timestamp())) for v in votes)
+    for (election_id, position_id, sec), n in seconds.items():
+        detector.observe(election_id, position_id, sec, n)
+
+
+@receiver(post_save, sender=Vote)
+def vote_inserted(sender, instance, created, **kwargs):
+    if not created:
+        return
+    # Count only votes that actually commit
+    transaction.on_commit(lambda: _observe([instance]))
+
+
+@receiver(votes_bulk_created)
+def votes_bulk_inserted(sender, votes, **kwargs):
+    _observe(votes)
+
+
+def _wake_detector():
+    try:
+        from .detector import wake_detector
+    except ImportError:  # mysql-connector missing: no detector runs in this process
+        return
+    wake_detector()
+
+
+@receiver(post_save, sender=Vote)
+@receiver(post_delete, sender=Vote)
+@receiver(post_save, sender=Voter)
+@receiver(post_delete, sender=Voter)
+def snapshot_table_written(sender, **kwargs):
+    # The detector compares snapshots, so wake it once the write is visible
+    transaction.on_commit(_wake_detector)
+
+
+@receiver(votes_bulk_created)
+def snapshot_votes_bulk_written(sender, votes, **kwargs):
+    _wake_detector()
@@ -0,0 +1,78 @@
+import sqlite3
+import threading
+
+# Detector state kept in a small SQLite file instead of a JSON rewrite per poll.
+#
+#   meta(key, value)                 - table_marks, binlog, last_checked ...
+#   chunks(tbl, chunk_id, digest)    - one digest per block of snapshot rows,
+#                                      and per binlog_block bytes (tbl 'binlog')
+#
+# Each save is one transaction that touches only the meta values and the
+# chunks whose digest changed, so a poll writes a few hundred bytes rather
+# than the whole snapshot. WAL + synchronous=FULL makes every save atomic and
+# durable: a crash leaves either the old state or the new one, never half.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    tbl      TEXT    NOT NULL,
+    chunk_id INTEGER NOT NULL,
+    digest   BLOB    NOT NULL,
+    PRIMARY KEY (tbl, chunk_id)
+) WITHOUT ROWID;
+"""
+
+
+class DetectorStateStore:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def get(self, key, default=None):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def is_empty(self):
+        return self._conn.execute("SELECT 1 FROM meta LIMIT 1").fetchone() is None
+
+    def chunk_digests(self):
+        """{(table, chunk_id): digest_bytes} for every stored chunk."""
+        return {
+            (tbl, chunk_id): bytes(digest)
+            for tbl, chunk_id, digest in self._conn.execute("SELECT tbl, chunk_id, digest FROM chunks")
+        }
+
+    def save(self, values, changed_chunks=None, removed_chunks=()):
+        """
+        Atomically store meta `values` and apply chunk changes:
+        changed_chunks {(table, chunk_id): digest}, removed_chunks [(table, chunk_id)].
+        """
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                    [(k, None if v is None else str(v)) for k, v in values.items()],
+                )
+                if changed_chunks:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO chunks (tbl, chunk_id, digest) VALUES (?, ?, ?)",
+                        [(tbl, chunk_id, digest) for (tbl, chunk_id), digest in changed_chunks.items()],
+                    )
+                if removed_chunks:
+                    conn.executemany("DELETE FROM chunks WHERE tbl = ? AND chunk_id = ?", list(removed_chunks))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
@@ -0,0 +1,297 @@
+import io
+import itertools
+import os
+import sqlite3
+import tempfile
+import time
+from contextlib import ExitStack
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.core.cache.backends import locmem
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from . import detector, profiling
+from .models import ProfilerConfig
+from .profiling import ProfilingMiddleware
+from .rate_detector import VoteRateDetector, Window
+from .state_store import DetectorStateStore
+
+# ---------------------- Vote-rate detector ----------------------
+
+_cache_names = itertools.count()
+
+
+class VoteRateDetectorTests(SimpleTestCase):
+    config = {'windows': {10: 5}, 'warmup_windows': 3, 'cooldown': 300, 'idle_expiry': 600}
+
+    def setUp(self):
+        # LocMemCache instances with one name share storage, like workers on one Memcached
+        self.cache_name = f"vote-rate-tests-{next(_cache_names)}"
+        self.spikes = []
+        self.detector = self.worker()
+
+    def worker(self):
+        cache = LocMemCache(self.cache_name, {'OPTIONS': {'MAX_ENTRIES': 100000}})
+        return VoteRateDetector(self.config, on_spike=self.spikes.append, cache=cache)
+
+    def steady(self, per_window, windows=5, detectors=None):
+        """per_window votes at the start of each 10s window, for `windows` windows."""
+        detectors = detectors or [self.detector]
+        for i in range(windows):
+            for n in range(per_window):
+                detectors[n % len(detectors)].observe(1, 11, ts=i * 10)
+        return windows * 10
+
+    def test_burst_after_warmup_alerts_once(self):
+        now = self.steady(1)
+        self.detector.observe(1, 11, ts=now, n=40)
+        self.assertEqual({(s['scope'], s['id']) for s in self.spikes}, {('election', 1), ('position', 11)})
+        self.assertEqual(self.spikes[0]['count'], 40)
+
+        self.detector.observe(1, 11, ts=now + 1, n=40)
+        self.assertEqual(len(self.spikes), 2, "cooldown should hold back repeat alerts")
+
+    def test_no_alert_during_warmup(self):
+        self.detector.observe(1, 11, ts=0, n=100)
+        self.detector.observe(1, 11, ts=10, n=100)
+        self.assertEqual(self.spikes, [])
+
+    def test_rise_within_spike_factor_is_quiet(self):
+        now = self.steady(10)
+        self.detector.observe(1, 11, ts=now, n=20)
+        self.assertEqual(self.spikes, [])
+
+    def test_workers_share_counts(self):
+        workers = [self.detector, self.worker()]
+        now = self.steady(2, detectors=workers)
+        for i in range(40):
+            workers[i % 2].observe(1, 11, ts=now)
+        # One alert per key, raised on the 6th vote: 3 seen by each worker
+        self.assertEqual(len(self.spikes), 2)
+        self.assertEqual(self.spikes[0]['count'], 6)
+
+    def test_steady_vote_costs_one_round_trip_per_window_and_key(self):
+        now = self.steady(1)
+        self.detector.observe(1, 11, ts=now)
+        cache = self.detector.cache
+        calls = {}
+        with ExitStack() as stack:
+            # (not get: LocMemCache's get_many is a loop over it)
+            for name in ('get_many', 'set', 'set_many', 'add', 'incr'):
+                calls[name] = stack.enter_context(mock.patch.object(cache, name, wraps=getattr(cache, name)))
+            self.detector.observe(1, 11, ts=now)
+        # 2 keys x 1 window: a bucket each, a total each, one get_many
+        self.assertEqual(calls['incr'].call_count, 4)
+        self.assertEqual(calls['get_many'].call_count, 1)
+        self.assertEqual(sum(c.call_count for c in calls.values()), 5)
+
+    def test_idle_keys_expire_and_warm_up_again(self):
+        now = self.steady(1)
+        state_key = Window(('election', 1), 10).state_key
+        self.assertIsNotNone(self.detector.cache.get(state_key))
+
+        later = time.time() + self.config['idle_expiry'] + 1
+        with mock.patch.object(locmem, 'time', mock.Mock(time=lambda: later)):
+            self.assertIsNone(self.detector.cache.get(state_key))
+            self.detector.observe(1, 11, ts=now + 3600, n=40)
+        self.assertEqual(self.spikes, [])
+
+# ---------------------- Table/binlog detector ----------------------
+
+class FakeMySQL:
+    """SQLite standing in for the detector's MySQL connections (%s placeholders, dict rows)."""
+
+    def __init__(self):
+        self.db = sqlite3.connect(':memory:')
+        self.db.executescript(
+            "CREATE TABLE votes (vote_id INTEGER PRIMARY KEY, candidate_id INTEGER);"
+            "CREATE TABLE voters (voter_id INTEGER PRIMARY KEY, email TEXT);"
+            "CREATE TABLE votes_archive (vote_id INTEGER PRIMARY KEY, election_id INTEGER);"
+            "CREATE TABLE election_archives (archive_id INTEGER PRIMARY KEY, election_id INTEGER);"
+        )
+        self.queries = []
+
+    def __call__(self, **kwargs):
+        return self
+
+    def close(self):
+        pass
+
+    def cursor(self, dictionary=False):
+        fake = self
+
+        class Cursor:
+            def execute(self, sql, params=()):
+                fake.queries.append((sql, tuple(params)))
+                self.cur = fake.db.execute(sql.replace('%s', '?'), params)
+
+            def _row(self, row):
+                return dict(zip([d[0] for d in self.cur.description], row)) if dictionary else row
+
+            def fetchone(self):
+                return self._row(self.cur.fetchone())
+
+            def fetchall(self):
+                return [self._row(row) for row in self.cur.fetchall()]
+
+        return Cursor()
+
+
+class DetectorCheckTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.mysql = FakeMySQL()
+        self.binlog = os.path.join(tmp.name, 'mysql-bin.000001')
+        with open(self.binlog, 'wb') as f:
+            f.write(b'x' * 100)
+        config = dict(detector.CONFIG, binlog_dir=tmp.name, alerts_dir=os.path.join(tmp.name, 'alerts'),
+                      chunk_rows=10, binlog_block=64)
+        for patcher in (mock.patch.dict(detector.CONFIG, config),
+                        mock.patch.object(detector.mysql.connector, 'connect', self.mysql)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        os.makedirs(config['alerts_dir'])
+        self.store = DetectorStateStore(os.path.join(tmp.name, 'state.sqlite3'))
+        self.addCleanup(self.store.close)
+        self.insert_votes(range(1, 26))
+        self.mysql.db.execute("INSERT INTO voters VALUES (1, 'a@example.com')")
+        self.state = detector.load_state(self.store)
+        self.check(full=True)
+
+    def insert_votes(self, ids):
+        self.mysql.db.executemany("INSERT INTO votes VALUES (?, 7)", [(i,) for i in ids])
+
+    def check(self, full=False):
+        with mock.patch.object(detector, 'write_alert') as write_alert:
+            self.was_full = detector.check_once(self.store, self.state, full=full)
+        return [c.args[0] for c in write_alert.call_args_list]
+
+    def test_inserts_are_checked_incrementally_without_alerts(self):
+        self.insert_votes(range(26, 40))
+        del self.mysql.queries[:]
+        self.assertEqual(self.check(), [])
+        self.assertFalse(self.was_full)
+        # Only rows from the chunk holding the last seen id (25) on were read
+        self.assertIn((detector.SNAPSHOT_QUERIES['votes'], (20,)), self.mysql.queries)
+        self.assertEqual(self.state['marks']['votes'], {'max': 39, 'boundary': 30, 'below': 29})
+
+    def test_edited_vote_alerts(self):
+        self.mysql.db.execute("UPDATE votes SET candidate_id = 8 WHERE vote_id = 21")
+        self.assertEqual(self.check(), ["Unauthorized database table modification detected!"])
+
+    def test_edit_below_the_tail_is_found_by_the_full_check(self):
+        self.mysql.db.execute("UPDATE votes SET candidate_id = 8 WHERE vote_id = 3")
+        self.assertEqual(self.check(), [])
+        self.assertEqual(self.check(full=True), ["Unauthorized database table modification detected!"])
+
+    def test_deleted_vote_escalates_to_a_full_check(self):
+        self.mysql.db.execute("DELETE FROM votes WHERE vote_id = 3")
+        self.assertEqual(self.check(), ["Unauthorized database table modification detected!"])
+        self.assertTrue(self.was_full)
+
+    def test_archived_votes_leave_quietly(self):
+        self.check()  # keeps every chunk's rows in memory
+        self.mysql.db.executemany("INSERT INTO votes_archive VALUES (?, 1)", [(i,) for i in range(5, 15)])
+        self.mysql.db.execute("INSERT INTO election_archives VALUES (1, 1)")
+        self.assertEqual(self.check(), [])
+        self.assertTrue(self.was_full)
+
+    def test_binlog_append_is_quiet_and_rewrite_alerts(self):
+        with open(self.binlog, 'ab') as f:
+            f.write(b'y' * 100)
+        self.assertEqual(self.check(), [])
+        with open(self.binlog, 'r+b') as f:
+            f.seek(10)
+            f.write(b'z')
+        with open(self.binlog, 'ab') as f:
+            f.write(b'y')
+        self.assertEqual(self.check(), [])  # incremental: block 0 was not read again
+        self.assertEqual(self.check(full=True), ["Binary log file content changed unexpectedly!"])
+
+    def test_binlog_tail_rewrite_alerts_incrementally(self):
+        with open(self.binlog, 'r+b') as f:
+            f.seek(70)
+            f.write(b'z')
+        self.assertEqual(self.check(), ["Binary log file content changed unexpectedly!"])
+
+    def test_state_survives_a_restart(self):
+        self.insert_votes(range(26, 30))
+        self.check()
+        self.state = detector.load_state(self.store)
+        self.insert_votes(range(30, 35))
+        self.assertEqual(self.check(), [])
+        self.mysql.db.execute("UPDATE votes SET candidate_id = 8 WHERE vote_id = 31")
+        self.assertEqual(self.check(), ["Unauthorized database table modification detected!"])
+
+    def test_alerts_in_the_same_second_get_their_own_directory(self):
+        with mock.patch('builtins.print'):
+            first = detector.write_alert("one", {})
+            second = detector.write_alert("two", {})
+        self.assertNotEqual(first, second)
+        self.assertEqual(len(os.listdir(detector.CONFIG['alerts_dir'])), 2)
+
+# ---------------------- Sampling profiler ----------------------
+
+class ProfilerTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = override_settings(PROFILER_DIR=tmp.name)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+        self.addCleanup(profiling.reload)
+        self.factory = RequestFactory()
+
+    def configure(self, **fields):
+        ProfilerConfig.objects.update_or_create(pk=1, defaults=fields)
+        profiling.reload()
+
+    def labels(self):
+        return [os.path.basename(path).split('-', 1)[1] for path in profiling.profile_paths()]
+
+    def test_switched_off_costs_no_queries_between_refreshes(self):
+        self.configure(enabled=False)
+        middleware = ProfilingMiddleware(lambda request: HttpResponse())
+        middleware(self.factory.get(reverse('home')))
+        with self.assertNumQueries(0):
+            middleware(self.factory.get(reverse('home')))
+        self.assertEqual(self.labels(), [])
+
+    def test_url_rates(self):
+        config = ProfilerConfig(enabled=True, request_sample_rate=0.25, url_names="api_elections:1, dashboard")
+        snapshot = profiling._Snapshot(config)
+        self.assertEqual(snapshot.request_rate_for('api_elections'), 1.0)
+        self.assertEqual(snapshot.request_rate_for('dashboard'), 0.25)
+        self.assertEqual(snapshot.request_rate_for('home'), 0.0)
+        self.assertEqual(profiling._Snapshot(ProfilerConfig(request_sample_rate=0.5)).request_rate_for('home'), 0.5)
+
+    def test_sampled_requests_are_saved_in_a_ring(self):
+        self.configure(enabled=True, url_names="home:1", ring_size=2)
+        middleware = ProfilingMiddleware(lambda request: HttpResponse())
+        for _ in range(3):
+            middleware(self.factory.get(reverse('home')))
+        middleware(self.factory.get(reverse('register')))
+        self.assertEqual(self.labels(), ['request-home.prof'] * 2)
+
+    def test_async_requests_and_loop_iterations(self):
+        self.configure(enabled=True, url_names="home:1", loop_sample_rate=1.0)
+
+        async def view(request):
+            return HttpResponse()
+
+        middleware = ProfilingMiddleware(view)
+        async_to_sync(middleware)(self.factory.get(reverse('home')))
+        with profiling.profile_iteration('detector'):
+            sum(range(1000))
+        self.assertEqual(sorted(self.labels()), ['detector-detector.prof', 'request-home.prof'])
+
+        count, rows = profiling.hot_functions('detector')
+        self.assertEqual(count, 1)
+        self.assertTrue(rows)
+        out = io.StringIO()
+        call_command('profiler_summary', '--kind', 'request', stdout=out)
+        self.assertIn("1 profiles (request)", out.getvalue())
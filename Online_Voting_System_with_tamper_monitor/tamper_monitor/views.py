@@ -5,6 +5,6 @@ from django.contrib.admin.views.decorators import staff_member_required
 
 @require_GET
 @staff_member_required
-def unacked_count(request):
-    cnt = TamperAlert.objects.filter(acknowledged=False).count()
+async def unacked_count(request):
+    cnt = await TamperAlert.objects.filter(acknowledged=False).acount()
     return JsonResponse({'count': cnt})
@@ -0,0 +1,155 @@
+import json
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, HttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
+from . import page_cache
+from .models import ElectionTurnout, election_tally_counts
+from .versioning import get_election_version, get_elections_list_version
+
+# Read-only JSON API. Every response carries a strong ETag built from the
+# version counters in voting_site.versioning; a matching If-None-Match is
+# answered with 304 straight from the cache, and the rendered body of each
+# version is cached too, so repeated polling rarely reaches the database.
+# The views are async: under ASGI a 304 or a cached body never waits behind
+# a worker thread. Elections, positions and approved candidates come from
+# voting_site.page_cache, the same versioned entries the HTML pages use;
+# only the results' tallies and turnout are queried here.
+
+PAYLOAD_TIMEOUT = 60 * 60
+
+
+# ---------------------- ETags ----------------------
+
+def elections_etag(request):
+    return f"elections-{get_elections_list_version()}"
+
+
+def election_etag(request, election_id):
+    return f"election-{election_id}-{get_election_version(election_id)}"
+
+
+def results_etag(request, election_id):
+    return (
+        f"results-{election_id}-{get_election_version(election_id)}"
+        f"-{get_election_version(election_id, 'results')}"
+    )
+
+
+# ---------------------- Payloads ----------------------
+
+def _election_dict(election):
+    return {
+        "election_id": election.election_id,
+        "election_name": election.election_name,
+        "description": election.description,
+        "start_date": election.start_date,
+        "end_date": election.end_date,
+        "candidate_deadline": election.candidate_deadline,
+        "status": election.status,
+        "is_paused": election.is_paused,
+    }
+
+
+async def _election_ballot(election_id):
+    ballot = await page_cache.election_ballot(election_id)
+    if ballot is None:
+        raise Http404("Election not found")
+    return ballot[:2]
+
+
+async def build_elections_payload():
+    return {"elections": [_election_dict(e) for e in await page_cache.all_elections()]}
+
+
+async def build_election_payload(election_id):
+    election, positions = await _election_ballot(election_id)
+    data = _election_dict(election)
+    data["positions"] = [
+        {
+            "position_id": position.position_id,
+            "position_name": position.position_name,
+            "description": position.description,
+            "candidates": [
+                {
+                    "candidate_id": c.candidate_id,
+                    "candidate_name": c.candidate_name,
+                    "party": c.party,
+                }
+                for c in position.approved_candidates
+            ],
+        }
+        for position in positions
+    ]
+    return data
+
+
+def _tallies(election_id):
+    turnout = ElectionTurnout.objects.filter(election_id=election_id).values('voters_voted', 'votes_cast').first()
+    return election_tally_counts(election_id), turnout
+
+
+async def build_results_payload(election_id):
+    election, positions = await _election_ballot(election_id)
+    counts, turnout = await sync_to_async(_tallies)(election_id)
+    results = []
+    for position in positions:
+        candidates = [
+            {
+                "candidate_id": c.candidate_id,
+                "candidate_name": c.candidate_name,
+                "votes": counts.get((position.position_id, c.candidate_id), 0),
+            }
+            for c in position.approved_candidates
+        ]
+        results.append({
+            "position_id": position.position_id,
+            "position_name": position.position_name,
+            "total_votes": sum(c["votes"] for c in candidates),
+            "candidates": candidates,
+        })
+    return {
+        "election_id": election.election_id,
+        "status": election.status,
+        "turnout": turnout or {"voters_voted": 0, "votes_cast": 0},
+        "positions": results,
+    }
+
+
+async def _cached_json(cache_key, build):
+    body = await cache.aget(cache_key)
+    if body is None:
+        body = json.dumps(await build(), cls=DjangoJSONEncoder).encode()
+        await cache.aset(cache_key, body, PAYLOAD_TIMEOUT)
+    return HttpResponse(body, content_type="application/json")
+
+
+# ---------------------- Views ----------------------
+
+@require_GET
+@cache_control(no_cache=True)
+@condition(etag_func=elections_etag)
+async def elections_list(request):
+    return await _cached_json(f"voting:api:{elections_etag(request)}", build_elections_payload)
+
+
+@require_GET
+@cache_control(no_cache=True)
+@condition(etag_func=election_etag)
+async def election_detail(request, election_id):
+    return await _cached_json(
+        f"voting:api:{election_etag(request, election_id)}",
+        lambda: build_election_payload(election_id),
+    )
+
+
+@require_GET
+@cache_control(no_cache=True)
+@condition(etag_func=results_etag)
+async def election_results(request, election_id):
+    return await _cached_json(
+        f"voting:api:{results_etag(request, election_id)}",
+        lambda: build_results_payload(election_id),
+    )
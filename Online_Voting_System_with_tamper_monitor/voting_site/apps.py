@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class VotingSiteConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'voting_site'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        try:
+            from .monitors import start_in_web_process
+            from .scheduler import start_scheduler_thread
+            import sys
+            if start_in_web_process(sys.argv):
+                start_scheduler_thread()
+                from .ingest import ingest_mode, start_chain_writer_thread
+                if ingest_mode() == 'queue':
+                    start_chain_writer_thread()
+        except Exception:
+            pass
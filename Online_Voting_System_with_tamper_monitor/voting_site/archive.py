@@ -0,0 +1,190 @@
+import hashlib
+from collections import Counter
+from django.db import connection, transaction
+from django.utils import timezone
+from .exports import keyset_chunks
+from .journal import pack_vote
+from .models import Election, ElectionArchive, ArchivedVote, Vote, VoteSubmission
+from .verification import legacy_links, verify_chain
+from .versioning import bump_election_version, bump_elections_list_version
+
+# Archival of closed elections.
+#
+#   1. copy the election's votes into votes_archive, chunk by chunk
+#   2. read the copy back and check it against a seal of the originals
+#      (row count, final chain hash, tallies, Merkle root over every row)
+#   3. store the seal as an ElectionArchive summary
+#   4. delete the originals from `votes`, chunk by chunk
+#
+# An interrupted run is safe to repeat: leftovers of step 1 are discarded,
+# and an election that is already sealed only finishes step 4.
+
+ARCHIVE_FIELDS = ('vote_id', 'voter_id', 'position_id', 'candidate_id', 'timestamp', 'vote_hash', 'previous_vote_hash', 'hash_version')
+CHUNK_SIZE = 5000
+
+
+class ArchiveError(Exception):
+    pass
+
+# ---------------------- Seal ----------------------
+
+def _leaf(data):
+    return hashlib.sha256(b'\x00' + data).digest()
+
+def _node(left, right):
+    return hashlib.sha256(b'\x01' + left + right).digest()
+
+
+class Seal:
+    """
+    Running summary of a vote sequence (ordered by vote_id). The Merkle root
+    (RFC 6962 layout, leaves = journal.pack_vote of each row) is built in
+    O(log n) memory from a stack of perfect-subtree peaks.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.first_vote_id = None
+        self.last_vote_id = None
+        self.final_chain_hash = ''
+        self.tallies = Counter()
+        self._peaks = []  # [(height, digest)], heights strictly decreasing
+
+    def add(self, row):
+        self.count += 1
+        if self.first_vote_id is None:
+            self.first_vote_id = row.vote_id
+        self.last_vote_id = row.vote_id
+        self.final_chain_hash = row.vote_hash or ''
+        self.tallies[(row.position_id, row.candidate_id)] += 1
+
+        digest, height = _leaf(pack_vote(row)), 0
+        while self._peaks and self._peaks[-1][0] == height:
+            digest = _node(self._peaks.pop()[1], digest)
+            height += 1
+        self._peaks.append((height, digest))
+
+    @property
+    def merkle_root(self):
+        if not self._peaks:
+            return hashlib.sha256(b'').hexdigest()
+        peaks = [digest for _, digest in self._peaks]
+        root = peaks.pop()
+        while peaks:
+            root = _node(peaks.pop(), root)
+        return root.hex()
+
+    def tally_list(self):
+        return sorted([p, c, n] for (p, c), n in self.tallies.items())
+
+    def matches(self, other):
+        return (
+            self.count == other.count
+            and self.first_vote_id == other.first_vote_id
+            and self.last_vote_id == other.last_vote_id
+            and self.final_chain_hash == other.final_chain_hash
+            and self.tallies == other.tallies
+            and self.merkle_root == other.merkle_root
+        )
+
+
+def seal_archived_votes(election_id, chunk_size=CHUNK_SIZE):
+    """Re-derive the seal and the chain check from votes_archive."""
+    seal = Seal()
+
+    def rows():
+        queryset = ArchivedVote.objects.filter(election_id=election_id)
+        for chunk in keyset_chunks(queryset, 'vote_id', ARCHIVE_FIELDS, chunk_size, named=True):
+            for row in chunk:
+                seal.add(row)
+                yield row
+
+    tampered = verify_chain(rows(), election_id, legacy=lambda: legacy_links(election_id))
+    return seal, tampered
+
+# ---------------------- Archival ----------------------
+
+def archive_election(election_id, chunk_size=CHUNK_SIZE, now=None):
+    """Archive a closed election and return its ElectionArchive."""
+    election = Election.objects.get(pk=election_id)
+    archive = ElectionArchive.objects.filter(election=election).first()
+    if archive is None:
+        if election.scheduled_status(now or timezone.now()) != 'closed':
+            raise ArchiveError(f"Election {election_id} has not closed yet")
+        archive = _copy_and_seal(election, chunk_size)
+    _purge_hot_votes(election_id, chunk_size)
+
+    bump_election_version(election_id)
+    bump_election_version(election_id, 'results')
+    bump_elections_list_version()
+    return archive
+
+
+def _copy_and_seal(election, chunk_size):
+    election_id = election.election_id
+    # Leftovers of an interrupted run
+    ArchivedVote.objects.filter(election_id=election_id).delete()
+
+    hot = Seal()
+    queryset = Vote.objects.filter(election_id=election_id)
+    for chunk in keyset_chunks(queryset, 'vote_id', ARCHIVE_FIELDS, chunk_size, named=True):
+        with transaction.atomic():
+            ArchivedVote.objects.bulk_create([ArchivedVote(election_id=election_id, **row._asdict()) for row in chunk])
+        for row in chunk:
+            hot.add(row)
+
+    archived, tampered = seal_archived_votes(election_id, chunk_size)
+    if not archived.matches(hot):
+        ArchivedVote.objects.filter(election_id=election_id).delete()
+        raise ArchiveError(
+            f"Election {election_id}: archived copy does not match the originals "
+            f"({archived.count} vs {hot.count} rows, root {archived.merkle_root} vs {hot.merkle_root})"
+        )
+
+    return ElectionArchive.objects.create(
+        election=election,
+        vote_count=hot.count,
+        first_vote_id=hot.first_vote_id,
+        last_vote_id=hot.last_vote_id,
+        final_chain_hash=hot.final_chain_hash,
+        merkle_root=hot.merkle_root,
+        tallies=hot.tally_list(),
+        tampered_votes=tampered,
+    )
+
+
+def _purge_hot_votes(election_id, chunk_size):
+    """
+    Delete the archived originals from `votes`. Raw DELETEs by primary key:
+    a queryset delete would load every row to send post_delete signals.
+    """
+    VoteSubmission.objects.filter(vote__election_id=election_id).update(vote=None)
+    table = connection.ops.quote_name(Vote._meta.db_table)
+    archived = ArchivedVote.objects.filter(election_id=election_id)
+    for chunk in keyset_chunks(archived, 'vote_id', ('vote_id',), chunk_size):
+        ids = [vote_id for (vote_id,) in chunk]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table} WHERE vote_id IN ({', '.join(['%s'] * len(ids))})", ids)
+
+    late = Vote.objects.filter(election_id=election_id).count()
+    if late:
+        raise ArchiveError(f"Election {election_id}: {late} votes were cast after it was sealed and remain in `votes`")
+
+
+ROW_FIELDS = ('voter_id', 'position_id', 'candidate_id', 'vote_hash', 'previous_vote_hash')
+
+def archived_vote_ids(rows):
+    """
+    vote_ids of deleted `votes` rows (dicts of column values, e.g. from the
+    binlog) that sit unchanged in votes_archive under a sealed election.
+    """
+    rows = {row.get('vote_id'): row for row in rows}
+    archived = (
+        ArchivedVote.objects.filter(vote_id__in=[k for k in rows if k is not None])
+        .filter(election_id__in=ElectionArchive.objects.values('election_id'))
+        .values_list('vote_id', *ROW_FIELDS, named=True)
+    )
+    return {
+        a.vote_id for a in archived
+        if all(rows[a.vote_id].get(field) == getattr(a, field) for field in ROW_FIELDS)
+    }
@@ -0,0 +1,352 @@
+import asyncio
+import random
+import statistics
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from importlib import import_module
+from itertools import islice
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.asgi import get_asgi_application
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from . import hashing
+from .models import Voter, Election, ElectionVoter, Position, Candidate, Vote
+
+# Vote-casting load generator used by `manage.py benchmark_votes` and the
+# pytest-benchmark suite in benchmarks/. It seeds its own voters and
+# elections (tagged with a run id so they can be removed afterwards) and
+# drives real requests through login_view -> vote_page -> vote_candidate.
+# drive_reads() replays the read side of the opening-hour rush through either
+# the WSGI or the ASGI request handler (`manage.py benchmark_votes --reads`).
+
+PASSWORD = "bench-password"
+
+# ---------------------- Seeding ----------------------
+
+def seed(voters=100, elections=1, positions=5, candidates=4, run_id=None):
+    """Create a running election set and approved voters. Returns a dict describing the run."""
+    run_id = run_id or uuid.uuid4().hex[:8]
+    now = timezone.now()
+    password_hash = make_password(PASSWORD)  # hash once; PBKDF2 is deliberately slow
+
+    election_objs = [
+        Election.objects.create(
+            election_name=f"bench-{run_id}-{i}",
+            start_date=now - timedelta(hours=1),
+            end_date=now + timedelta(days=1),
+            candidate_deadline=now - timedelta(hours=2),
+            status="running",
+        )
+        for i in range(elections)
+    ]
+    Position.objects.bulk_create([
+        Position(election=e, position_name=f"position-{p}")
+        for e in election_objs for p in range(positions)
+    ])
+    position_objs = list(Position.objects.filter(election__in=election_objs))
+    Candidate.objects.bulk_create([
+        Candidate(position=p, candidate_name=f"candidate-{p.position_id}-{c}", is_approved=True)
+        for p in position_objs for c in range(candidates)
+    ])
+    Voter.objects.bulk_create([
+        Voter(name=f"bench voter {i}", email=f"bench-{run_id}-{i}@example.com", password_hash=password_hash)
+        for i in range(voters)
+    ], batch_size=1000)
+    voter_objs = list(Voter.objects.filter(email__startswith=f"bench-{run_id}-"))
+    ElectionVoter.objects.bulk_create([
+        ElectionVoter(voter=v, election=e, is_approved=True)
+        for v in voter_objs for e in election_objs
+    ], batch_size=1000)
+
+    ballot = defaultdict(list)  # election_id -> [(position_id, [candidate_id, ...]), ...]
+    for p in Position.objects.filter(election__in=election_objs).prefetch_related("candidates"):
+        ballot[p.election_id].append((p.position_id, [c.candidate_id for c in p.candidates.all()]))
+
+    return {
+        "run_id": run_id,
+        "emails": [v.email for v in voter_objs],
+        "voter_ids": [v.voter_id for v in voter_objs],
+        "ballot": dict(ballot),
+    }
+
+
+def cleanup(run):
+    """Remove everything `seed` created for this run (votes cascade)."""
+    Election.objects.filter(election_name__startswith=f"bench-{run['run_id']}-").delete()
+    Voter.objects.filter(email__startswith=f"bench-{run['run_id']}-").delete()
+
+# ---------------------- Load Generation ----------------------
+
+# Every simulated voter connects from 127.0.0.1; lift the per-IP login limit
+# (voting_site.throttle) so the run measures voting, not throttling.
+UNTHROTTLED = override_settings(LOGIN_THROTTLE_RATES={"ip": (10 ** 9, 1)})
+
+
+class Recorder:
+    """Thread-safe collector of (view, seconds, query_count) samples."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.exceptions = defaultdict(Counter)  # view -> {"OperationalError: database is locked": n}
+
+    def add(self, view, seconds, queries, ok=True, exception=None):
+        with self._lock:
+            self.samples[view].append((seconds, queries))
+            if not ok:
+                self.errors[view] += 1
+            if exception is not None:
+                self.exceptions[view][f"{type(exception).__name__}: {exception}"] += 1
+
+
+def _timed(recorder, view, call):
+    """Time one request. A request that raises is recorded as an error, not re-raised."""
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        try:
+            response = call()
+        except Exception as e:
+            recorder.add(view, time.perf_counter() - started, len(ctx.captured_queries), ok=False, exception=e)
+            return None
+        elapsed = time.perf_counter() - started
+    recorder.add(view, elapsed, len(ctx.captured_queries), ok=response.status_code < 400)
+    return response
+
+
+def run_session(email, ballot, recorder, rng):
+    """One voter: log in, open each ballot page, vote once per position."""
+    client = Client()
+    try:
+        _timed(recorder, "login_view", lambda: client.post(reverse("login"), {"email": email, "password": PASSWORD}))
+        for election_id, positions in ballot.items():
+            _timed(recorder, "vote_page", lambda: client.get(reverse("vote_page", args=[election_id])))
+            for position_id, candidate_ids in positions:
+                url = reverse("vote_candidate", args=[election_id, position_id, rng.choice(candidate_ids)])
+                token = uuid.uuid4().hex
+                _timed(recorder, "vote_candidate", lambda: client.get(url, {"request_token": token}))
+    finally:
+        # Worker threads get their own DB connection; don't leak it.
+        connections.close_all()
+
+
+def sqlite_deferred_writes(using='default'):
+    """
+    True on SQLite without OPTIONS['transaction_mode'] = 'IMMEDIATE'. vote_candidate
+    reads the chain head and then writes in the same transaction; concurrent
+    deferred transactions cannot wait for that upgrade and fail with
+    "database is locked" instead, whatever the timeout.
+    """
+    conn = connections[using]
+    return conn.vendor == 'sqlite' and conn.settings_dict.get('OPTIONS', {}).get('transaction_mode') != 'IMMEDIATE'
+
+
+def drive(run, concurrency=8, seed_value=0):
+    """Run every seeded voter through a session on a thread pool. Returns (Recorder, wall_seconds)."""
+    recorder = Recorder()
+    rng = random.Random(seed_value)
+    rngs = [random.Random(rng.random()) for _ in run["emails"]]
+    started = time.perf_counter()
+    with UNTHROTTLED, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda args: run_session(args[0], run["ballot"], recorder, args[1]), zip(run["emails"], rngs)))
+    return recorder, time.perf_counter() - started
+
+# ---------------------- Read Load: WSGI vs ASGI ----------------------
+#
+# Each voter (already logged in) opens the dashboard, election and ballot
+# pages, then polls the results API with If-None-Match. In 'wsgi' mode voters
+# are threads sharing `threads` request slots, like one threaded WSGI worker;
+# in 'asgi' mode they are tasks on one event loop calling the real ASGI
+# application (AsyncClient is not used: unlike django.core.asgi it runs every
+# request's sync code on one shared thread). db_latency_ms adds a sleep to
+# every query, standing in for a database across the network.
+
+def _read_requests(election_id):
+    return [
+        ("dashboard", reverse("dashboard")),
+        ("registered_election_detail", reverse("registered_election_detail", args=[election_id])),
+        ("vote_page", reverse("vote_page", args=[election_id])),
+    ]
+
+
+def _logged_in_session(voter_id):
+    session = import_module(settings.SESSION_ENGINE).SessionStore()
+    session["voter_id"] = voter_id
+    session.save()
+    return session.session_key
+
+
+def run_read_session(session_key, ballot, recorder, slots, polls):
+    client = Client()
+    client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+
+    def get(view, url, **kwargs):
+        started = time.perf_counter()
+        with slots:  # waiting for a free worker thread counts as latency
+            try:
+                response = client.get(url, **kwargs)
+            except Exception as e:
+                recorder.add(view, time.perf_counter() - started, None, ok=False, exception=e)
+                return None
+        recorder.add(view, time.perf_counter() - started, None, ok=response.status_code < 400)
+        return response.headers.get("ETag")
+
+    try:
+        for election_id in ballot:
+            for view, url in _read_requests(election_id):
+                get(view, url)
+            etag, url = None, reverse("api_election_results", args=[election_id])
+            for _ in range(polls):
+                etag = get("api_election_results", url, headers={"If-None-Match": etag} if etag else {}) or etag
+    finally:
+        connections.close_all()
+
+
+async def _asgi_get(app, path, headers):
+    """GET `path` from an ASGI app. Returns (status, {header: value})."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "scheme": "http",
+        "method": "GET", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"testserver")] + [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        "client": ("127.0.0.1", 0), "server": ("testserver", 80),
+    }
+    request_sent = False
+    start = {}
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Future()  # no disconnect; cancelled once the response is sent
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            start.update(message)
+
+    await app(scope, receive, send)
+    return start["status"], {k.decode().lower(): v.decode() for k, v in start.get("headers", [])}
+
+
+async def arun_read_session(app, session_key, ballot, recorder, polls):
+    cookie = {"Cookie": f"{settings.SESSION_COOKIE_NAME}={session_key}"}
+
+    async def get(view, url, extra=None):
+        started = time.perf_counter()
+        status, headers = await _asgi_get(app, url, dict(cookie, **(extra or {})))
+        recorder.add(view, time.perf_counter() - started, None, ok=status < 400)
+        return headers.get("etag")
+
+    for election_id in ballot:
+        for view, url in _read_requests(election_id):
+            await get(view, url)
+        etag, url = None, reverse("api_election_results", args=[election_id])
+        for _ in range(polls):
+            etag = await get("api_election_results", url, {"If-None-Match": etag} if etag else None) or etag
+
+
+def _add_query_latency(seconds):
+    def delayed(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        connection.execute_wrappers.append(delayed)
+
+    return install
+
+
+def drive_reads(run, mode="asgi", concurrency=50, threads=8, polls=5, db_latency_ms=0):
+    """Replay the read mix for every seeded voter, `concurrency` at a time. Returns (Recorder, wall_seconds)."""
+    recorder = Recorder()
+    session_keys = [_logged_in_session(voter_id) for voter_id in run["voter_ids"]]
+    install = _add_query_latency(db_latency_ms / 1000) if db_latency_ms else None
+    if install:
+        connections.close_all()  # new connections pick up the delay
+        connection_created.connect(install, weak=False)
+    started = time.perf_counter()
+    try:
+        if mode == "wsgi":
+            slots = threading.BoundedSemaphore(threads)
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                list(pool.map(lambda key: run_read_session(key, run["ballot"], recorder, slots, polls), session_keys))
+        else:
+            app = get_asgi_application()
+
+            async def main():
+                gate = asyncio.Semaphore(concurrency)
+
+                async def one(key):
+                    async with gate:
+                        await arun_read_session(app, key, run["ballot"], recorder, polls)
+
+                await asyncio.gather(*(one(key) for key in session_keys))
+
+            asyncio.run(main())
+    finally:
+        if install:
+            connection_created.disconnect(install)
+            connections.close_all()
+    return recorder, time.perf_counter() - started
+
+# ---------------------- Reporting ----------------------
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def check_chain(chunk_size=2000):
+    """Walk every election's votes chain. Returns {'votes', 'bad_hashes', 'broken_links'}."""
+    bad_hashes = broken_links = count = 0
+    heads = {}  # election_id -> vote_hash of its latest vote so far
+    rows = Vote.objects.order_by("vote_id").values_list(
+        "election_id", "voter_id", "position_id", "candidate_id", "timestamp", "vote_hash", "previous_vote_hash",
+        "hash_version", named=True,
+    ).iterator(chunk_size=chunk_size)
+    while chunk := list(islice(rows, chunk_size)):
+        count += len(chunk)
+        by_version = defaultdict(list)
+        for row in chunk:
+            by_version[row.hash_version].append(row)
+            # Legacy rows were linked across elections, so only current ones have per-election links
+            if row.hash_version == hashing.CURRENT_VERSION and (row.previous_vote_hash or "") != heads.get(row.election_id, ""):
+                broken_links += 1
+            heads[row.election_id] = row.vote_hash or ""
+        for version, group in by_version.items():
+            expected = hashing.hash_many(
+                [(r.voter_id, r.election_id, r.position_id, r.candidate_id, r.timestamp, r.previous_vote_hash) for r in group],
+                version,
+            )
+            bad_hashes += sum(r.vote_hash != h for r, h in zip(group, expected))
+    return {"votes": count, "bad_hashes": bad_hashes, "broken_links": broken_links}
+
+
+def summarize(recorder, wall_seconds):
+    report = {"wall_seconds": round(wall_seconds, 3), "views": {}}
+    for view, samples in sorted(recorder.samples.items()):
+        latencies = sorted(s for s, _ in samples)
+        queries = [q for _, q in samples if q is not None]
+        report["views"][view] = {
+            "requests": len(samples),
+            "errors": recorder.errors[view],
+            "throughput_per_s": round(len(samples) / wall_seconds, 2) if wall_seconds else 0.0,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "avg_queries": round(statistics.mean(queries), 2) if queries else None,
+            "max_queries": max(queries) if queries else None,
+            "exceptions": dict(recorder.exceptions[view].most_common(5)),
+        }
+    return report
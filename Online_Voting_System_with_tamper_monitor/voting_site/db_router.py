@@ -0,0 +1,121 @@
+import time
+from asgiref.sync import iscoroutinefunction
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Optional read replica for heavy read-only work (chain verification, journal
+# cross-checks, exports, voter-facing listings). Enable with:
+#
+#   DATABASES['replica'] = {..., 'TEST': {'MIRROR': 'default'}}
+#   DATABASE_ROUTERS = ['voting_site.db_router.ReplicaRouter']
+#
+# Only code inside replica_reads() / @replica_view is routed; everything else,
+# and every write, stays on the primary. Without a 'replica' alias all of this
+# is a no-op. After a voter writes (votes, registers, applies) their session is
+# pinned to the primary for DATABASE_REPLICA_PIN_SECONDS so they read their
+# own writes despite replication lag.
+
+# ---------------------- Configuration ----------------------
+
+def replica_alias():
+    return getattr(settings, 'DATABASE_REPLICA_ALIAS', 'replica')
+
+def replica_configured():
+    return replica_alias() in settings.DATABASES
+
+def pin_seconds():
+    return getattr(settings, 'DATABASE_REPLICA_PIN_SECONDS', 15)
+
+PIN_SESSION_KEY = 'db_primary_until'
+
+# ---------------------- Routing State ----------------------
+
+_replica_ok = ContextVar('replica_ok', default=False)
+
+
+@contextmanager
+def replica_reads():
+    """Route reads inside the block to the replica (if one is configured)."""
+    token = _replica_ok.set(True)
+    try:
+        yield
+    finally:
+        _replica_ok.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """Force reads inside the block back to the primary, e.g. inside replica_reads()."""
+    token = _replica_ok.set(False)
+    try:
+        yield
+    finally:
+        _replica_ok.reset(token)
+
+
+def replica_or_primary():
+    """Alias for lag-tolerant reads that pass `using=` explicitly (e.g. streamed exports)."""
+    return replica_alias() if replica_configured() else DEFAULT_DB_ALIAS
+
+
+def read_alias():
+    """The alias reads are currently routed to."""
+    return replica_or_primary() if _replica_ok.get() else DEFAULT_DB_ALIAS
+
+# ---------------------- Read-your-writes Pin ----------------------
+
+def pin_to_primary(request):
+    """Keep this session's reads on the primary for a while after it writes."""
+    request.session[PIN_SESSION_KEY] = time.time() + pin_seconds()
+
+
+def is_pinned(request):
+    session = getattr(request, 'session', None)
+    return session is not None and session.get(PIN_SESSION_KEY, 0) > time.time()
+
+
+async def ais_pinned(request):
+    session = getattr(request, 'session', None)
+    return session is not None and await session.aget(PIN_SESSION_KEY, 0) > time.time()
+
+
+def replica_view(view):
+    """Serve a read-only view (sync or async) from the replica unless the session is pinned."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if await ais_pinned(request):
+                return await view(request, *args, **kwargs)
+            with replica_reads():
+                return await view(request, *args, **kwargs)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if is_pinned(request):
+            return view(request, *args, **kwargs)
+        with replica_reads():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+# ---------------------- Router ----------------------
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _replica_ok.get() and replica_configured():
+            return replica_alias()
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same data on both aliases
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema through replication
+        return db != replica_alias()
@@ -0,0 +1,146 @@
+import hashlib
+import struct
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+# The one place vote hashes are computed: the insert paths (Vote.save, the
+# queued chain writer, generate_election), the verifier, archival and the
+# benchmarks all go through here.
+#
+# Version 2 (current), canonical binary form, every field length-prefixed:
+#
+#   >I len | b"voting_site.vote"           domain tag
+#   >I 8   | >q version
+#   >I 8   | >q voter_id      (likewise election_id, position_id, candidate_id)
+#   >I 8   | >q timestamp     µs since the epoch, UTC
+#   >I n   | previous vote_hash as raw bytes (n = 0 for an election's first vote)
+#
+#   vote_hash = sha256(encoding).hexdigest()
+#
+# Each election is its own chain: previous_vote_hash is the vote_hash of the
+# election's previous vote.
+#
+# Version 1 (legacy, rows written before hash_version existed):
+#
+#   sha256(f"{voter_id}-{position_id}-{candidate_id}-{timestamp.isoformat()}-{prev}")
+#
+# with one chain across all elections. Old rows keep version 1 and are
+# verified with it; they are never rewritten, since the journal and any
+# exported copies hold their original hashes. Version 1 votes cast through
+# the vote page hashed a clock reading taken just before the stored
+# timestamp was set; migration 0020 found each such row's offset once
+# (find_legacy_skew) and stored it in LegacyHashSkew, so verification still
+# needs a single hash per row.
+
+LEGACY_VERSION = 1
+CURRENT_VERSION = 2
+VERSIONS = (LEGACY_VERSION, CURRENT_VERSION)
+
+DOMAIN = b"voting_site.vote"
+_INT = 8
+_HEADER = struct.pack('>I', len(DOMAIN)) + DOMAIN
+_FIELDS = struct.Struct('>' + 'Iq' * 6)  # version, voter, election, position, candidate, timestamp
+_LENGTH = struct.Struct('>I')
+_NO_PREVIOUS = _LENGTH.pack(0)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+LEGACY_CLOCK_SKEW = timedelta(milliseconds=50)
+
+
+def timestamp_micros(ts):
+    """Microseconds since the epoch. Naive datetimes are taken as UTC."""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=dt_timezone.utc)
+    return (ts - _EPOCH) // _MICROSECOND
+
+
+def _previous_bytes(previous_hash):
+    if not previous_hash:
+        return _NO_PREVIOUS
+    try:
+        prev = bytes.fromhex(previous_hash)
+    except ValueError:
+        # Not a hash at all (a tampered row): hash the text so the check can go on
+        prev = previous_hash.encode()
+    return _LENGTH.pack(len(prev)) + prev
+
+
+def canonical_bytes(voter_id, election_id, position_id, candidate_id, timestamp, previous_hash):
+    """The version 2 encoding of one vote."""
+    return _HEADER + _FIELDS.pack(
+        _INT, CURRENT_VERSION, _INT, voter_id, _INT, election_id, _INT, position_id,
+        _INT, candidate_id, _INT, timestamp_micros(timestamp),
+    ) + _previous_bytes(previous_hash)
+
+
+def _legacy_hash(voter_id, position_id, candidate_id, timestamp, previous_hash):
+    vote_data = f"{voter_id}-{position_id}-{candidate_id}-{timestamp.isoformat()}-{previous_hash or ''}"
+    return hashlib.sha256(vote_data.encode()).hexdigest()
+
+
+def hash_vote(voter_id, election_id, position_id, candidate_id, timestamp, previous_hash, version=CURRENT_VERSION):
+    """vote_hash of one vote."""
+    if version == CURRENT_VERSION:
+        return hashlib.sha256(
+            canonical_bytes(voter_id, election_id, position_id, candidate_id, timestamp, previous_hash)
+        ).hexdigest()
+    if version == LEGACY_VERSION:
+        return _legacy_hash(voter_id, position_id, candidate_id, timestamp, previous_hash)
+    raise ValueError(f"unknown vote hash version {version!r}")
+
+
+def find_legacy_skew(voter_id, position_id, candidate_id, timestamp, previous_hash, vote_hash, skew=LEGACY_CLOCK_SKEW):
+    """
+    Microseconds before the stored timestamp at which a version 1 vote_hash
+    was made (0 if at it), or None if not within `skew`. Up to one hash per
+    microsecond of `skew`: for the one-off search in migration 0020, not for
+    verification.
+    """
+    for k in range(skew // _MICROSECOND + 1):
+        if _legacy_hash(voter_id, position_id, candidate_id, timestamp - k * _MICROSECOND, previous_hash) == vote_hash:
+            return k
+    return None
+
+
+def legacy_hash_with_skew(voter_id, position_id, candidate_id, timestamp, previous_hash, micros):
+    """Version 1 vote_hash made `micros` before the stored timestamp."""
+    return _legacy_hash(voter_id, position_id, candidate_id, timestamp - micros * _MICROSECOND, previous_hash)
+
+
+def hash_many(rows, version=CURRENT_VERSION):
+    """
+    vote_hash of every row, in order. Rows are
+    (voter_id, election_id, position_id, candidate_id, timestamp, previous_hash)
+    tuples; each row brings its own previous hash, so rows are independent.
+    """
+    if version == LEGACY_VERSION:
+        return [_legacy_hash(v, p, c, ts, prev) for v, _, p, c, ts, prev in rows]
+    if version != CURRENT_VERSION:
+        raise ValueError(f"unknown vote hash version {version!r}")
+
+    # Same bytes as canonical_bytes, with functions and constants bound once
+    # so the per-row work is one struct.pack and one sha256.
+    sha256, pack, header, micros, previous = hashlib.sha256, _FIELDS.pack, _HEADER, timestamp_micros, _previous_bytes
+    return [
+        sha256(
+            header
+            + pack(_INT, CURRENT_VERSION, _INT, v, _INT, e, _INT, p, _INT, c, _INT, micros(ts))
+            + previous(prev)
+        ).hexdigest()
+        for v, e, p, c, ts, prev in rows
+    ]
+
+
+def chain_hashes(rows, previous_hash=''):
+    """
+    Hashes for new votes appended to one chain, in order. Rows are
+    (voter_id, election_id, position_id, candidate_id, timestamp); returns
+    [(previous_vote_hash, vote_hash)] per row.
+    """
+    chained = []
+    for voter_id, election_id, position_id, candidate_id, timestamp in rows:
+        vote_hash = hash_vote(voter_id, election_id, position_id, candidate_id, timestamp, previous_hash)
+        chained.append((previous_hash, vote_hash))
+        previous_hash = vote_hash
+    return chained
@@ -0,0 +1,150 @@
+import hashlib
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from django.dispatch import Signal
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+# Resized derivatives of voter and candidate photos.
+#
+# Each uploaded photo is hashed (sha256 of the original bytes) and rendered
+# once per size and format to
+#
+#   derivatives/<h[:2]>/<h>-v1-<px>.<webp|jpg>
+#
+# Identical uploads share one set of files, and a name never changes content,
+# so derivatives can be cached forever (see views.image_derivative). EXIF,
+# GPS included, is dropped; orientation is applied to the pixels first.
+# Rendering runs on a small thread pool after the upload commits; Pillow
+# releases the GIL while decoding, resizing and encoding.
+
+# ---------------------- Configuration ----------------------
+
+VERSION = 'v1'  # bump when sizes or encoder settings change
+SIZES = {'thumb': 96, 'card': 320}  # longest edge in pixels
+FORMATS = {'webp': ('WEBP', {'quality': 80, 'method': 4}), 'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True})}
+DERIVATIVE_DIR = 'derivatives'
+
+def worker_count():
+    return getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', 2)
+
+# ---------------------- Rendering ----------------------
+
+def content_digest(field_file):
+    h = hashlib.sha256()
+    with field_file.open('rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def derivative_name(digest, size, fmt):
+    return f"{DERIVATIVE_DIR}/{digest[:2]}/{digest}-{VERSION}-{SIZES[size]}.{fmt}"
+
+
+def _render(image, px, fmt):
+    pil_format, options = FORMATS[fmt]
+    out = image.copy()
+    out.thumbnail((px, px), Image.LANCZOS)
+    buf = io.BytesIO()
+    out.save(buf, pil_format, **options)  # no exif= argument: metadata is not written
+    return buf.getvalue()
+
+
+# Two uploads of the same photo must not render (and save) the same names twice
+_render_locks = [threading.Lock() for _ in range(16)]
+
+
+def build_derivatives(field_file):
+    """Render every missing derivative of an uploaded image. Returns its digest."""
+    digest = content_digest(field_file)
+    with _render_locks[int(digest[:2], 16) % len(_render_locks)]:
+        _build_missing(field_file, digest)
+    return digest
+
+
+def _build_missing(field_file, digest):
+    missing = [
+        (size, fmt) for size in SIZES for fmt in FORMATS
+        if not default_storage.exists(derivative_name(digest, size, fmt))
+    ]
+    if not missing:
+        return
+
+    with field_file.open('rb') as f:
+        image = Image.open(f)
+        # Let the JPEG decoder downscale by up to 8x while reading
+        largest = max(SIZES.values())
+        image.draft('RGB', (largest * 2, largest * 2))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGB')
+
+    for size, fmt in missing:
+        default_storage.save(derivative_name(digest, size, fmt), ContentFile(_render(image, SIZES[size], fmt)))
+
+# ---------------------- Worker Pool ----------------------
+
+# Sent (sender=model, pk=...) when a row's digest changes; save_digest()
+# sends no post_save for the row's own model.
+digest_recorded = Signal()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=worker_count(), thread_name_prefix='image-derivatives')
+        return _pool
+
+
+def save_digest(model, pk, digest_path, digest):
+    """
+    Store a row's digest: in a column of the row itself, or through a
+    `relation__field` path in a one-to-one row (voters keep theirs in
+    VoterImage, so the tamper-monitored `voters` table is never updated).
+    """
+    if '__' not in digest_path:
+        model.objects.filter(pk=pk).update(**{digest_path: digest})
+        return
+    relation, field = digest_path.split('__')
+    remote = model._meta.get_field(relation)
+    remote.related_model.objects.update_or_create(**{remote.field.attname: pk}, defaults={field: digest})
+
+
+def process_image(model, pk, field_name, digest_path):
+    """Build derivatives for one row and record the digest. Runs on the pool."""
+    try:
+        instance = model.objects.filter(pk=pk).only(field_name).first()
+        field_file = getattr(instance, field_name, None) if instance else None
+        if not field_file:
+            return None
+        digest = build_derivatives(field_file)
+        if model.objects.filter(pk=pk).values_list(digest_path, flat=True).first() != digest:
+            save_digest(model, pk, digest_path, digest)
+            digest_recorded.send(sender=model, pk=pk)
+        return digest
+    except Exception as e:
+        print(f"[ERROR] Image derivatives for {model.__name__} {pk}: {e}")
+        return None
+    finally:
+        close_old_connections()
+
+
+def schedule(model, pk, field_name, digest_path):
+    return _get_pool().submit(process_image, model, pk, field_name, digest_path)
+
+# ---------------------- URLs ----------------------
+
+def derivative_urls(digest, size):
+    """{'webp': url, 'jpg': url} for a processed image, or None."""
+    if not digest:
+        return None
+    return {fmt: reverse('image_derivative', kwargs={'name': derivative_name(digest, size, fmt)[len(DERIVATIVE_DIR) + 1:]})
+            for fmt in FORMATS}
@@ -0,0 +1,174 @@
+import gc
+import platform
+import random
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.utils import timezone
+from .hashing import CURRENT_VERSION, hash_vote
+from .verification import CHAIN_FIELDS, verify_chain, election_chain_rows, legacy_links
+
+# Timing and peak-memory benchmarks for the two heaviest integrity paths:
+# chain verification (voting_site.verification) and the detector loop's
+# snapshot hashing, snapshot diffing and binlog hashing
+# (tamper_monitor.detector). Used by `manage.py benchmark_integrity`.
+
+WORKLOADS = ('chain_verify', 'snapshot_hash', 'snapshot_diff', 'binlog_hash')
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+BINLOG_BYTES_PER_ROW = 120  # rough size of one row event in a ROW-format binlog
+
+VoteRow = namedtuple('VoteRow', CHAIN_FIELDS)
+SYNTHETIC_ELECTION = 1
+
+# ---------------------- Synthetic Data ----------------------
+
+def synthetic_chain(n, seed=0):
+    """n correctly chained vote rows of SYNTHETIC_ELECTION, shaped like election_chain_rows()."""
+    rng = random.Random(seed)
+    ts = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+    prev_hash = ''
+    rows = []
+    for vote_id in range(1, n + 1):
+        voter_id, position_id, candidate_id = vote_id, rng.randint(1, 20), rng.randint(1, 80)
+        ts += timedelta(milliseconds=rng.randint(1, 500))
+        vote_hash = hash_vote(voter_id, SYNTHETIC_ELECTION, position_id, candidate_id, ts, prev_hash)
+        rows.append(VoteRow(vote_id, voter_id, position_id, candidate_id, ts, vote_hash, prev_hash, CURRENT_VERSION))
+        prev_hash = vote_hash
+    return rows
+
+
+def synthetic_snapshot(n, seed=0):
+    """A detector snapshot (see get_votes_snapshot) with n votes and n // 5 voters."""
+    rng = random.Random(seed)
+    votes = [
+        {
+            'vote_id': i,
+            'voter_id': i,
+            'position_id': rng.randint(1, 20),
+            'candidate_id': rng.randint(1, 80),
+            'timestamp': f"2025-01-01T00:00:{i % 60:02d}.{i % 1000000:06d}Z",
+            'vote_hash': f"{rng.getrandbits(256):064x}",
+            'previous_vote_hash': f"{rng.getrandbits(256):064x}",
+        }
+        for i in range(1, n + 1)
+    ]
+    voters = [
+        {
+            'voter_id': i,
+            'name': f"Voter {i}",
+            'email': f"voter{i}@example.com",
+            'password_hash': f"pbkdf2_sha256$1000000${rng.getrandbits(64):016x}${rng.getrandbits(256):064x}",
+            'voter_image': '',
+            'is_admin': 0,
+            'registration_date': "2025-01-01T00:00:00Z",
+        }
+        for i in range(1, n // 5 + 1)
+    ]
+    return {'votes': votes, 'voters': voters}
+
+
+def tampered_copy(snapshot):
+    """Shallow copy of a snapshot with one vote row changed in the middle."""
+    votes = list(snapshot['votes'])
+    middle = len(votes) // 2
+    if votes:
+        votes[middle] = dict(votes[middle], candidate_id=votes[middle]['candidate_id'] + 1)
+    return {'votes': votes, 'voters': snapshot['voters']}
+
+# ---------------------- Measurement ----------------------
+
+def measure(fn, repeat=3):
+    """Best wall time over `repeat` plain runs, plus peak traced memory of one extra run."""
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def _workload(name, size, seed):
+    """Build inputs for one workload and return the callable to time."""
+    from tamper_monitor.detector import snapshot_hash, diff_snapshots, sha256_of_bytes
+
+    if name == 'chain_verify':
+        rows = synthetic_chain(size, seed)
+        return lambda: verify_chain(rows, SYNTHETIC_ELECTION)
+    if name == 'snapshot_hash':
+        snapshot = synthetic_snapshot(size, seed)
+        return lambda: snapshot_hash(snapshot)
+    if name == 'snapshot_diff':
+        snapshot = synthetic_snapshot(size, seed)
+        changed = tampered_copy(snapshot)
+        return lambda: diff_snapshots(snapshot, changed)
+    if name == 'binlog_hash':
+        blob = random.Random(seed).randbytes(size * BINLOG_BYTES_PER_ROW)
+        return lambda: sha256_of_bytes(blob)
+    raise ValueError(f"unknown workload {name!r}")
+
+
+def run_suite(sizes=DEFAULT_SIZES, workloads=WORKLOADS, repeat=3, seed=0, election_id=None, log=None):
+    """Run every workload at every size. Returns a JSON-serialisable results dict."""
+    results = []
+    for name in workloads:
+        for size in sizes:
+            fn = _workload(name, size, seed)
+            seconds, peak = measure(fn, repeat)
+            results.append({'workload': name, 'size': size, 'seconds': seconds, 'peak_bytes': peak})
+            if log:
+                log(f"{name:<14} {size:>9} rows  {seconds:9.4f}s  peak {peak / 1e6:9.2f} MB")
+            del fn
+            gc.collect()
+
+    if election_id is not None:
+        # Real data, e.g. from `manage.py generate_election`
+        count = sum(1 for _ in election_chain_rows(election_id))
+        seconds, peak = measure(lambda: verify_chain(election_chain_rows(election_id), election_id, legacy=lambda: legacy_links(election_id)), repeat)
+        results.append({'workload': 'chain_verify_db', 'size': count, 'seconds': seconds, 'peak_bytes': peak})
+        if log:
+            log(f"{'chain_verify_db':<14} {count:>9} rows  {seconds:9.4f}s  peak {peak / 1e6:9.2f} MB")
+
+    return {
+        'created_at': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'repeat': repeat,
+        'seed': seed,
+        'results': results,
+    }
+
+# ---------------------- Regression Check ----------------------
+
+def compare(current, baseline, threshold=0.2):
+    """
+    Compare two run_suite() results. Returns a list of regressions: entries
+    where seconds or peak_bytes grew by more than `threshold` (0.2 = 20%).
+    """
+    base = {(r['workload'], r['size']): r for r in baseline['results']}
+    regressions = []
+    for r in current['results']:
+        old = base.get((r['workload'], r['size']))
+        if not old:
+            continue
+        for metric in ('seconds', 'peak_bytes'):
+            if old[metric] and r[metric] > old[metric] * (1 + threshold):
+                regressions.append({
+                    'workload': r['workload'],
+                    'size': r['size'],
+                    'metric': metric,
+                    'baseline': old[metric],
+                    'current': r[metric],
+                    'change': r[metric] / old[metric] - 1,
+                })
+    return regressions
@@ -0,0 +1,385 @@
+import atexit
+import fcntl
+import glob
+import hashlib
+import heapq
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from .hashing import timestamp_micros
+
+# Append-only journal of accepted votes on local disk, independent of the
+# database an attacker would tamper with.
+#
+#   <dir>/segment-00000001.log     records, appended
+#   <dir>/segment-00000001.sha256  written when the segment is sealed
+#   <dir>/segment-00000001.damaged byte ranges of unreadable records, if any
+#   <dir>/journal.lock             flock held by whichever process is appending
+#
+# Record:  >I length | payload | >I crc32(payload)
+# Payload: >QIIIq32s32s  vote_id, voter_id, position_id, candidate_id,
+#                        timestamp (µs since epoch), vote_hash, previous_vote_hash
+#
+# A sealed segment's digest is sha256(previous segment digest + segment bytes),
+# so segments are chained as well as the votes inside them.
+#
+# Every worker process may append: each append takes the flock, writes its
+# records with one unbuffered write, and re-reads which segment is open and
+# how large it is, so records never interleave and only one process seals.
+
+# ---------------------- Configuration ----------------------
+
+def journal_enabled():
+    return getattr(settings, 'VOTE_JOURNAL_ENABLED', True)
+
+def journal_dir():
+    return getattr(settings, 'VOTE_JOURNAL_DIR', os.path.join(os.path.dirname(__file__), 'vote_journal'))
+
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+FSYNC_EVERY = 256          # records
+FSYNC_INTERVAL = 0.2       # seconds; upper bound on an un-synced record's age
+
+PAYLOAD = struct.Struct('>QIIIq32s32s')
+LENGTH = struct.Struct('>I')
+CRC = struct.Struct('>I')
+EMPTY_HASH = bytes(32)
+LOCK_NAME = 'journal.lock'
+
+JournalRecord = namedtuple(
+    'JournalRecord',
+    'vote_id voter_id position_id candidate_id timestamp vote_hash previous_vote_hash',
+)
+
+# ---------------------- Encoding ----------------------
+
+def _hash_bytes(value):
+    return bytes.fromhex(value) if value else EMPTY_HASH
+
+def _hash_text(value):
+    return '' if value == EMPTY_HASH else value.hex()
+
+def pack_vote(vote):
+    """Fixed-width binary form of a vote (a Vote or any row with the same attributes)."""
+    return PAYLOAD.pack(
+        vote.vote_id, vote.voter_id, vote.position_id, vote.candidate_id,
+        timestamp_micros(vote.timestamp), _hash_bytes(vote.vote_hash), _hash_bytes(vote.previous_vote_hash),
+    )
+
+def encode_vote(vote):
+    payload = pack_vote(vote)
+    return LENGTH.pack(len(payload)) + payload + CRC.pack(zlib.crc32(payload))
+
+def decode_payload(payload):
+    vote_id, voter_id, position_id, candidate_id, micros, vote_hash, prev_hash = PAYLOAD.unpack(payload)
+    ts = datetime.fromtimestamp(micros // 1_000_000, dt_timezone.utc).replace(microsecond=micros % 1_000_000)
+    return JournalRecord(vote_id, voter_id, position_id, candidate_id, ts, _hash_text(vote_hash), _hash_text(prev_hash))
+
+# ---------------------- Segments ----------------------
+
+def segment_paths(directory=None):
+    return sorted(glob.glob(os.path.join(directory or journal_dir(), 'segment-*.log')))
+
+def _segment_path(directory, number):
+    return os.path.join(directory, f'segment-{number:08d}.log')
+
+def _digest_path(segment_path):
+    return segment_path[:-len('.log')] + '.sha256'
+
+def _damaged_path(segment_path):
+    return segment_path[:-len('.log')] + '.damaged'
+
+def _record_at(buf, offset, end):
+    """Payload of an intact record starting at offset, else None."""
+    (length,) = LENGTH.unpack_from(buf, offset)
+    stop = offset + LENGTH.size + length + CRC.size
+    if length != PAYLOAD.size or stop > end:
+        return None
+    payload = bytes(buf[offset + LENGTH.size:stop - CRC.size])
+    (crc,) = CRC.unpack_from(buf, stop - CRC.size)
+    return payload if crc == zlib.crc32(payload) else None
+
+def _scan(buf, damaged=None):
+    """
+    Yield (offset_after_record, payload) for each intact record. Damaged bytes
+    are skipped up to the next intact record; pass a list as `damaged` to get
+    their (start, end) ranges, a torn tail included.
+    """
+    offset, end = 0, len(buf)
+    bad_from = None
+    while offset + LENGTH.size <= end:
+        payload = _record_at(buf, offset, end)
+        if payload is None:
+            if bad_from is None:
+                bad_from = offset
+            offset += 1
+            continue
+        if bad_from is not None:
+            if damaged is not None:
+                damaged.append((bad_from, offset))
+            bad_from = None
+        offset += LENGTH.size + len(payload) + CRC.size
+        yield offset, payload
+    if damaged is not None and (bad_from is not None or offset < end):
+        damaged.append((offset if bad_from is None else bad_from, end))
+
+def _damage(segment_path):
+    damaged = []
+    with open(segment_path, 'rb') as f:
+        for _ in _scan(f.read(), damaged):
+            pass
+    return damaged
+
+def _read_digest(segment_path):
+    try:
+        with open(_digest_path(segment_path)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+def _segment_digest(prev_digest, segment_path):
+    h = hashlib.sha256(bytes.fromhex(prev_digest) if prev_digest else b'')
+    with open(segment_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(block)
+    return h.hexdigest()
+
+# ---------------------- Writer ----------------------
+
+class JournalWriter:
+    """
+    Appends records with batched fsync and rolls segments at SEGMENT_MAX_BYTES.
+    One writer per process; processes serialise on the directory's flock.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._lock_fd = os.open(os.path.join(directory, LOCK_NAME), os.O_RDWR | os.O_CREAT, 0o644)
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        with self._locked():
+            self._open_tail()
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _open(self, number):
+        self.number = number
+        self.path = _segment_path(self.directory, number)
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def _open_tail(self):
+        paths = segment_paths(self.directory)
+        if not paths or _read_digest(paths[-1]) is not None:
+            self._open(int(os.path.basename(paths[-1])[8:16]) + 1 if paths else 1)
+            return
+        self._open(int(os.path.basename(paths[-1])[8:16]))
+        damaged = _damage(self.path)
+        if damaged:
+            # Keep the bytes (records after the damage are still read) and
+            # write no more into this segment.
+            with open(_damaged_path(self.path), 'w') as f:
+                f.writelines(f"{start}-{end}\n" for start, end in damaged)
+            print(f"[ERROR] Vote journal {os.path.basename(self.path)} has damaged bytes {damaged}; sealing it")
+            self._seal()
+
+    def _follow_tail(self):
+        """Move on if another process sealed the segment this one had open."""
+        if os.path.exists(_digest_path(self.path)):
+            if self._unsynced:
+                self._sync()
+            os.close(self.fd)
+            self._open_tail()
+
+    def _write(self, records):
+        view = memoryview(b''.join(records))
+        while view:
+            view = view[os.write(self.fd, view):]
+
+    def _sync(self):
+        os.fsync(self.fd)
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _seal(self):
+        self._sync()
+        os.close(self.fd)
+        previous = _read_digest(_segment_path(self.directory, self.number - 1)) if self.number > 1 else None
+        digest = _segment_digest(previous, self.path)
+        tmp = _digest_path(self.path) + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(digest + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, _digest_path(self.path))
+        self._open(self.number + 1)
+
+    def append(self, votes):
+        records = [encode_vote(vote) for vote in votes]
+        with self._locked():
+            self._follow_tail()
+            size = os.fstat(self.fd).st_size
+            batch = []
+            for record in records:
+                if size + len(record) > SEGMENT_MAX_BYTES and size:
+                    self._write(batch)
+                    self._unsynced += len(batch)
+                    self._seal()
+                    batch, size = [], 0
+                batch.append(record)
+                size += len(record)
+            self._write(batch)
+            self._unsynced += len(batch)
+            if self._unsynced >= FSYNC_EVERY:
+                self._sync()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(FSYNC_INTERVAL)
+            with self._lock:
+                if self._unsynced and time.monotonic() - self._last_sync >= FSYNC_INTERVAL:
+                    try:
+                        self._sync()
+                    except Exception as e:
+                        print(f"[ERROR] Vote journal fsync failed: {e}")
+
+    def close(self):
+        with self._locked():
+            self._sync()
+            os.close(self.fd)
+        os.close(self._lock_fd)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = JournalWriter(journal_dir())
+            atexit.register(_writer.close)
+        return _writer
+
+def append_votes(votes):
+    """Journal committed votes (they must have vote_id set). Never raises into the vote path."""
+    if not journal_enabled() or not votes:
+        return
+    try:
+        get_writer().append(votes)
+    except Exception as e:
+        print(f"[ERROR] Vote journal append failed: {e}")
+
+# ---------------------- Reader ----------------------
+
+def read_segment(path):
+    """Yield JournalRecords from one segment via mmap."""
+    if os.path.getsize(path) == 0:
+        return
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        for _, payload in _scan(buf):
+            yield decode_payload(payload)
+
+def read_journal(directory=None):
+    for path in segment_paths(directory):
+        yield from read_segment(path)
+
+def check_segment_digests(directory=None):
+    """Return the sealed segments whose recomputed digest does not match the stored one."""
+    bad = []
+    previous = None
+    for path in segment_paths(directory):
+        stored = _read_digest(path)
+        if stored is None:
+            break  # the open tail segment
+        if _segment_digest(previous, path) != stored:
+            bad.append(os.path.basename(path))
+        previous = stored
+    return bad
+
+def damaged_segments(directory=None):
+    """Segments holding bytes that are not intact records, as recorded when they were sealed."""
+    return [
+        os.path.basename(path) for path in segment_paths(directory)
+        if os.path.exists(_damaged_path(path))
+    ]
+
+# ---------------------- Cross-check ----------------------
+
+COMPARED_FIELDS = ('voter_id', 'position_id', 'candidate_id', 'timestamp', 'vote_hash', 'previous_vote_hash')
+
+def _field(row, name):
+    value = getattr(row, name)
+    if name == 'timestamp':
+        return timestamp_micros(value)
+    return value or ''
+
+def _in_vote_id_order(records, window):
+    """Re-sort a nearly ordered stream (commit order) by vote_id with a bounded heap."""
+    heap = []
+    for record in records:
+        heapq.heappush(heap, (record.vote_id, record))
+        if len(heap) > window:
+            yield heapq.heappop(heap)[1]
+    while heap:
+        yield heapq.heappop(heap)[1]
+
+def cross_check(db_rows, records, reorder_window=4096, limit=100):
+    """
+    One streaming merge of journal records against DB rows (both yielding
+    objects with vote_id and COMPARED_FIELDS; db_rows ordered by vote_id).
+    Rows older than the first journal record are counted, not flagged.
+    """
+    report = {
+        'journal_records': 0, 'db_rows': 0, 'before_journal': 0,
+        'missing_in_db': [], 'missing_in_journal': [], 'mismatched': [],
+    }
+
+    def note(kind, value):
+        if len(report[kind]) < limit:
+            report[kind].append(value)
+
+    journal = _in_vote_id_order(records, reorder_window)
+    db = iter(db_rows)
+    j = next(journal, None)
+    d = next(db, None)
+    first_journal_id = j.vote_id if j else None
+
+    while j is not None or d is not None:
+        if d is not None and (j is None or d.vote_id < j.vote_id):
+            report['db_rows'] += 1
+            if first_journal_id is None or d.vote_id < first_journal_id:
+                report['before_journal'] += 1
+            else:
+                note('missing_in_journal', d.vote_id)
+            d = next(db, None)
+        elif j is not None and (d is None or j.vote_id < d.vote_id):
+            report['journal_records'] += 1
+            note('missing_in_db', j.vote_id)
+            j = next(journal, None)
+        else:
+            report['journal_records'] += 1
+            report['db_rows'] += 1
+            diff = [f for f in COMPARED_FIELDS if _field(d, f) != _field(j, f)]
+            if diff:
+                note('mismatched', {'vote_id': j.vote_id, 'fields': diff})
+            j, d = next(journal, None), next(db, None)
+
+    report['ok'] = not (report['missing_in_db'] or report['missing_in_journal'] or report['mismatched'])
+    return report
@@ -0,0 +1,49 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from voting_site.archive import ArchiveError, CHUNK_SIZE, archive_election
+from voting_site.models import Election
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the votes of closed elections into votes_archive, sealed with the final chain "
+        "hash, a Merkle root and the tallies, after a verified round trip."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('election_ids', nargs='*', type=int)
+        parser.add_argument('--closed-for-days', type=float,
+                            help="Archive every election that closed at least this many days ago.")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        election_ids = list(options['election_ids'])
+        if options['closed_for_days'] is not None:
+            cutoff = timezone.now() - timedelta(days=options['closed_for_days'])
+            election_ids += list(
+                Election.objects.filter(end_date__lte=cutoff, archive__isnull=True)
+                .order_by('end_date').values_list('election_id', flat=True)
+            )
+        if not election_ids:
+            raise CommandError("Give election ids or --closed-for-days")
+
+        failed = False
+        for election_id in election_ids:
+            try:
+                archive = archive_election(election_id, options['chunk_size'])
+            except (ArchiveError, Election.DoesNotExist) as e:
+                failed = True
+                self.stderr.write(self.style.ERROR(f"Election {election_id}: {e}"))
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f"Election {election_id}: {archive.vote_count} votes archived, "
+                f"merkle root {archive.merkle_root}, final chain hash {archive.final_chain_hash or '-'}"
+            ))
+            if archive.tampered_votes:
+                self.stdout.write(self.style.WARNING(
+                    f"  {len(archive.tampered_votes)} votes failed the chain check when sealed: "
+                    f"{archive.tampered_votes[:20]}"
+                ))
+        if failed:
+            raise CommandError("Some elections were not archived.")
@@ -0,0 +1,54 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from voting_site import integrity_benchmark as suite
+
+
+class Command(BaseCommand):
+    help = (
+        "Time chain verification, detector snapshot hashing/diffing and binlog hashing, "
+        "record peak memory, and optionally compare against a stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=list(suite.DEFAULT_SIZES))
+        parser.add_argument('--workloads', nargs='+', choices=suite.WORKLOADS, default=list(suite.WORKLOADS))
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--election', type=int, help="Also verify this election's real chain from the database.")
+        parser.add_argument('--output', help="Write results as JSON to this file.")
+        parser.add_argument('--compare', metavar='BASELINE', help="Baseline JSON from an earlier --output.")
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help="Allowed slowdown / memory growth before flagging (0.2 = 20%%).")
+
+    def handle(self, *args, **options):
+        results = suite.run_suite(
+            sizes=options['sizes'],
+            workloads=options['workloads'],
+            repeat=options['repeat'],
+            seed=options['seed'],
+            election_id=options['election'],
+            log=self.stdout.write,
+        )
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if not options['compare']:
+            return
+        try:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read baseline {options['compare']}: {e}")
+
+        regressions = suite.compare(results, baseline, options['threshold'])
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS(f"No regressions beyond {options['threshold']:.0%}."))
+            return
+        for r in regressions:
+            self.stdout.write(self.style.ERROR(
+                f"REGRESSION {r['workload']} @ {r['size']} rows: {r['metric']} "
+                f"{r['baseline']:.4g} -> {r['current']:.4g} ({r['change']:+.0%})"
+            ))
+        raise CommandError(f"{len(regressions)} regression(s) beyond {options['threshold']:.0%}")
@@ -0,0 +1,115 @@
+import json
+from django.core.management.base import BaseCommand
+from django.db import connection
+from voting_site import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed voters/elections and drive concurrent login -> ballot -> vote sessions, "
+        "then report throughput, latency percentiles, queries per request and chain integrity. "
+        "With --reads, replay the read side of the rush (pages + results polling) through the "
+        "WSGI and/or ASGI handler instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--voters', type=int, default=100)
+        parser.add_argument('--elections', type=int, default=1)
+        parser.add_argument('--positions', type=int, default=5)
+        parser.add_argument('--candidates', type=int, default=4)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--seed', type=int, default=0, help="Random seed for candidate choices.")
+        parser.add_argument('--json', dest='json_path', help="Also write the report to this file.")
+        parser.add_argument('--keep', action='store_true', help="Keep the seeded data afterwards.")
+        parser.add_argument('--reads', action='store_true', help="Benchmark the read mix instead of vote casting.")
+        parser.add_argument('--mode', choices=('wsgi', 'asgi', 'both'), default='both', help="Request handler for --reads.")
+        parser.add_argument('--threads', type=int, default=8, help="WSGI worker threads for --reads --mode wsgi.")
+        parser.add_argument('--polls', type=int, default=5, help="Results API polls per voter for --reads.")
+        parser.add_argument('--db-latency-ms', type=float, default=0, help="Added to every query for --reads.")
+
+    def handle(self, *args, **options):
+        if options['reads']:
+            return self.handle_reads(options)
+        if options['concurrency'] > 1 and benchmark.sqlite_deferred_writes():
+            self.stdout.write(self.style.WARNING(
+                "SQLite without transaction_mode IMMEDIATE: concurrent votes will fail with "
+                "'database is locked'. Set DATABASES['default']['OPTIONS'] = "
+                "{'transaction_mode': 'IMMEDIATE'} (Django 5.1+) or use --concurrency 1."
+            ))
+        self.stdout.write(f"Seeding {options['voters']} voters on {connection.vendor}...")
+        run = benchmark.seed(
+            voters=options['voters'],
+            elections=options['elections'],
+            positions=options['positions'],
+            candidates=options['candidates'],
+        )
+        try:
+            recorder, wall = benchmark.drive(run, concurrency=options['concurrency'], seed_value=options['seed'])
+            report = benchmark.summarize(recorder, wall)
+            report["database"] = connection.vendor
+            report["parameters"] = {k: options[k] for k in ('voters', 'elections', 'positions', 'candidates', 'concurrency', 'seed')}
+            report["chain"] = benchmark.check_chain()
+        finally:
+            if not options['keep']:
+                benchmark.cleanup(run)
+
+        votes = report["views"].get("vote_candidate", {}).get("requests", 0)
+        self.stdout.write(f"Wall time: {report['wall_seconds']}s, votes/s: {votes / wall if wall else 0:.1f}")
+        self.write_views(report)
+        chain = report["chain"]
+        style = self.style.SUCCESS if not (chain["bad_hashes"] or chain["broken_links"]) else self.style.ERROR
+        self.stdout.write(style(
+            f"Chain: {chain['votes']} votes, {chain['bad_hashes']} bad hashes, {chain['broken_links']} broken links"
+        ))
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+    def handle_reads(self, options):
+        modes = ('wsgi', 'asgi') if options['mode'] == 'both' else (options['mode'],)
+        self.stdout.write(f"Seeding {options['voters']} voters on {connection.vendor}...")
+        run = benchmark.seed(
+            voters=options['voters'],
+            elections=options['elections'],
+            positions=options['positions'],
+            candidates=options['candidates'],
+        )
+        reports = {}
+        try:
+            for mode in modes:
+                recorder, wall = benchmark.drive_reads(
+                    run, mode=mode, concurrency=options['concurrency'], threads=options['threads'],
+                    polls=options['polls'], db_latency_ms=options['db_latency_ms'],
+                )
+                report = reports[mode] = benchmark.summarize(recorder, wall)
+                requests = sum(stats['requests'] for stats in report['views'].values())
+                label = f"wsgi, {options['threads']} threads" if mode == 'wsgi' else "asgi, 1 event loop"
+                self.stdout.write(
+                    f"{label}: {options['concurrency']} concurrent voters, wall {report['wall_seconds']}s, "
+                    f"{requests / wall if wall else 0:.1f} req/s"
+                )
+                self.write_views(report)
+        finally:
+            if not options['keep']:
+                benchmark.cleanup(run)
+
+        if options['json_path']:
+            params = ('voters', 'elections', 'positions', 'candidates', 'concurrency', 'threads', 'polls', 'db_latency_ms')
+            with open(options['json_path'], 'w') as f:
+                json.dump({
+                    "database": connection.vendor,
+                    "parameters": {k: options[k] for k in params},
+                    "modes": reports,
+                }, f, indent=2)
+
+    def write_views(self, report):
+        for view, stats in report["views"].items():
+            line = (
+                f"  {view:<26} n={stats['requests']:<6} err={stats['errors']:<4} "
+                f"p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms"
+            )
+            if stats['avg_queries'] is not None:
+                line += f" queries avg={stats['avg_queries']} max={stats['max_queries']}"
+            self.stdout.write(line)
+            for exception, count in stats['exceptions'].items():
+                self.stdout.write(self.style.ERROR(f"    {count} x {exception}"))
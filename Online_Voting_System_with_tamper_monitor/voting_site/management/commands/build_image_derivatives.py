@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from voting_site import images
+from voting_site.models import Voter, Candidate
+from voting_site.signals import IMAGE_FIELDS
+
+
+class Command(BaseCommand):
+    help = "Build resized WebP/JPEG derivatives for every voter and candidate photo that has none yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Re-check photos that already have a digest.")
+
+    def handle(self, *args, **options):
+        futures = []
+        for model in (Voter, Candidate):
+            field_name, digest_path = IMAGE_FIELDS[model]
+            rows = model.objects.exclude(**{field_name: ''}).exclude(**{f"{field_name}__isnull": True})
+            if not options['all']:
+                rows = rows.filter(Q(**{digest_path: ''}) | Q(**{f"{digest_path}__isnull": True}))
+            for pk in rows.values_list('pk', flat=True).iterator():
+                futures.append(images.schedule(model, pk, field_name, digest_path))
+
+        done = sum(1 for f in futures if f.result())
+        self.stdout.write(self.style.SUCCESS(f"Processed {done} of {len(futures)} photos."))
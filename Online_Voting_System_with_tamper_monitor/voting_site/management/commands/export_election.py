@@ -0,0 +1,46 @@
+import os
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from voting_site import exports
+from voting_site.models import Election
+
+
+class Command(BaseCommand):
+    help = (
+        "Export an election's votes (with vote_hash/previous_vote_hash), tallies and registrations "
+        "as CSV or JSON Lines, streamed in constant memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('election_id', type=int)
+        parser.add_argument('--dataset', choices=sorted(exports.DATASETS) + ['all'], default='all')
+        parser.add_argument('--format', choices=sorted(exports.FORMATS), default='csv')
+        parser.add_argument('--gzip', action='store_true', help="Compress the output on the fly.")
+        parser.add_argument('--output', default='.',
+                            help="Directory to write election-<id>-<dataset>.<fmt>[.gz] files to, or '-' for stdout.")
+        parser.add_argument('--chunk-size', type=int, default=exports.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        election_id = options['election_id']
+        if not Election.objects.filter(pk=election_id).exists():
+            raise CommandError(f"Election {election_id} does not exist")
+        datasets = sorted(exports.DATASETS) if options['dataset'] == 'all' else [options['dataset']]
+        fmt, compress = options['format'], options['gzip']
+
+        if options['output'] == '-':
+            if len(datasets) > 1:
+                raise CommandError("--output - needs a single --dataset")
+            for block in exports.export_stream(election_id, datasets[0], fmt, compress, options['chunk_size']):
+                sys.stdout.buffer.write(block)
+            sys.stdout.buffer.flush()
+            return
+
+        os.makedirs(options['output'], exist_ok=True)
+        for dataset in datasets:
+            path = os.path.join(options['output'], exports.export_filename(election_id, dataset, fmt, compress))
+            written = 0
+            with open(path, 'wb') as f:
+                for block in exports.export_stream(election_id, dataset, fmt, compress, options['chunk_size']):
+                    f.write(block)
+                    written += len(block)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {path} ({written} bytes)"))
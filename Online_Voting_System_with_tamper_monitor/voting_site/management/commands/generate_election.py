@@ -0,0 +1,203 @@
+import itertools
+import json
+import math
+import random
+import time
+import uuid
+from datetime import timedelta
+from statistics import NormalDist
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from voting_site import journal, turnout
+from voting_site.hashing import chain_hashes
+from voting_site.models import Voter, Election, ElectionVoter, Position, Candidate, Vote, assign_bulk_vote_ids, lock_chain_heads
+from voting_site.versioning import bump_election_version, bump_elections_list_version
+
+
+# ---------------------- Vote-time distributions ----------------------
+# Each maps a uniform u in [0, 1) to a fraction of the voting window and is
+# monotonic, so feeding it sorted uniforms yields sorted timestamps.
+
+def _uniform(u):
+    return u
+
+
+def _rush(u, k=5.0):
+    # Exponential decay from the opening bell: most ballots land early.
+    return -math.log(1 - u * (1 - math.exp(-k))) / k
+
+
+_MIDDAY = NormalDist(0.5, 0.15)
+_MIDDAY_LO, _MIDDAY_HI = _MIDDAY.cdf(0.0), _MIDDAY.cdf(1.0)
+
+
+def _midday(u):
+    # Normal peak in the middle of the window, truncated to [0, 1].
+    return _MIDDAY.inv_cdf(_MIDDAY_LO + u * (_MIDDAY_HI - _MIDDAY_LO))
+
+
+DISTRIBUTIONS = {"uniform": _uniform, "rush": _rush, "midday": _midday}
+
+
+def sorted_uniforms(n, rng):
+    """Yield n sorted uniform samples in O(1) memory (descending order-statistics trick)."""
+    current = 1.0
+    for remaining in range(n, 0, -1):
+        current *= rng.random() ** (1.0 / remaining)
+        # `current` walks downwards; 1 - current walks upwards and is still uniform.
+        yield 1.0 - current
+
+
+def chunked(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic election with voters, approved registrations, positions, candidates "
+        "and a correctly hash-chained vote history, written with bulk_create in chunks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--voters', type=int, default=10000)
+        parser.add_argument('--positions', type=int, default=5)
+        parser.add_argument('--candidates', type=int, default=4, help="Candidates per position.")
+        parser.add_argument('--turnout', type=float, default=0.8, help="Fraction of voters who cast a ballot.")
+        parser.add_argument('--distribution', choices=sorted(DISTRIBUTIONS), default='uniform',
+                            help="How vote times are spread over the voting window.")
+        parser.add_argument('--start', help="Voting start (ISO 8601). Default: --hours before now.")
+        parser.add_argument('--hours', type=float, default=12.0, help="Length of the voting window.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--name', help="Election name. Default: generated-<tag>.")
+        parser.add_argument('--json', action='store_true', help="Print a JSON summary for downstream benchmarks.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        tag = uuid.UUID(int=rng.getrandbits(128)).hex[:10]
+        chunk_size = options['chunk_size']
+        time_of = DISTRIBUTIONS[options['distribution']]
+        if not 0 <= options['turnout'] <= 1:
+            raise CommandError("--turnout must be between 0 and 1")
+
+        window = timedelta(hours=options['hours'])
+        if options['start']:
+            start = parse_datetime(options['start'])
+            if start is None:
+                raise CommandError("--start must be an ISO 8601 datetime")
+            if timezone.is_naive(start):
+                start = timezone.make_aware(start)
+        else:
+            start = timezone.now() - window
+        end = start + window
+        started = time.perf_counter()
+
+        # --- Election, positions, candidates ---
+        election = Election(
+            election_name=options['name'] or f"generated-{tag}",
+            start_date=start,
+            end_date=end,
+            candidate_deadline=start,
+            description=f"Synthetic election (seed={options['seed']}, distribution={options['distribution']})",
+        )
+        election.status = election.scheduled_status()
+        election.save()
+        Position.objects.bulk_create([
+            Position(election=election, position_name=f"Position {i + 1}")
+            for i in range(options['positions'])
+        ])
+        positions = list(Position.objects.filter(election=election).order_by('position_id'))
+        Candidate.objects.bulk_create([
+            Candidate(position=p, candidate_name=f"Candidate {p.position_id}-{c + 1}", is_approved=True)
+            for p in positions for c in range(options['candidates'])
+        ])
+        # Uneven popularity so tallies are not flat
+        ballot = []
+        for p in positions:
+            candidate_ids = list(p.candidates.order_by('candidate_id').values_list('candidate_id', flat=True))
+            weights = list(itertools.accumulate(rng.random() + 0.1 for _ in candidate_ids))
+            ballot.append((p.position_id, candidate_ids, weights))
+
+        # --- Voters and approved registrations ---
+        password_hash = make_password("generated")
+        for chunk in chunked(range(options['voters']), chunk_size):
+            with transaction.atomic():
+                Voter.objects.bulk_create([
+                    Voter(name=f"Voter {i}", email=f"gen-{tag}-{i}@example.com", password_hash=password_hash)
+                    for i in chunk
+                ])
+        voter_ids = list(
+            Voter.objects.filter(email__startswith=f"gen-{tag}-").order_by('voter_id').values_list('voter_id', flat=True)
+        )
+        for chunk in chunked(voter_ids, chunk_size):
+            ElectionVoter.objects.bulk_create([
+                ElectionVoter(voter_id=v, election=election, is_approved=True) for v in chunk
+            ])
+
+        # --- Hash-chained votes, in timestamp order ---
+        rng.shuffle(voter_ids)
+        participants = [v for v in voter_ids if rng.random() < options['turnout']]
+        total_votes = len(participants) * len(ballot)
+
+        def ballots():
+            fractions = sorted_uniforms(total_votes, rng)
+            for voter_id in participants:
+                for position_id, candidate_ids, weights in ballot:
+                    candidate_id = rng.choices(candidate_ids, cum_weights=weights)[0]
+                    yield voter_id, position_id, candidate_id, start + window * time_of(next(fractions))
+
+        written = 0
+        for chunk in chunked(ballots(), chunk_size):
+            with transaction.atomic():
+                prev_hash = lock_chain_heads([election.election_id])[election.election_id]
+                chained = chain_hashes(
+                    [(voter_id, election.election_id, position_id, candidate_id, ts) for voter_id, position_id, candidate_id, ts in chunk],
+                    prev_hash,
+                )
+                votes = [
+                    Vote(
+                        voter_id=voter_id, election=election, position_id=position_id, candidate_id=candidate_id,
+                        timestamp=ts, previous_vote_hash=previous_vote_hash, vote_hash=vote_hash,
+                    )
+                    for (voter_id, position_id, candidate_id, ts), (previous_vote_hash, vote_hash) in zip(chunk, chained)
+                ]
+                Vote.objects.bulk_create(votes)
+                turnout.record_votes(votes)
+            journal.append_votes(assign_bulk_vote_ids(votes))
+            written += len(votes)
+            if options['verbosity'] > 1:
+                self.stdout.write(f"  {written}/{total_votes} votes")
+
+        # bulk_create skips signals
+        bump_election_version(election.election_id)
+        bump_election_version(election.election_id, 'results')
+        bump_elections_list_version()
+
+        summary = {
+            "election_id": election.election_id,
+            "election_name": election.election_name,
+            "status": election.status,
+            "voters": len(voter_ids),
+            "positions": len(positions),
+            "candidates_per_position": options['candidates'],
+            "votes": written,
+            "seed": options['seed'],
+            "distribution": options['distribution'],
+            "seconds": round(time.perf_counter() - started, 2),
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(summary))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Election {summary['election_id']} '{summary['election_name']}': "
+                f"{summary['voters']} voters, {summary['positions']} positions, "
+                f"{summary['votes']} votes in {summary['seconds']}s"
+            ))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from voting_site.models import Election
+from voting_site.turnout import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount has_voted/voted_positions of every registration and the per-election "
+        "turnout counters from the votes, fixing any that drifted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('election_ids', nargs='*', type=int, help="Elections to recount (default: all).")
+
+    def handle(self, *args, **options):
+        election_ids = options['election_ids'] or list(
+            Election.objects.order_by('election_id').values_list('election_id', flat=True)
+        )
+        drifted = 0
+        for election_id in election_ids:
+            result = reconcile(election_id)
+            if result['stale_registrations'] or result['turnout_changed']:
+                drifted += 1
+                self.stdout.write(self.style.WARNING(
+                    f"Election {election_id}: fixed {result['stale_registrations']} registration(s); "
+                    f"turnout now {result['voters_voted']} voters, {result['votes_cast']} votes"
+                ))
+            elif options['verbosity'] > 1:
+                self.stdout.write(
+                    f"Election {election_id}: {result['voters_voted']} voters, {result['votes_cast']} votes"
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled {len(election_ids)} election(s); {drifted} had drifted."
+        ))
@@ -0,0 +1,24 @@
+import signal
+import threading
+from django.core.management.base import BaseCommand
+from voting_site.monitors import start_monitors, stop_monitors
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the status scheduler, the queued-vote chain writer and the tamper monitors in this "
+        "process. Run exactly one next to gunicorn/uwsgi/ASGI workers, which do not start them."
+    )
+
+    def handle(self, *args, **options):
+        stop_event = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+
+        start_monitors()
+        print("[INFO] Monitors running; Ctrl+C to stop.")
+        try:
+            while not stop_event.wait(1):
+                pass
+        except KeyboardInterrupt:
+            pass
+        stop_monitors()
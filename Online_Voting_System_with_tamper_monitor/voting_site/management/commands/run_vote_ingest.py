@@ -0,0 +1,30 @@
+import threading
+from django.core.management.base import BaseCommand
+from voting_site.ingest import drain_once, run_chain_writer
+
+
+class Command(BaseCommand):
+    help = "Run the queued-ingestion chain writer (VOTE_INGEST_MODE = 'queue')."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--drain', action='store_true',
+            help="Commit everything currently queued and exit instead of running forever.",
+        )
+
+    def handle(self, *args, **options):
+        if options['drain']:
+            total = 0
+            while True:
+                processed = drain_once()
+                if not processed:
+                    break
+                total += processed
+            self.stdout.write(self.style.SUCCESS(f"Processed {total} queued ballot(s)."))
+            return
+
+        stop_event = threading.Event()
+        try:
+            run_chain_writer(stop_event)
+        except KeyboardInterrupt:
+            stop_event.set()
@@ -0,0 +1,28 @@
+import threading
+from django.core.management.base import BaseCommand
+from voting_site.scheduler import apply_status_transitions, run_status_scheduler
+
+
+class Command(BaseCommand):
+    help = "Move elections between upcoming/running/closed based on their start and end dates."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep running and wake at each start/end boundary instead of exiting.",
+        )
+
+    def handle(self, *args, **options):
+        if options['loop']:
+            stop_event = threading.Event()
+            try:
+                run_status_scheduler(stop_event)
+            except KeyboardInterrupt:
+                stop_event.set()
+            return
+
+        changed = apply_status_transitions()
+        if not changed:
+            self.stdout.write("All election statuses are up to date.")
+        for status, ids in changed.items():
+            self.stdout.write(self.style.SUCCESS(f"{len(ids)} election(s) -> {status}: {ids}"))
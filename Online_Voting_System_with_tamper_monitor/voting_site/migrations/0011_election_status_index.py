@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:07
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_status(apps, schema_editor):
+    Election = apps.get_model('voting_site', 'Election')
+    now = timezone.now()
+    Election.objects.filter(start_date__gt=now).update(status='upcoming')
+    Election.objects.filter(start_date__lte=now, end_date__gte=now).update(status='running')
+    Election.objects.filter(end_date__lt=now).update(status='closed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting_site', '0010_election_is_paused_alter_election_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='election',
+            name='status',
+            field=models.CharField(choices=[('upcoming', 'Upcoming'), ('running', 'Running'), ('closed', 'Closed')], db_index=True, default='upcoming', max_length=10),
+        ),
+        migrations.RunPython(backfill_status, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting_site', '0011_election_status_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoteSubmission',
+            fields=[
+                ('submission_id', models.AutoField(primary_key=True, serialize=False)),
+                ('token', models.CharField(max_length=64)),
+                ('redirect_url', models.CharField(max_length=255)),
+                ('message', models.CharField(max_length=255)),
+                ('message_level', models.PositiveSmallIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('vote', models.ForeignKey(blank=True, db_column='vote_id', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='submissions', to='voting_site.vote')),
+                ('voter', models.ForeignKey(db_column='voter_id', on_delete=django.db.models.deletion.CASCADE, related_name='vote_submissions', to='voting_site.voter')),
+            ],
+            options={
+                'db_table': 'vote_submissions',
+                'unique_together': {('voter', 'token')},
+            },
+        ),
+    ]
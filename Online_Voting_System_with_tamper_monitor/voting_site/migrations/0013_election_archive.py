@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:21
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting_site', '0012_vote_submission'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedVote',
+            fields=[
+                ('vote_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('election_id', models.IntegerField()),
+                ('voter_id', models.IntegerField()),
+                ('position_id', models.IntegerField()),
+                ('candidate_id', models.IntegerField()),
+                ('timestamp', models.DateTimeField()),
+                ('vote_hash', models.CharField(blank=True, max_length=64, null=True)),
+                ('previous_vote_hash', models.CharField(blank=True, max_length=64, null=True)),
+            ],
+            options={
+                'db_table': 'votes_archive',
+                'indexes': [models.Index(fields=['election_id', 'vote_id'], name='votes_archive_election')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ElectionArchive',
+            fields=[
+                ('archive_id', models.AutoField(primary_key=True, serialize=False)),
+                ('vote_count', models.PositiveIntegerField()),
+                ('first_vote_id', models.IntegerField(blank=True, null=True)),
+                ('last_vote_id', models.IntegerField(blank=True, null=True)),
+                ('final_chain_hash', models.CharField(blank=True, max_length=64)),
+                ('merkle_root', models.CharField(max_length=64)),
+                ('tallies', models.JSONField(default=list)),
+                ('tampered_votes', models.JSONField(default=list)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('election', models.OneToOneField(db_column='election_id', on_delete=django.db.models.deletion.CASCADE, related_name='archive', to='voting_site.election')),
+            ],
+            options={
+                'db_table': 'election_archives',
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:40
+
+import django.db.models.deletion
+from django.db import migrations, models, transaction
+from django.db.models import OuterRef, Subquery
+
+BACKFILL_CHUNK = 10000
+
+
+def backfill_vote_election(apps, schema_editor):
+    """Copy position.election_id onto every vote, one vote_id range per transaction."""
+    Vote = apps.get_model('voting_site', 'Vote')
+    Position = apps.get_model('voting_site', 'Position')
+    bounds = Vote.objects.aggregate(lo=models.Min('vote_id'), hi=models.Max('vote_id'))
+    if bounds['lo'] is None:
+        return
+    election_of_position = Subquery(Position.objects.filter(pk=OuterRef('position_id')).values('election_id')[:1])
+    for start in range(bounds['lo'], bounds['hi'] + 1, BACKFILL_CHUNK):
+        with transaction.atomic():
+            Vote.objects.filter(
+                vote_id__gte=start, vote_id__lt=start + BACKFILL_CHUNK, election__isnull=True,
+            ).update(election=election_of_position)
+
+
+class Migration(migrations.Migration):
+    # The backfill commits chunk by chunk instead of holding one huge transaction
+    atomic = False
+
+    dependencies = [
+        ('voting_site', '0013_election_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='election',
+            field=models.ForeignKey(db_column='election_id', db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='votes', to='voting_site.election'),
+        ),
+        migrations.RunPython(backfill_vote_election, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='vote',
+            name='election',
+            field=models.ForeignKey(db_column='election_id', db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='votes', to='voting_site.election'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['election', 'vote_id'], name='votes_election_chain'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['election', 'position', 'candidate'], name='votes_election_tally'),
+        ),
+    ]
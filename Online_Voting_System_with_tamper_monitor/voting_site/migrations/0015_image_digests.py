@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting_site', '0014_vote_election'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidate',
+            name='candidate_image_digest',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='voter',
+            name='voter_image_digest',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
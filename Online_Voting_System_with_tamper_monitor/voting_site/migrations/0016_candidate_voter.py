@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:05
+
+import django.db.models.deletion
+from collections import defaultdict
+from django.db import migrations, models
+
+
+def backfill_candidate_voter(apps, schema_editor):
+    """
+    Link existing candidates to the voter who applied, by name among the
+    voters registered for the candidate's election. Ambiguous names (two
+    registered voters called the same) and admin-entered candidates stay
+    unlinked, as does a second row for the same voter and position.
+    """
+    Candidate = apps.get_model('voting_site', 'Candidate')
+    ElectionVoter = apps.get_model('voting_site', 'ElectionVoter')
+
+    voters_by_name = defaultdict(list)  # (election_id, name) -> [voter_id]
+    for election_id, voter_id, name in ElectionVoter.objects.values_list('election_id', 'voter_id', 'voter__name').distinct():
+        voters_by_name[(election_id, name)].append(voter_id)
+
+    taken = set()
+    updates = []
+    for candidate in Candidate.objects.filter(voter__isnull=True).select_related('position').order_by('candidate_id'):
+        matches = voters_by_name.get((candidate.position.election_id, candidate.candidate_name), [])
+        if len(matches) != 1 or (candidate.position_id, matches[0]) in taken:
+            continue
+        taken.add((candidate.position_id, matches[0]))
+        candidate.voter_id = matches[0]
+        updates.append(candidate)
+    Candidate.objects.bulk_update(updates, ['voter'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting_site', '0015_image_digests'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidate',
+            name='voter',
+            field=models.ForeignKey(blank=True, db_column='voter_id', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='candidacies', to='voting_site.voter'),
+        ),
+        migrations.RunPython(backfill_candidate_voter, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='candidate',
+            constraint=models.UniqueConstraint(fields=('position', 'voter'), name='candidates_position_voter'),
+        ),
+    ]
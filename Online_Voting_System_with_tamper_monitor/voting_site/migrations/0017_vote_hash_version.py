@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Existing votes were hashed with the legacy text encoding (one chain across
+    all elections), so they are marked hash_version=1 and keep verifying with
+    it. New votes default to version 2 (voting_site.hashing).
+    """
+
+    dependencies = [
+        ('voting_site', '0016_candidate_voter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='hash_version',
+            field=models.PositiveSmallIntegerField(default=1, editable=False),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='archivedvote',
+            name='hash_version',
+            field=models.PositiveSmallIntegerField(default=1),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='vote',
+            name='hash_version',
+            field=models.PositiveSmallIntegerField(default=2, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='archivedvote',
+            name='hash_version',
+            field=models.PositiveSmallIntegerField(default=2),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:04
+
+import django.db.models.deletion
+from collections import Counter
+from django.db import migrations, models
+
+
+def backfill_turnout(apps, schema_editor):
+    """
+    Count the votes already cast into the new counters: each registration's
+    voted_positions and has_voted, and one ElectionTurnout row per election.
+    Archived elections are counted from votes_archive.
+    """
+    Election = apps.get_model('voting_site', 'Election')
+    ElectionArchive = apps.get_model('voting_site', 'ElectionArchive')
+    ElectionTurnout = apps.get_model('voting_site', 'ElectionTurnout')
+    ElectionVoter = apps.get_model('voting_site', 'ElectionVoter')
+    Vote = apps.get_model('voting_site', 'Vote')
+    ArchivedVote = apps.get_model('voting_site', 'ArchivedVote')
+
+    archived = set(ElectionArchive.objects.values_list('election_id', flat=True))
+    counts = Counter()  # (election_id, voter_id) -> votes
+    for model, keep in ((Vote, lambda e: e not in archived), (ArchivedVote, lambda e: e in archived)):
+        rows = model.objects.values_list('election_id', 'voter_id').annotate(n=models.Count('*')).order_by()
+        counts.update({(e, v): n for e, v, n in rows if keep(e)})
+
+    updates = []
+    for registration in ElectionVoter.objects.only('election_voter_id', 'election_id', 'voter_id').iterator():
+        voted = counts.get((registration.election_id, registration.voter_id), 0)
+        registration.voted_positions = voted
+        registration.has_voted = voted > 0
+        updates.append(registration)
+    ElectionVoter.objects.bulk_update(updates, ['voted_positions', 'has_voted'], batch_size=1000)
+
+    voters_voted, votes_cast = Counter(), Counter()
+    for registration in updates:
+        voters_voted[registration.election_id] += registration.has_voted
+    for (election_id, _), n in counts.items():
+        votes_cast[election_id] += n
+    ElectionTurnout.objects.bulk_create([
+        ElectionTurnout(election_id=election_id, voters_voted=voters_voted[election_id], votes_cast=votes_cast[election_id])
+        for election_id in Election.objects.values_list('election_id', flat=True)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting_site', '0017_vote_hash_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ElectionTurnout',
+            fields=[
+                ('election', models.OneToOneField(db_column='election_id', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='turnout', serialize=False, to='voting_site.election')),
+                ('voters_voted', models.PositiveIntegerField(default=0)),
+                ('votes_cast', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'election_turnout',
+            },
+        ),
+        migrations.AddField(
+            model_name='electionvoter',
+            name='voted_positions',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_turnout, migrations.RunPython.noop),
+    ]
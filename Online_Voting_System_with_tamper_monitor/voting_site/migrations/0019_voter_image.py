@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def move_digests(apps, schema_editor):
+    """Copy the digests already recorded on voters into voter_images."""
+    Voter = apps.get_model('voting_site', 'Voter')
+    VoterImage = apps.get_model('voting_site', 'VoterImage')
+    VoterImage.objects.bulk_create(
+        [VoterImage(voter_id=voter_id, digest=digest)
+         for voter_id, digest in Voter.objects.exclude(voter_image_digest='').values_list('voter_id', 'voter_image_digest')],
+        batch_size=1000,
+    )
+
+
+def restore_digests(apps, schema_editor):
+    Voter = apps.get_model('voting_site', 'Voter')
+    VoterImage = apps.get_model('voting_site', 'VoterImage')
+    for voter_id, digest in VoterImage.objects.values_list('voter_id', 'digest').iterator():
+        Voter.objects.filter(pk=voter_id).update(voter_image_digest=digest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting_site', '0018_election_turnout'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoterImage',
+            fields=[
+                ('voter', models.OneToOneField(db_column='voter_id', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='image', serialize=False, to='voting_site.voter')),
+                ('digest', models.CharField(max_length=64)),
+            ],
+            options={
+                'db_table': 'voter_images',
+            },
+        ),
+        migrations.RunPython(move_digests, restore_digests),
+        migrations.RemoveField(
+            model_name='voter',
+            name='voter_image_digest',
+        ),
+    ]
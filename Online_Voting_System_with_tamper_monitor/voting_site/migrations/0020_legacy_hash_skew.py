@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:20
+
+from django.db import migrations, models
+from voting_site.hashing import LEGACY_VERSION, find_legacy_skew
+
+
+def find_skews(apps, schema_editor):
+    """
+    Find, once, how early each legacy vote's hash was made, so verification
+    hashes every row once instead of searching the clock skew window. Rows
+    that do not match anywhere in the window get no entry and stay flagged.
+    """
+    LegacyHashSkew = apps.get_model('voting_site', 'LegacyHashSkew')
+    skews = []
+    for model_name in ('Vote', 'ArchivedVote'):
+        model = apps.get_model('voting_site', model_name)
+        rows = (
+            model.objects.filter(hash_version=LEGACY_VERSION)
+            .values_list('vote_id', 'voter_id', 'position_id', 'candidate_id', 'timestamp', 'previous_vote_hash', 'vote_hash')
+            .iterator(chunk_size=5000)
+        )
+        for vote_id, voter_id, position_id, candidate_id, timestamp, previous_hash, vote_hash in rows:
+            micros = find_legacy_skew(voter_id, position_id, candidate_id, timestamp, previous_hash, vote_hash)
+            if micros:
+                skews.append(LegacyHashSkew(vote_id=vote_id, micros=micros))
+    LegacyHashSkew.objects.bulk_create(skews, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting_site', '0019_voter_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LegacyHashSkew',
+            fields=[
+                ('vote_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('micros', models.PositiveIntegerField()),
+            ],
+            options={
+                'db_table': 'legacy_hash_skews',
+            },
+        ),
+        migrations.RunPython(find_skews, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,62 @@
-import hashlib
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
+from . import hashing
+
+
+def chain_head_hash(election_id):
+    """vote_hash at the head of an election's chain, counting archived votes."""
+    heads = [
+        head for head in (
+            Vote.objects.filter(election_id=election_id).order_by('-vote_id').values_list('vote_id', 'vote_hash').first(),
+            ArchivedVote.objects.filter(election_id=election_id).order_by('-vote_id').values_list('vote_id', 'vote_hash').first(),
+        ) if head
+    ]
+    return (max(heads)[1] or '') if heads else ''
+
+
+def lock_chain_heads(election_ids):
+    """
+    {election_id: chain_head_hash} with each election's chain locked until
+    the transaction ends. Every insert into a chain first locks the
+    election's ElectionTurnout row (in election_id order), so two
+    transactions cannot both chain onto the same head. Call inside
+    transaction.atomic().
+    """
+    election_ids = sorted(set(election_ids))
+    locked = ElectionTurnout.objects.select_for_update().filter(election_id__in=election_ids).order_by('election_id')
+    found = set(locked.values_list('election_id', flat=True))
+    missing = [e for e in election_ids if e not in found]
+    if missing:
+        for election_id in Election.objects.filter(pk__in=missing).values_list('election_id', flat=True):
+            ElectionTurnout.objects.get_or_create(election_id=election_id)
+        list(locked.filter(election_id__in=missing).values_list('election_id', flat=True))
+    return {election_id: chain_head_hash(election_id) for election_id in election_ids}
+
+
+def election_tally_counts(election_id, using='default'):
+    """{(position_id, candidate_id): votes} for an election, live or archived."""
+    archive = ElectionArchive.objects.using(using).filter(election_id=election_id).first()
+    if archive:
+        return archive.tally_counts()
+    return {
+        (position_id, candidate_id): votes
+        for position_id, candidate_id, votes in Vote.objects.using(using).filter(election_id=election_id)
+        .values('position_id', 'candidate_id')
+        .annotate(votes=models.Count('vote_id'))
+        .values_list('position_id', 'candidate_id', 'votes')
+    }
+
+
+def assign_bulk_vote_ids(votes):
+    """
+    Fill in vote_id on Vote objects saved with bulk_create, for backends
+    (MySQL) that do not return primary keys from a bulk insert.
+    """
+    missing = {v.vote_hash: v for v in votes if v.pk is None}
+    if missing:
+        for vote_hash, vote_id in Vote.objects.filter(vote_hash__in=list(missing)).values_list('vote_hash', 'vote_id'):
+            missing[vote_hash].pk = vote_id
+    return votes
 
 
 class Voter(models.Model):
@@ -19,6 +75,21 @@ class Voter(models.Model):
         return f"{self.name} ({'Admin' if self.is_admin else 'Voter'})"
 
 
+class VoterImage(models.Model):
+    """
+    Digest of a voter's photo, set by voting_site.images once its derivatives
+    exist. Kept out of `voters`, whose rows the tamper detector watches.
+    """
+    voter = models.OneToOneField(Voter, on_delete=models.CASCADE, primary_key=True, db_column="voter_id", related_name="image")
+    digest = models.CharField(max_length=64)
+
+    class Meta:
+        db_table = "voter_images"
+
+    def __str__(self):
+        return f"Photo of voter {self.voter_id}"
+
+
 class Election(models.Model):
     election_id = models.AutoField(primary_key=True)
     election_name = models.CharField(max_length=255)
@@ -31,7 +102,7 @@ class Election(models.Model):
         ('running', 'Running'),
         ('closed', 'Closed'),
     ]
-    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="upcoming")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="upcoming", db_index=True)  # kept in sync by voting_site.scheduler
     is_paused = models.BooleanField(default=False)  # Admin can pause/resume election
     description = models.TextField(blank=True, null=True)
 
@@ -54,8 +125,11 @@ class Election(models.Model):
         """
         if self.is_paused:
             return 'paused'
+        return self.scheduled_status()
 
-        now = timezone.now()
+    def scheduled_status(self, now=None):
+        """Return 'upcoming', 'running' or 'closed' from the dates alone (ignores pause)."""
+        now = now or timezone.now()
         if now < self.start_date:
             return 'upcoming'
         elif self.start_date <= now <= self.end_date:
@@ -91,14 +165,22 @@ class Candidate(models.Model):
         Position, on_delete=models.CASCADE, db_column="position_id", related_name="candidates"
     )
     candidate_name = models.CharField(max_length=255)
+    # The voter who applied; empty for candidates entered by an admin
+    voter = models.ForeignKey(
+        Voter, on_delete=models.CASCADE, db_column="voter_id", related_name="candidacies", null=True, blank=True
+    )
     party = models.CharField(max_length=255, blank=True, null=True)
     candidate_image = models.ImageField(upload_to='candidate_images/', blank=True, null=True)
+    candidate_image_digest = models.CharField(max_length=64, blank=True, editable=False)  # set by voting_site.images
     description = models.TextField(blank=True, null=True)
     is_approved = models.BooleanField(default=False)  # <--- add this field
 
     class Meta:
         db_table = "candidates"
         ordering = ["candidate_name"]
+        constraints = [
+            models.UniqueConstraint(fields=["position", "voter"], name="candidates_position_voter"),
+        ]
 
     def __str__(self):
         return f"{self.candidate_name} ({self.party if self.party else 'Independent'})"
@@ -110,7 +192,9 @@ class ElectionVoter(models.Model):
     election_voter_id = models.AutoField(primary_key=True)
     voter = models.ForeignKey(Voter, on_delete=models.CASCADE, db_column="voter_id", related_name="election_participations")
     election = models.ForeignKey(Election, on_delete=models.CASCADE, db_column="election_id", related_name="voters")
+    # Maintained by voting_site.turnout in the transaction that records the votes
     has_voted = models.BooleanField(default=False)
+    voted_positions = models.PositiveIntegerField(default=0)
     is_approved = models.BooleanField(default=False)
 
     class Meta:
@@ -121,33 +205,158 @@ class ElectionVoter(models.Model):
         return f"{self.voter.name} → {self.election.election_name}"
 
 
+class ElectionTurnout(models.Model):
+    """
+    Running vote counters of one election, maintained by voting_site.turnout
+    in the transaction that records the votes.
+    """
+    election = models.OneToOneField(
+        Election, on_delete=models.CASCADE, primary_key=True, db_column="election_id", related_name="turnout"
+    )
+    voters_voted = models.PositiveIntegerField(default=0)  # registrations with has_voted
+    votes_cast = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = "election_turnout"
+
+    def __str__(self):
+        return f"Election {self.election_id}: {self.voters_voted} voters, {self.votes_cast} votes"
+
+
 class Vote(models.Model):
     vote_id = models.AutoField(primary_key=True)
     voter = models.ForeignKey(Voter, on_delete=models.CASCADE, db_column="voter_id", related_name="votes")
     position = models.ForeignKey(Position, on_delete=models.CASCADE, db_column="position_id", related_name="votes")
     candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE, db_column="candidate_id", related_name="votes")
+    # Copy of position.election, set on insert, so per-election scans hit one index instead of joining
+    election = models.ForeignKey(Election, on_delete=models.CASCADE, db_column="election_id", related_name="votes", db_index=False)
     timestamp = models.DateTimeField(default=timezone.now)
 
     # New fields for hash-based tamper-proofing
     vote_hash = models.CharField(max_length=64, editable=False, blank=True, null=True)
     previous_vote_hash = models.CharField(max_length=64, blank=True, null=True)
+    hash_version = models.PositiveSmallIntegerField(default=hashing.CURRENT_VERSION, editable=False)  # see voting_site.hashing
 
     class Meta:
         db_table = "votes"
         unique_together = ("voter", "position")  # voter can only vote once per position
+        indexes = [
+            models.Index(fields=["election", "vote_id"], name="votes_election_chain"),
+            models.Index(fields=["election", "position", "candidate"], name="votes_election_tally"),
+        ]
 
     def __str__(self):
         return f"{self.voter.name} voted {self.candidate.candidate_name} for {self.position.position_name}"
 
     def save(self, *args, **kwargs):
-        # Compute previous hash from the latest vote
-        if not self.vote_hash:
-            last_vote = Vote.objects.order_by('-vote_id').first()
-            prev_hash = last_vote.vote_hash if last_vote else ''
+        if self.election_id is None:
+            self.election_id = self.position.election_id
+
+        if self.vote_hash:
+            super().save(*args, **kwargs)
+            return
+
+        # Chain onto the election's latest vote, holding the chain locked until commit
+        with transaction.atomic(savepoint=False):
+            prev_hash = lock_chain_heads([self.election_id])[self.election_id]
             self.previous_vote_hash = prev_hash
+            self.hash_version = hashing.CURRENT_VERSION
 
-            # Create hash for this vote
-            vote_data = f"{self.voter_id}-{self.position_id}-{self.candidate_id}-{self.timestamp.isoformat()}-{prev_hash}"
-            self.vote_hash = hashlib.sha256(vote_data.encode()).hexdigest()
+            # Create hash for this vote, from the timestamp that is stored
+            self.vote_hash = self.compute_hash(prev_hash)
+            super().save(*args, **kwargs)
 
-        super().save(*args, **kwargs)
+    def compute_hash(self, prev_hash):
+        return hashing.hash_vote(
+            self.voter_id, self.election_id, self.position_id, self.candidate_id, self.timestamp,
+            prev_hash, self.hash_version,
+        )
+
+
+class LegacyHashSkew(models.Model):
+    """
+    How many microseconds before its stored timestamp a legacy (version 1)
+    vote's hash was made, for the rows where that is not zero. Filled once by
+    migration 0020. Keyed by vote_id without a foreign key, so archived votes
+    are covered and `votes` rows stay as they were.
+    """
+    vote_id = models.IntegerField(primary_key=True)
+    micros = models.PositiveIntegerField()
+
+    class Meta:
+        db_table = "legacy_hash_skews"
+
+    def __str__(self):
+        return f"Vote {self.vote_id}: hashed {self.micros} µs early"
+
+
+class VoteSubmission(models.Model):
+    """
+    Outcome of a vote request, stored under the client's request token so a
+    retried or double-clicked submission replays the same response instead
+    of voting (or failing) again.
+    """
+    submission_id = models.AutoField(primary_key=True)
+    voter = models.ForeignKey(Voter, on_delete=models.CASCADE, db_column="voter_id", related_name="vote_submissions")
+    token = models.CharField(max_length=64)
+    vote = models.ForeignKey(Vote, on_delete=models.SET_NULL, db_column="vote_id", blank=True, null=True, related_name="submissions")
+    redirect_url = models.CharField(max_length=255)
+    message = models.CharField(max_length=255)
+    message_level = models.PositiveSmallIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "vote_submissions"
+        unique_together = ("voter", "token")
+
+    def __str__(self):
+        return f"{self.voter_id}:{self.token}"
+
+
+class ElectionArchive(models.Model):
+    """
+    Seal of an archived election. Its votes were moved to votes_archive;
+    the Merkle root covers every archived row and the tallies are final.
+    """
+    archive_id = models.AutoField(primary_key=True)
+    election = models.OneToOneField(Election, on_delete=models.CASCADE, db_column="election_id", related_name="archive")
+    vote_count = models.PositiveIntegerField()
+    first_vote_id = models.IntegerField(blank=True, null=True)
+    last_vote_id = models.IntegerField(blank=True, null=True)
+    final_chain_hash = models.CharField(max_length=64, blank=True)
+    merkle_root = models.CharField(max_length=64)
+    tallies = models.JSONField(default=list)  # [[position_id, candidate_id, votes], ...]
+    tampered_votes = models.JSONField(default=list)  # vote_ids failing the chain check when sealed
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "election_archives"
+
+    def __str__(self):
+        return f"Archive of election {self.election_id} ({self.vote_count} votes)"
+
+    def tally_counts(self):
+        return {(p, c): n for p, c, n in self.tallies}
+
+
+class ArchivedVote(models.Model):
+    """
+    A vote moved out of `votes` when its election was archived. Plain integer
+    columns instead of foreign keys, so nothing can cascade into the archive.
+    """
+    vote_id = models.IntegerField(primary_key=True)
+    election_id = models.IntegerField()
+    voter_id = models.IntegerField()
+    position_id = models.IntegerField()
+    candidate_id = models.IntegerField()
+    timestamp = models.DateTimeField()
+    vote_hash = models.CharField(max_length=64, blank=True, null=True)
+    previous_vote_hash = models.CharField(max_length=64, blank=True, null=True)
+    hash_version = models.PositiveSmallIntegerField(default=hashing.CURRENT_VERSION)
+
+    class Meta:
+        db_table = "votes_archive"
+        indexes = [models.Index(fields=["election_id", "vote_id"], name="votes_archive_election")]
+
+    def __str__(self):
+        return f"Archived vote {self.vote_id} (election {self.election_id})"
@@ -0,0 +1,76 @@
+import os
+
+# Background work of the site:
+#
+#   - election status scheduler          (voting_site.scheduler)
+#   - queued-vote chain writer           (voting_site.ingest, VOTE_INGEST_MODE='queue')
+#   - table/binlog-file tamper detector  (tamper_monitor.detector)
+#   - MySQL binlog monitor, mails voters (Online_Voting_System.tamper_monitor)
+#
+# Each must run in exactly one process: two detectors race on their state
+# store and both alert, two binlog monitors mail every voter twice. So web
+# workers do not start them, except:
+#
+#   - `runserver` starts them in the process that serves (the autoreloader's
+#     child, or the only process with --noreload);
+#   - gunicorn/uwsgi start them only with VOTING_MONITORS_IN_WORKERS=1, for
+#     single-worker deployments (each worker would run its own copy).
+#
+# VOTING_MONITORS_IN_WORKERS=0 (the ASGI entry point sets it) turns off the
+# runserver default too. Everywhere else, `python manage.py run_monitors`
+# runs them once, in a process of their own.
+
+ENV_FLAG = 'VOTING_MONITORS_IN_WORKERS'
+WORKER_SERVERS = ('gunicorn', 'uwsgi')
+
+# Election edits in the web workers cannot wake a scheduler running in
+# another process, so there it re-checks at least this often. Likewise vote
+# and voter saves cannot wake the detector there; it probes at least this
+# often (binlog writes still wake it when inotify_simple is installed).
+EXTERNAL_SCHEDULER_MAX_SLEEP = 60
+EXTERNAL_DETECTOR_MAX_PROBE = 5
+
+
+def start_in_web_process(argv, environ=os.environ):
+    """True when this process is a web server that should run the monitors itself."""
+    flag = environ.get(ENV_FLAG, '')
+    if flag == '0' or not argv:
+        return False
+    if argv[1:2] == ['runserver']:
+        # The autoreloader's parent only watches files and restarts the child
+        return '--noreload' in argv or environ.get('RUN_MAIN') == 'true'
+    return os.path.basename(argv[0]) in WORKER_SERVERS and flag == '1'
+
+
+def start_binlog_monitor():
+    try:
+        from Online_Voting_System.tamper_monitor import start_tamper_monitor
+    except Exception as e:  # pymysqlreplication missing, or no MySQL deployment
+        print(f"[INFO] Binlog monitor not started: {e}")
+        return
+    start_tamper_monitor()
+
+
+def start_monitors():
+    """Start every monitor thread in this process (used by run_monitors)."""
+    from tamper_monitor.detector import CONFIG as detector_config, start_monitor_thread
+    from . import scheduler
+    from .ingest import ingest_mode, start_chain_writer_thread
+
+    scheduler.MAX_SLEEP_SECONDS = min(scheduler.MAX_SLEEP_SECONDS, EXTERNAL_SCHEDULER_MAX_SLEEP)
+    scheduler.start_scheduler_thread()
+    if ingest_mode() == 'queue':
+        start_chain_writer_thread()
+    detector_config['probe_max_interval'] = min(detector_config['probe_max_interval'], EXTERNAL_DETECTOR_MAX_PROBE)
+    start_monitor_thread()
+    start_binlog_monitor()
+
+
+def stop_monitors():
+    from tamper_monitor.detector import stop_monitor_thread
+    from .ingest import stop_chain_writer_thread
+    from .scheduler import stop_scheduler_thread
+
+    stop_scheduler_thread()
+    stop_chain_writer_thread()
+    stop_monitor_thread()
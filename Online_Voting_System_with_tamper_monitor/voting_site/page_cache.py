@@ -0,0 +1,58 @@
+from django.core.cache import cache
+from django.db.models import Prefetch
+from .db_router import primary_reads
+from .models import Election, Position, Candidate
+from .versioning import get_election_version, get_elections_list_version
+
+# Shared parts of the voter pages: the same for every voter, so built once
+# per election version instead of once per request.
+#
+#   voting:page:elections:<list version>          every Election, for the dashboard
+#   voting:page:ballot:<election>:<version>       (election, positions with approved candidates)
+#
+# plus {% cache %} fragments keyed on the same version in the templates.
+# Signals on Election, Position and Candidate bump the version once the
+# change has committed (see voting_site.signals), so entries are never
+# invalidated, only left behind to expire. Per-voter parts (registrations, votes cast, candidacies) are
+# queried on every request and rendered outside the cached fragments.
+
+TIMEOUT = 60 * 60
+
+
+def positions_with_approved_candidates(election_id):
+    return Position.objects.filter(election_id=election_id).order_by("position_id").prefetch_related(
+        Prefetch("candidates", queryset=Candidate.objects.filter(is_approved=True), to_attr="approved_candidates")
+    )
+
+
+async def all_elections():
+    """Every election (newest first) for the current list version."""
+    key = f"voting:page:elections:{get_elections_list_version()}"
+    elections = await cache.aget(key)
+    if elections is None:
+        # The version was read first and is only bumped after a commit, so
+        # whatever is read now is at least that new.
+        # Read the primary: a lagging replica could store old rows under a new version.
+        with primary_reads():
+            elections = [election async for election in Election.objects.all()]
+        await cache.aset(key, elections, TIMEOUT)
+    return elections
+
+
+async def election_ballot(election_id):
+    """
+    (election, positions, version) for the current content version, each
+    position with `approved_candidates`; None if the election does not exist.
+    """
+    version = get_election_version(election_id)
+    key = f"voting:page:ballot:{election_id}:{version}"
+    ballot = await cache.aget(key)
+    if ballot is None:
+        with primary_reads():
+            election = await Election.objects.filter(pk=election_id).afirst()
+            if election is None:
+                return None
+            positions = [position async for position in positions_with_approved_candidates(election_id)]
+        ballot = (election, positions)
+        await cache.aset(key, ballot, TIMEOUT)
+    return ballot + (version,)
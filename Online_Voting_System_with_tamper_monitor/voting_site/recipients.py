@@ -0,0 +1,141 @@
+import threading
+import time
+from .models import ElectionVoter
+from .versioning import bump_recipients_version, get_recipients_version
+
+# ---------------------- Configuration ----------------------
+
+# Serve a cached set this old, but rebuild it in the background.
+MAX_AGE_SECONDS = 300
+DEFAULT_CHUNK_SIZE = 50
+
+# ---------------------- Cache State ----------------------
+#
+# election_id -> {voter_id: email} for approved voters of running elections.
+# Kept warm by signals (approvals, email edits) and by the status scheduler,
+# so alert fan-out never has to run the three-way join itself.
+#
+# Those update this process's copy in place. Each change also bumps a counter
+# in Django's cache (voting_site.versioning): a process whose own update was
+# the only bump since its load just follows the counter, while one that sees
+# it moved by another process (e.g. run_monitors after an admin edit in a web
+# worker) reloads before sending. Across processes this needs a shared cache
+# backend.
+
+_lock = threading.Lock()
+_by_election = None
+_all_emails = ()
+_loaded_at = 0.0
+_loaded_version = None
+_reloading = False
+
+
+def _running_rows(election_ids=None):
+    qs = ElectionVoter.objects.filter(is_approved=True, election__status='running')
+    if election_ids is not None:
+        qs = qs.filter(election_id__in=election_ids)
+    return qs.values_list('election_id', 'voter_id', 'voter__email')
+
+
+def _rebuild_union():
+    global _all_emails
+    emails = set()
+    for members in _by_election.values():
+        emails.update(e for e in members.values() if e)
+    _all_emails = tuple(sorted(emails))
+
+
+def reload_all():
+    """Rebuild the whole cache from the database."""
+    global _by_election, _loaded_at, _loaded_version, _reloading
+    # Read first: a change made during the reload moves it again
+    version = get_recipients_version()
+    fresh = {}
+    for election_id, voter_id, email in _running_rows():
+        fresh.setdefault(election_id, {})[voter_id] = email
+    with _lock:
+        _by_election = fresh
+        _rebuild_union()
+        _loaded_at = time.monotonic()
+        _loaded_version = version
+        _reloading = False
+
+
+def _reload_in_background():
+    global _reloading
+    with _lock:
+        if _reloading:
+            return
+        _reloading = True
+
+    def run():
+        global _reloading
+        try:
+            reload_all()
+        except Exception as e:
+            print("Error reloading alert recipients:", e)
+            with _lock:
+                _reloading = False
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def _follow_version(version):
+    """Keep the loaded version current if our bump was the only change since loading."""
+    global _loaded_version
+    if version - 1 == _loaded_version:
+        _loaded_version = version
+
+
+def refresh_elections(election_ids):
+    """Re-read the recipients of the given elections (dropping any that are no longer running)."""
+    election_ids = list(election_ids)
+    if not election_ids:
+        return
+    version = bump_recipients_version()
+    if _by_election is None:
+        return
+    fresh = {election_id: {} for election_id in election_ids}
+    for election_id, voter_id, email in _running_rows(election_ids):
+        fresh[election_id][voter_id] = email
+    with _lock:
+        for election_id, members in fresh.items():
+            if members:
+                _by_election[election_id] = members
+            else:
+                _by_election.pop(election_id, None)
+        _rebuild_union()
+        _follow_version(version)
+
+
+def update_voter_email(voter_id, email):
+    """Apply an email change in place, without touching the database."""
+    version = bump_recipients_version()
+    if _by_election is None:
+        return
+    with _lock:
+        changed = False
+        for members in _by_election.values():
+            if voter_id in members and members[voter_id] != email:
+                members[voter_id] = email
+                changed = True
+        if changed:
+            _rebuild_union()
+        _follow_version(version)
+
+# ---------------------- Read API ----------------------
+
+def running_recipient_emails():
+    """Distinct emails of approved voters in running elections, served from memory."""
+    if _by_election is None or get_recipients_version() != _loaded_version:
+        reload_all()
+    elif time.monotonic() - _loaded_at > MAX_AGE_SECONDS:
+        _reload_in_background()
+    return list(_all_emails)
+
+
+def iter_recipient_chunks(chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the recipient list in chunks, for the mail worker to send one batch at a time."""
+    emails = running_recipient_emails()
+    for i in range(0, len(emails), chunk_size):
+        yield emails[i:i + chunk_size]
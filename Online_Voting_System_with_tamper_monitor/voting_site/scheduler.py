@@ -0,0 +1,109 @@
+import threading
+import logging
+from datetime import timedelta
+from django.db.models import Min
+from django.utils import timezone
+from .models import Election
+from . import recipients
+from .versioning import bump_election_version, bump_elections_list_version
+
+logger = logging.getLogger(__name__)
+
+# ---------------------- Configuration ----------------------
+
+# Fire slightly after a boundary so the end_date comparison is strictly past it.
+BOUNDARY_MARGIN = timedelta(seconds=1)
+# Upper bound on a single sleep, in case dates were edited outside of Django.
+MAX_SLEEP_SECONDS = 3600
+
+# ---------------------- Status Transitions ----------------------
+
+def apply_status_transitions(now=None):
+    """
+    Move elections between upcoming / running / closed with one bulk UPDATE
+    per target status. Returns {status: [election_id, ...]} of the rows that
+    actually changed.
+    """
+    now = now or timezone.now()
+    targets = {
+        'upcoming': Election.objects.filter(start_date__gt=now),
+        'running': Election.objects.filter(start_date__lte=now, end_date__gte=now),
+        'closed': Election.objects.filter(end_date__lt=now),
+    }
+    changed = {}
+    for status, qs in targets.items():
+        ids = list(qs.exclude(status=status).values_list('election_id', flat=True))
+        if ids:
+            Election.objects.filter(election_id__in=ids).update(status=status)
+            changed[status] = ids
+            logger.info("Elections %s moved to '%s'", ids, status)
+    if changed:
+        changed_ids = [i for ids in changed.values() for i in ids]
+        recipients.refresh_elections(changed_ids)
+        for election_id in changed_ids:
+            bump_election_version(election_id)
+        bump_elections_list_version()
+    return changed
+
+
+def next_boundary(now=None):
+    """Return the next start_date/end_date after `now`, or None if nothing is scheduled."""
+    now = now or timezone.now()
+    next_start = Election.objects.filter(start_date__gt=now).aggregate(t=Min('start_date'))['t']
+    next_end = Election.objects.filter(end_date__gte=now).aggregate(t=Min('end_date'))['t']
+    candidates = [t for t in (next_start, next_end) if t is not None]
+    return min(candidates) if candidates else None
+
+
+def seconds_until_next_boundary(now=None):
+    now = now or timezone.now()
+    boundary = next_boundary(now)
+    if boundary is None:
+        return MAX_SLEEP_SECONDS
+    delay = (boundary + BOUNDARY_MARGIN - now).total_seconds()
+    return max(0.0, min(delay, MAX_SLEEP_SECONDS))
+
+# ---------------------- Scheduler Loop ----------------------
+
+_wake_event = threading.Event()
+
+
+def wake_scheduler():
+    """Ask the scheduler to recompute its next boundary (e.g. an election's dates changed)."""
+    _wake_event.set()
+
+
+def run_status_scheduler(stop_event):
+    print("[INFO] Election status scheduler started...")
+    while not stop_event.is_set():
+        _wake_event.clear()
+        try:
+            apply_status_transitions()
+            delay = seconds_until_next_boundary()
+        except Exception as e:
+            print(f"[ERROR] Election status scheduler: {e}")
+            delay = 60
+        # Sleep until the next boundary, an election edit, or shutdown.
+        _wake_event.wait(timeout=delay)
+    print("[INFO] Election status scheduler stopped.")
+
+# ---------------------- Thread Management ----------------------
+
+_scheduler_thread = None
+_stop_event = None
+
+def start_scheduler_thread():
+    global _scheduler_thread, _stop_event
+    if _scheduler_thread and _scheduler_thread.is_alive():
+        return
+    _stop_event = threading.Event()
+    _scheduler_thread = threading.Thread(target=run_status_scheduler, args=(_stop_event,), daemon=True)
+    _scheduler_thread.start()
+
+def stop_scheduler_thread():
+    global _stop_event, _scheduler_thread
+    if _stop_event:
+        _stop_event.set()
+        _wake_event.set()
+    if _scheduler_thread:
+        _scheduler_thread.join(timeout=5)
@@ -0,0 +1,131 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver, Signal
+from .models import Election, ElectionTurnout, ElectionVoter, Voter, Position, Candidate, Vote
+from .scheduler import wake_scheduler
+from .versioning import bump_election_version, bump_elections_list_version
+from . import images, recipients, journal
+
+# Sent after votes are inserted without post_save (bulk_create), with
+# `votes`: the committed Vote instances.
+votes_bulk_created = Signal()
+
+
+def _bump_on_commit(election_id, kind='content'):
+    # After commit only: a reader that sees the new version must also see the
+    # new rows, or it would cache the old ones under it (voting_site.api,
+    # voting_site.page_cache).
+    transaction.on_commit(lambda: bump_election_version(election_id, kind))
+
+
+def _bump_list_on_commit():
+    transaction.on_commit(bump_elections_list_version)
+
+
+def _election_id_of(instance):
+    # Use the already-loaded Position when the caller passed one in.
+    if type(instance).position.is_cached(instance):
+        return instance.position.election_id
+    return Position.objects.filter(pk=instance.position_id).values_list('election_id', flat=True).first()
+
+
+@receiver(post_save, sender=Election)
+def election_saved(sender, instance, created, **kwargs):
+    if created:
+        # voting_site.turnout only updates this row (and creates it if missing)
+        ElectionTurnout.objects.get_or_create(election_id=instance.election_id)
+    # New or re-dated elections may move the next status boundary.
+    wake_scheduler()
+    _bump_on_commit(instance.election_id)
+    _bump_list_on_commit()
+
+
+@receiver(post_delete, sender=Election)
+def election_deleted(sender, instance, **kwargs):
+    _bump_on_commit(instance.election_id)
+    _bump_list_on_commit()
+
+
+@receiver(post_save, sender=Position)
+@receiver(post_delete, sender=Position)
+def position_changed(sender, instance, **kwargs):
+    _bump_on_commit(instance.election_id)
+
+
+@receiver(post_save, sender=Candidate)
+@receiver(post_delete, sender=Candidate)
+def candidate_changed(sender, instance, origin=None, **kwargs):
+    # Cascaded from a position or election delete, whose own receiver bumps
+    # the version: skip the per-candidate election lookup.
+    if isinstance(origin, (Position, Election)):
+        return
+    election_id = _election_id_of(instance)
+    if election_id is not None:
+        _bump_on_commit(election_id)
+
+
+@receiver(images.digest_recorded, sender=Candidate)
+def candidate_photo_ready(sender, pk, **kwargs):
+    # The photo is part of the cached candidate lists
+    election_id = Candidate.objects.filter(pk=pk).values_list('position__election_id', flat=True).first()
+    if election_id is not None:
+        _bump_on_commit(election_id)
+
+
+@receiver(post_save, sender=Vote)
+@receiver(post_delete, sender=Vote)
+def vote_changed(sender, instance, **kwargs):
+    _bump_on_commit(instance.election_id, 'results')
+
+
+@receiver(post_save, sender=Vote)
+def vote_journaled(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: journal.append_votes([instance]))
+
+
+@receiver(votes_bulk_created)
+def votes_bulk_journaled(sender, votes, **kwargs):
+    journal.append_votes(votes)
+
+
+@receiver(post_save, sender=ElectionVoter)
+def election_voter_saved(sender, instance, created, **kwargs):
+    # A fresh, unapproved registration request cannot change who gets alerts.
+    if created and not instance.is_approved:
+        return
+    transaction.on_commit(lambda: recipients.refresh_elections([instance.election_id]))
+
+
+@receiver(post_delete, sender=ElectionVoter)
+def election_voter_deleted(sender, instance, **kwargs):
+    transaction.on_commit(lambda: recipients.refresh_elections([instance.election_id]))
+
+
+@receiver(post_save, sender=Voter)
+def voter_saved(sender, instance, created, **kwargs):
+    if not created:
+        transaction.on_commit(lambda: recipients.update_voter_email(instance.voter_id, instance.email))
+
+
+# model -> (image field, digest path) for voting_site.images
+IMAGE_FIELDS = {
+    Voter: ('voter_image', 'image__digest'),  # VoterImage: `voters` rows stay untouched
+    Candidate: ('candidate_image', 'candidate_image_digest'),
+}
+
+
+@receiver(pre_save, sender=Voter)
+@receiver(pre_save, sender=Candidate)
+def image_upload_pending(sender, instance, **kwargs):
+    # Only a freshly assigned upload is uncommitted; plain re-saves skip the pipeline.
+    field_file = getattr(instance, IMAGE_FIELDS[sender][0])
+    instance._image_uploaded = bool(field_file) and not field_file._committed
+
+
+@receiver(post_save, sender=Voter)
+@receiver(post_save, sender=Candidate)
+def image_uploaded(sender, instance, **kwargs):
+    if getattr(instance, '_image_uploaded', False):
+        field_name, digest_path = IMAGE_FIELDS[sender]
+        transaction.on_commit(lambda: images.schedule(sender, instance.pk, field_name, digest_path))
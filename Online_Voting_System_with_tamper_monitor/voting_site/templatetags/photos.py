@@ -0,0 +1,20 @@
+from django import template
+from django.utils.html import format_html
+from voting_site.images import SIZES, derivative_urls
+
+register = template.Library()
+
+
+@register.simple_tag
+def photo(digest, alt, size='thumb'):
+    """<picture> with WebP and JPEG derivatives; nothing until the image is processed."""
+    urls = derivative_urls(digest, size)
+    if not urls:
+        return ''
+    px = SIZES[size]
+    return format_html(
+        '<picture><source srcset="{}" type="image/webp">'
+        '<img src="{}" alt="{}" width="{}" height="{}" loading="lazy" decoding="async" '
+        'class="rounded me-2" style="object-fit: cover;"></picture>',
+        urls['webp'], urls['jpg'], alt, px // 2, px // 2,
+    )
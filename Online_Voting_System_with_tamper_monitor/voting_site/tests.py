@@ -1,3 +1,1305 @@
-from django.test import TestCase
+import csv
+import hashlib
+import importlib
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+from datetime import datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.contrib.sessions.backends.signed_cookies import SessionStore as SignedCookieSession
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from tamper_monitor import detector, profiling, urls as tamper_urls
+from . import (
+    archive, db_router, hashing, images, ingest, integrity_benchmark, journal, monitors, page_cache, recipients, scheduler,
+    signals, throttle, turnout, verification, urls as site_urls,
+)
+from .exports import export_stream
+from .models import (
+    Voter, VoterImage, Election, ElectionVoter, Position, Candidate, Vote, ArchivedVote, ElectionArchive, ElectionTurnout,
+    LegacyHashSkew, election_tally_counts,
+)
+from .versioning import bump_recipients_version, get_election_version, get_elections_list_version
 
-# Create your tests here.
+# Query budgets for every URL in voting_site/urls.py and tamper_monitor/urls.py.
+#
+# Each case runs twice: against a small site, then again after a much larger
+# one has been added (more elections, positions, candidates, pending voters).
+# The second run must issue exactly as many queries as the first, and no more
+# than the URL's budget. Caches are cleared before each request, so the
+# numbers are for a cold cache. A failure lists the SQL of both runs.
+
+PASSWORD = "budget-password"
+
+SMALL = {"elections": 1, "positions": 2, "candidates": 2, "voters": 3}
+LARGE = {"elections": 5, "positions": 6, "candidates": 5, "voters": 20}
+
+# ---------------------- Seeding ----------------------
+
+_password_hash = None
+
+def _hash():
+    global _password_hash
+    if _password_hash is None:
+        _password_hash = make_password(PASSWORD)
+    return _password_hash
+
+
+def seed_site(tag, elections, positions, candidates, voters):
+    """
+    Running elections with positions, approved and pending candidates,
+    approved and pending registrations and some votes. Returns the objects
+    the URL cases act on.
+    """
+    now = timezone.now()
+    admin = Voter.objects.create(name=f"{tag} admin", email=f"{tag}-admin@example.com", password_hash=_hash(), is_admin=True)
+    newcomer = Voter.objects.create(name=f"{tag} newcomer", email=f"{tag}-newcomer@example.com", password_hash=_hash())
+    Voter.objects.bulk_create([
+        Voter(name=f"{tag} voter {i}", email=f"{tag}-voter-{i}@example.com", password_hash=_hash())
+        for i in range(voters)
+    ])
+    voter_objs = list(Voter.objects.filter(email__startswith=f"{tag}-voter-").order_by("voter_id"))
+
+    election_objs = [
+        Election.objects.create(
+            election_name=f"{tag} election {i}",
+            start_date=now - timedelta(hours=1),
+            end_date=now + timedelta(days=1),
+            candidate_deadline=now + timedelta(hours=12),
+            status="running",
+        )
+        for i in range(elections)
+    ]
+    Position.objects.bulk_create([
+        Position(election=e, position_name=f"position {p}") for e in election_objs for p in range(positions)
+    ])
+    position_objs = list(Position.objects.filter(election__in=election_objs).order_by("position_id"))
+    Candidate.objects.bulk_create([
+        Candidate(position=p, candidate_name=f"{tag} candidate {p.position_id}-{c}", is_approved=c % 2 == 0)
+        for p in position_objs for c in range(candidates)
+    ])
+    # The first voter is approved everywhere; the rest alternate approved / pending
+    ElectionVoter.objects.bulk_create([
+        ElectionVoter(voter=v, election=e, is_approved=i == 0 or i % 2 == 1)
+        for e in election_objs for i, v in enumerate(voter_objs)
+    ])
+
+    election = election_objs[0]
+    position = position_objs[0]
+    approved = list(Candidate.objects.filter(position=position, is_approved=True).order_by("candidate_id"))
+    votes = [Vote(voter=v, position=position, candidate=approved[i % len(approved)]) for i, v in enumerate(voter_objs[1::2])]
+    for vote in votes:
+        vote.save()
+    turnout.record_votes(votes)
+
+    return {
+        "admin": admin,
+        "voter": voter_objs[0],
+        "newcomer": newcomer,
+        "election": election,
+        "position": position,
+        "other_position": position_objs[1],
+        "candidate": approved[0],
+        "pending_candidate": Candidate.objects.filter(position=position, is_approved=False).first(),
+        "pending_registration": ElectionVoter.objects.filter(election=election, is_approved=False).first(),
+        "staff": User.objects.create_user(f"{tag}-staff", password=PASSWORD, is_staff=True),
+    }
+
+# ---------------------- URL Cases ----------------------
+#
+# name -> (budget, who, method, path(site), data(site))
+
+def _e(site):
+    return site["election"].election_id
+
+CASES = {
+    "home": (0, None, "get", lambda s: reverse("home"), None),
+    "register": (0, None, "get", lambda s: reverse("register"), None),
+    "login": (5, None, "post", lambda s: reverse("login"), lambda s: {"email": s["voter"].email, "password": PASSWORD}),
+    "logout": (2, "voter", "get", lambda s: reverse("logout"), None),
+    "dashboard": (4, "voter", "get", lambda s: reverse("dashboard"), None),
+    "request_registration": (8, "newcomer", "get", lambda s: reverse("request_registration", args=[_e(s)]), None),
+    "registered_election_detail": (6, "voter", "get", lambda s: reverse("registered_election_detail", args=[_e(s)]), None),
+    "apply_for_position": (
+        11, "voter", "post",
+        lambda s: reverse("apply_for_position", args=[_e(s), s["other_position"].position_id]), None,
+    ),
+    "vote_page": (5, "voter", "get", lambda s: reverse("vote_page", args=[_e(s)]), None),
+    "vote_candidate": (
+        19, "voter", "get",
+        lambda s: reverse("vote_candidate", args=[_e(s), s["position"].position_id, s["candidate"].candidate_id]),
+        lambda s: {"request_token": "budget"},
+    ),
+    "vote_receipt": (1, "voter", "get", lambda s: reverse("vote_receipt", args=[1]), None),
+    "image_derivative": (0, None, "get", lambda s: reverse("image_derivative", args=["ab/" + "a" * 64 + "-v1-96.webp"]), None),
+    "admin_dashboard": (4, "admin", "get", lambda s: reverse("admin_dashboard"), None),
+    "approve_voter": (2, "admin", "get", lambda s: reverse("approve_voter", args=[s["pending_registration"].pk]), None),
+    "create_election": (0, "admin", "get", lambda s: reverse("create_election"), None),
+    "create_position": (2, "admin", "get", lambda s: reverse("create_position", args=[_e(s)]), None),
+    "manage_election": (6, "admin", "get", lambda s: reverse("manage_election", args=[_e(s)]), None),
+    "toggle_election_status": (4, "admin", "get", lambda s: reverse("toggle_election_status", args=[_e(s)]), None),
+    "edit_position": (2, "admin", "get", lambda s: reverse("edit_position", args=[s["position"].position_id]), None),
+    "delete_position": (13, "admin", "get", lambda s: reverse("delete_position", args=[s["other_position"].position_id]), None),
+    "approve_candidate": (4, "admin", "get", lambda s: reverse("approve_candidate", args=[s["pending_candidate"].pk]), None),
+    "admin_verify_votes": (8, "admin", "get", lambda s: reverse("admin_verify_votes", args=[_e(s)]), None),
+    "admin_export_election": (6, "admin", "get", lambda s: reverse("admin_export_election", args=[_e(s), "votes"]), None),
+    "api_elections": (1, None, "get", lambda s: reverse("api_elections"), None),
+    "api_election_detail": (3, None, "get", lambda s: reverse("api_election_detail", args=[_e(s)]), None),
+    "api_election_results": (6, None, "get", lambda s: reverse("api_election_results", args=[_e(s)]), None),
+    "tamper_unacked_count": (3, "staff", "get", lambda s: reverse("tamper_unacked_count"), None),
+}
+
+
+def _url_names(patterns):
+    return {p.name for p in patterns if p.name}
+
+# ---------------------- Tests ----------------------
+
+# A TEST MIRROR replica is a second connection and cannot see the rows this
+# test's transaction has not committed, so replica reads go to the primary
+# here (and the test uses only the default alias). The queries are the same,
+# only the alias differs.
+@override_settings(DATABASE_REPLICA_ALIAS="default")
+class QueryBudgetTests(TestCase):
+    databases = {"default"}
+
+    def test_every_url_has_a_budget(self):
+        missing = (_url_names(site_urls.urlpatterns) | _url_names(tamper_urls.urlpatterns)) - set(CASES)
+        self.assertFalse(missing, f"URLs without a query budget in voting_site/tests.py: {sorted(missing)}")
+
+    def _client_for(self, site, who):
+        client = self.client_class()
+        if who == "staff":
+            client.force_login(site["staff"])
+        elif who:
+            session = client.session
+            session["voter_id"] = site[who].voter_id
+            session.save()
+        return client
+
+    def _measure(self, name, site):
+        _, who, method, path, data = CASES[name]
+        client = self._client_for(site, who)
+        cache.clear()
+        # ProfilingMiddleware re-reads its config every few seconds; do it now
+        profiling.reload()
+        profiling.current()
+        with ExitStack() as stack:
+            # Any other alias is refused outright, so nothing can go uncounted
+            contexts = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in self.databases]
+            response = getattr(client, method)(path(site), data(site) if data else None)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        self.assertLess(response.status_code, 500, f"{name} failed")
+        return [f"[{alias}] {q['sql']}" for alias, ctx in zip(self.databases, contexts) for q in ctx.captured_queries]
+
+    def check_budget(self, name):
+        budget = CASES[name][0]
+        small = self._measure(name, seed_site("small", **SMALL))
+        large = self._measure(name, seed_site("large", **LARGE))
+        report = (
+            f"\n--- {name}: {len(small)} queries on the small site ---\n" + _numbered(small)
+            + f"\n--- {name}: {len(large)} queries after adding the large site ---\n" + _numbered(large)
+        )
+        self.assertEqual(len(small), len(large), f"{name}: query count grows with the data{report}")
+        self.assertLessEqual(len(large), budget, f"{name}: over its budget of {budget} queries{report}")
+
+
+def _numbered(queries):
+    return "\n".join(f"{i:3}. {sql}" for i, sql in enumerate(queries, 1))
+
+
+def _budget_test(name):
+    def test(self):
+        self.check_budget(name)
+    test.__name__ = f"test_{name}"
+    return test
+
+
+for _name in CASES:
+    setattr(QueryBudgetTests, f"test_{_name}", _budget_test(_name))
+
+# ---------------------- Version counters ----------------------
+
+# The captured callbacks include journal.append_votes; keep them off the real journal
+@override_settings(VOTE_JOURNAL_ENABLED=False)
+class VersionBumpTests(TestCase):
+    def test_bumps_wait_for_commit(self):
+        site = seed_site("bump", **SMALL)
+        election_id = site["election"].election_id
+        content = get_election_version(election_id)
+        results = get_election_version(election_id, "results")
+        elections = get_elections_list_version()
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            Position.objects.create(election=site["election"], position_name="late position")
+            Vote(voter=site["admin"], position=site["position"], candidate=site["candidate"]).save()
+            site["election"].save()
+            # Nothing committed yet: readers must still see the old versions
+            self.assertEqual(get_election_version(election_id), content)
+            self.assertEqual(get_election_version(election_id, "results"), results)
+            self.assertEqual(get_elections_list_version(), elections)
+
+        for callback in callbacks:
+            callback()
+        self.assertGreater(get_election_version(election_id), content)
+        self.assertGreater(get_election_version(election_id, "results"), results)
+        self.assertGreater(get_elections_list_version(), elections)
+
+# ---------------------- API ----------------------
+
+@override_settings(DATABASE_REPLICA_ALIAS="default")
+class ApiPageCacheTests(TestCase):
+    databases = {"default"}
+
+    def test_api_reads_the_ballot_the_pages_cached(self):
+        cache.clear()
+        election = seed_site("api", **SMALL)["election"]
+        ballot = async_to_sync(page_cache.election_ballot)(election.election_id)
+        profiling.reload()
+        profiling.current()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("api_election_detail", args=[election.election_id]))
+        names = [p["position_name"] for p in response.json()["positions"]]
+        self.assertEqual(names, [p.position_name for p in ballot[1]])
+
+# ---------------------- Queued ingestion ----------------------
+
+@override_settings(VOTE_JOURNAL_ENABLED=False)
+class IngestDrainTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        queue = override_settings(VOTE_INGEST_QUEUE_PATH=os.path.join(directory, "queue.sqlite3"))
+        queue.enable()
+        self.addCleanup(queue.disable)
+        self._close_queue()
+        self.addCleanup(self._close_queue)
+
+        self.site = seed_site("ingest", **SMALL)
+        self.other_candidate = Candidate.objects.filter(position=self.site["other_position"], is_approved=True).first()
+
+    def _close_queue(self):
+        conn = getattr(ingest._local, "conn", None)
+        if conn is not None:
+            conn.close()
+        ingest._local.conn = None
+
+    def enqueue(self, voter, candidate, position=None):
+        position_id = (position or candidate.position).position_id
+        receipt_id, created = ingest.enqueue_ballot(voter.voter_id, position_id, candidate.candidate_id)
+        self.assertTrue(created)
+        return receipt_id
+
+    def receipt(self, receipt_id):
+        receipt = ingest.get_receipt(receipt_id)
+        return receipt["status"], receipt["detail"]
+
+    def test_valid_ballot_is_recorded_and_chained(self):
+        receipt_id = self.enqueue(self.site["voter"], self.site["candidate"])
+        self.assertEqual(ingest.drain_once(), 1)
+
+        receipt = ingest.get_receipt(receipt_id)
+        self.assertEqual(receipt["status"], ingest.RECORDED)
+        vote = Vote.objects.get(voter=self.site["voter"], position=self.site["position"])
+        self.assertEqual(vote.vote_hash, receipt["vote_hash"])
+        self.assertEqual(vote.vote_hash, vote.compute_hash(vote.previous_vote_hash))
+
+    def test_ballot_for_deleted_position_is_rejected_alone(self):
+        orphan = self.enqueue(self.site["newcomer"], self.other_candidate)
+        valid = self.enqueue(self.site["voter"], self.site["candidate"])
+        self.site["other_position"].delete()
+
+        self.assertEqual(ingest.drain_once(), 2)
+        self.assertEqual(self.receipt(orphan), (ingest.REJECTED, "position no longer exists"))
+        self.assertEqual(self.receipt(valid), (ingest.RECORDED, None))
+        self.assertEqual(ingest.drain_once(), 0)
+
+    def test_ballot_for_deleted_candidate_is_rejected(self):
+        withdrawn = Candidate.objects.create(position=self.site["position"], candidate_name="withdrawn", is_approved=True)
+        orphan = self.enqueue(self.site["voter"], withdrawn)
+        valid = self.enqueue(self.site["newcomer"], self.site["candidate"])
+        withdrawn.delete()
+
+        ingest.drain_once()
+        self.assertEqual(self.receipt(orphan), (ingest.REJECTED, "candidate no longer exists"))
+        self.assertEqual(self.receipt(valid), (ingest.RECORDED, None))
+
+    def test_candidate_of_another_position_is_rejected(self):
+        receipt_id = self.enqueue(self.site["voter"], self.other_candidate, position=self.site["position"])
+        ingest.drain_once()
+        self.assertEqual(self.receipt(receipt_id), (ingest.REJECTED, "candidate does not stand for this position"))
+        self.assertFalse(Vote.objects.filter(voter=self.site["voter"]).exists())
+
+    def test_ballot_already_in_votes_is_recorded_once(self):
+        vote = Vote(voter=self.site["voter"], position=self.site["position"], candidate=self.site["candidate"])
+        vote.save()
+        receipt_id = self.enqueue(self.site["voter"], self.site["candidate"])
+
+        ingest.drain_once()
+        self.assertEqual(self.receipt(receipt_id), (ingest.RECORDED, None))
+        self.assertEqual(ingest.get_receipt(receipt_id)["vote_hash"], vote.vote_hash)
+        self.assertEqual(Vote.objects.filter(voter=self.site["voter"]).count(), 1)
+
+    def test_second_choice_for_a_voted_position_is_rejected(self):
+        Vote(voter=self.site["voter"], position=self.site["position"], candidate=self.site["candidate"]).save()
+        other = Candidate.objects.create(position=self.site["position"], candidate_name="other", is_approved=True)
+        receipt_id = self.enqueue(self.site["voter"], other)
+
+        ingest.drain_once()
+        self.assertEqual(self.receipt(receipt_id), (ingest.REJECTED, "already voted for this position"))
+        self.assertFalse(Vote.objects.filter(candidate=other).exists())
+
+    def test_failed_batch_is_retried_ballot_by_ballot(self):
+        bad = self.enqueue(self.site["newcomer"], self.site["candidate"])
+        good = self.enqueue(self.site["voter"], self.site["candidate"])
+        commit = ingest._commit_ballots
+
+        def commit_unless_bad(rows):
+            if any(row["receipt_id"] == bad for row in rows):
+                raise IntegrityError("FOREIGN KEY constraint failed")
+            commit(rows)
+
+        with mock.patch.object(ingest, "_commit_ballots", commit_unless_bad):
+            self.assertEqual(ingest.drain_once(), 2)
+        self.assertEqual(self.receipt(bad), (ingest.REJECTED, "could not be recorded"))
+        self.assertEqual(self.receipt(good), (ingest.RECORDED, None))
+
+# ---------------------- Exports ----------------------
+
+class ExportHashTests(TestCase):
+    def setUp(self):
+        self.site = seed_site("export", **SMALL)
+        self.election_id = self.site["election"].election_id
+        # Sub-millisecond timestamps, and one legacy (version 1) row
+        stamp = timezone.now().replace(microsecond=123457)
+        Vote(voter=self.site["voter"], position=self.site["position"], candidate=self.site["candidate"], timestamp=stamp).save()
+        legacy = Vote(voter=self.site["newcomer"], position=self.site["position"], candidate=self.site["candidate"], timestamp=stamp)
+        legacy.save()
+        legacy.hash_version = hashing.LEGACY_VERSION
+        Vote.objects.filter(pk=legacy.pk).update(hash_version=legacy.hash_version, vote_hash=legacy.compute_hash(legacy.previous_vote_hash))
+
+    def export(self, fmt):
+        text = b"".join(export_stream(self.election_id, "votes", fmt, using="default")).decode()
+        if fmt == "csv":
+            return list(csv.DictReader(io.StringIO(text)))
+        return [json.loads(line) for line in text.splitlines()]
+
+    def assert_hashes_recompute(self, rows):
+        self.assertEqual(len(rows), Vote.objects.filter(election_id=self.election_id).count())
+        for row in rows:
+            expected = hashing.hash_vote(
+                int(row["voter_id"]), self.election_id, int(row["position_id"]), int(row["candidate_id"]),
+                datetime.fromisoformat(row["timestamp"]), row["previous_vote_hash"] or "", int(row["hash_version"]),
+            )
+            self.assertEqual(expected, row["vote_hash"], f"vote {row['vote_id']}")
+
+    def test_csv_hashes_recompute(self):
+        self.assert_hashes_recompute(self.export("csv"))
+
+    def test_jsonl_hashes_recompute(self):
+        self.assert_hashes_recompute(self.export("jsonl"))
+
+# ---------------------- Login throttling ----------------------
+
+class ClientIpTests(SimpleTestCase):
+    def ip(self, forwarded, remote="10.0.0.1"):
+        return throttle.client_ip(RequestFactory().get("/", HTTP_X_FORWARDED_FOR=forwarded, REMOTE_ADDR=remote))
+
+    def test_header_ignored_unless_trusted(self):
+        self.assertEqual(self.ip("203.0.113.7"), "10.0.0.1")
+
+    @override_settings(LOGIN_THROTTLE_TRUST_X_FORWARDED_FOR=True)
+    def test_spoofed_entries_are_ignored(self):
+        # The client sent "1.2.3.4"; the proxy appended the address it saw
+        self.assertEqual(self.ip("1.2.3.4, 203.0.113.7"), "203.0.113.7")
+        self.assertEqual(self.ip("203.0.113.7"), "203.0.113.7")
+
+    @override_settings(LOGIN_THROTTLE_TRUST_X_FORWARDED_FOR=True, LOGIN_THROTTLE_TRUSTED_PROXIES=2)
+    def test_nth_entry_from_the_right(self):
+        self.assertEqual(self.ip("1.2.3.4, 203.0.113.7, 10.0.0.2"), "203.0.113.7")
+        # Fewer entries than proxies: the header did not come through them all
+        self.assertEqual(self.ip("203.0.113.7"), "10.0.0.1")
+
+
+class TokenBucketTests(SimpleTestCase):
+    def check_refill(self, buckets):
+        self.assertEqual(buckets.take("k", 2, 10, now=100), 0)
+        self.assertEqual(buckets.take("k", 2, 10, now=100), 0)
+        self.assertEqual(buckets.take("k", 2, 10, now=100), 5)
+        self.assertAlmostEqual(buckets.take("k", 2, 10, now=104), 1)
+        self.assertEqual(buckets.take("k", 2, 10, now=105), 0)
+        # Refill stops at capacity
+        self.assertEqual(buckets.take("k", 2, 10, now=1000), 0)
+        self.assertEqual(buckets.take("k", 2, 10, now=1000), 0)
+        self.assertGreater(buckets.take("k", 2, 10, now=1000), 0)
+
+    def test_local_buckets_refill(self):
+        self.check_refill(throttle.LocalBuckets())
+
+    def test_cache_buckets_refill(self):
+        cache.clear()
+        self.check_refill(throttle.CacheBuckets("default"))
+
+    def test_give_returns_a_token(self):
+        buckets = throttle.LocalBuckets()
+        buckets.take("k", 1, 60, now=0)
+        buckets.give("k", 1, 60, now=0)
+        self.assertEqual(buckets.take("k", 1, 60, now=0), 0)
+
+
+@override_settings(LOGIN_THROTTLE_TRUST_X_FORWARDED_FOR=True, LOGIN_THROTTLE_RATES={"ip": (2, 60)})
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        buckets = mock.patch.object(throttle, "_buckets", throttle.LocalBuckets())
+        buckets.start()
+        self.addCleanup(buckets.stop)
+
+    def test_rotating_spoofed_entries_share_one_bucket(self):
+        statuses = [
+            self.client.post(
+                reverse("login"), {"email": f"nobody-{i}@example.com", "password": "x"},
+                HTTP_X_FORWARDED_FOR=f"198.51.100.{i}, 203.0.113.7",
+            ).status_code
+            for i in range(3)
+        ]
+        self.assertNotEqual(statuses[1], 429)
+        self.assertEqual(statuses[2], 429)
+
+# ---------------------- Alert recipients ----------------------
+
+class RecipientCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.site = seed_site("recipients", **SMALL)
+        recipients.reload_all()
+        self.addCleanup(setattr, recipients, "_by_election", None)
+
+    def test_served_from_memory_until_changed(self):
+        emails = recipients.running_recipient_emails()
+        self.assertIn(self.site["voter"].email, emails)
+        with self.assertNumQueries(0):
+            self.assertEqual(recipients.running_recipient_emails(), emails)
+
+    def test_change_in_another_process_is_picked_up(self):
+        # Another process: its rows and its bump, none of this process's signals
+        ElectionVoter.objects.filter(voter=self.site["voter"]).update(is_approved=False)
+        Voter.objects.filter(pk=self.site["admin"].pk).update(email="moved@example.com")
+        ElectionVoter.objects.create(voter=self.site["admin"], election=self.site["election"], is_approved=True)
+        bump_recipients_version()
+
+        emails = recipients.running_recipient_emails()
+        self.assertNotIn(self.site["voter"].email, emails)
+        self.assertIn("moved@example.com", emails)
+
+    def test_own_changes_are_applied_without_a_reload(self):
+        ElectionVoter.objects.create(voter=self.site["admin"], election=self.site["election"], is_approved=True)
+        recipients.refresh_elections([self.site["election"].pk])
+        recipients.update_voter_email(self.site["voter"].pk, "renamed@example.com")
+
+        with mock.patch.object(recipients, "reload_all") as reload_all, self.assertNumQueries(0):
+            emails = recipients.running_recipient_emails()
+        reload_all.assert_not_called()
+        self.assertIn(self.site["admin"].email, emails)
+        self.assertIn("renamed@example.com", emails)
+        self.assertNotIn(self.site["voter"].email, emails)
+
+# ---------------------- Vote hashes ----------------------
+
+def _add_election(tag):
+    """A running election with one position and one approved candidate."""
+    now = timezone.now()
+    election = Election.objects.create(
+        election_name=f"{tag} election", start_date=now - timedelta(hours=1), end_date=now + timedelta(days=1),
+        candidate_deadline=now, status="running",
+    )
+    position = Position.objects.create(election=election, position_name=f"{tag} position")
+    candidate = Candidate.objects.create(position=position, candidate_name=f"{tag} candidate", is_approved=True)
+    return position, candidate
+
+
+@override_settings(DATABASE_REPLICA_ALIAS="default")
+class VoteChainTests(TestCase):
+    databases = {"default"}
+
+    def setUp(self):
+        self.site = seed_site("chain", **SMALL)
+        self.election_id = self.site["election"].election_id
+        other = Candidate.objects.filter(position=self.site["other_position"], is_approved=True).first()
+        self.votes = [
+            Vote(voter=self.site[who], position=self.site["other_position"], candidate=other)
+            for who in ("voter", "newcomer", "admin")
+        ]
+        for vote in self.votes:
+            vote.save()
+
+    def verify(self, election_id=None):
+        return verification.verify_votes_for_election(election_id or self.election_id)
+
+    def test_hash_covers_election_and_microseconds(self):
+        ts = datetime(2026, 1, 1, 12, 0, 0, 123456)
+        base = hashing.hash_vote(1, 2, 3, 4, ts, "ab" * 32)
+        self.assertNotEqual(base, hashing.hash_vote(1, 9, 3, 4, ts, "ab" * 32))
+        self.assertNotEqual(base, hashing.hash_vote(1, 2, 3, 4, ts + timedelta(microseconds=1), "ab" * 32))
+        self.assertEqual(hashing.hash_many([(1, 2, 3, 4, ts, "ab" * 32)]), [base])
+
+    def test_each_vote_links_to_the_election_before_it(self):
+        rows = list(Vote.objects.filter(election_id=self.election_id).order_by("vote_id"))
+        self.assertEqual(rows[0].previous_vote_hash, "")
+        for before, vote in zip(rows, rows[1:]):
+            self.assertEqual(vote.previous_vote_hash, before.vote_hash)
+        self.assertEqual(self.verify(), [])
+
+    def test_edited_vote_is_flagged(self):
+        vote = self.votes[1]
+        Vote.objects.filter(pk=vote.pk).update(candidate=self.site["candidate"])
+        self.assertEqual(self.verify(), [vote.vote_id])
+
+    def test_deleted_vote_breaks_the_next_one(self):
+        Vote.objects.filter(pk=self.votes[1].pk).delete()
+        self.assertEqual(self.verify(), [self.votes[2].vote_id])
+
+    def test_save_locks_the_chain_head_before_reading_it(self):
+        vote = Vote(voter=self.site["voter"], position=self.site["position"], candidate=self.site["candidate"])
+        with CaptureQueriesContext(connections["default"]) as ctx:
+            vote.save()
+        tables = [q["sql"] for q in ctx.captured_queries]
+        lock = next(i for i, sql in enumerate(tables) if '"election_turnout"' in sql)
+        head = next(i for i, sql in enumerate(tables) if sql.startswith("SELECT") and 'FROM "votes"' in sql)
+        insert = next(i for i, sql in enumerate(tables) if sql.startswith('INSERT INTO "votes"'))
+        self.assertLess(lock, head)
+        self.assertLess(head, insert)
+
+
+@override_settings(DATABASE_REPLICA_ALIAS="default")
+class LegacyChainTests(TestCase):
+    """Version 1 rows: one chain across elections, hashed from a clock read just before the stored timestamp."""
+    databases = {"default"}
+
+    def setUp(self):
+        self.voter = Voter.objects.create(name="legacy", email="legacy@example.com", password_hash="x")
+        self.ballots = [_add_election("legacy a"), _add_election("legacy b")]
+        self.start = timezone.now().replace(microsecond=500000)
+        previous = ""
+        self.votes = []
+        for i in range(4):
+            position, candidate = self.ballots[i % 2]
+            voter = Voter.objects.create(name=f"legacy {i}", email=f"legacy-{i}@example.com", password_hash="x")
+            vote = self.legacy_vote(voter, position, candidate, self.start + timedelta(seconds=i), previous)
+            previous = vote.vote_hash
+            self.votes.append(vote)
+
+    def legacy_vote(self, voter, position, candidate, stored, previous, hashed=None):
+        vote_hash = hashing.hash_vote(
+            voter.voter_id, position.election_id, position.position_id, candidate.candidate_id,
+            hashed or stored, previous, hashing.LEGACY_VERSION,
+        )
+        vote = Vote(
+            voter=voter, position=position, candidate=candidate, timestamp=stored,
+            previous_vote_hash=previous, vote_hash=vote_hash, hash_version=hashing.LEGACY_VERSION,
+        )
+        vote.save()
+        return vote
+
+    def verify(self, i):
+        return verification.verify_votes_for_election(self.ballots[i][0].election_id)
+
+    def test_chain_across_elections_verifies(self):
+        self.assertEqual((self.verify(0), self.verify(1)), ([], []))
+
+    def test_deleting_a_vote_of_another_election_flags_the_next_one(self):
+        Vote.objects.filter(pk=self.votes[1].pk).delete()
+        self.assertEqual(self.verify(0), [self.votes[2].vote_id])
+
+    def test_hash_taken_just_before_the_stored_timestamp_is_accepted(self):
+        position, candidate = self.ballots[1]
+        stored = self.start + timedelta(seconds=10)
+        skewed = self.legacy_vote(self.voter, position, candidate, stored, self.votes[-1].vote_hash,
+                                  hashed=stored - timedelta(milliseconds=20))
+        self.assertEqual(self.verify(1), [skewed.vote_id], "no skew recorded yet")
+
+        # As migration 0020 does for every legacy row
+        micros = hashing.find_legacy_skew(self.voter.voter_id, position.position_id, candidate.candidate_id,
+                                          stored, self.votes[-1].vote_hash, skewed.vote_hash)
+        self.assertEqual(micros, 20000)
+        LegacyHashSkew.objects.create(vote_id=skewed.vote_id, micros=micros)
+        self.assertEqual(self.verify(1), [])
+
+        Vote.objects.filter(pk=skewed.pk).update(timestamp=stored + timedelta(seconds=1))
+        self.assertEqual(self.verify(1), [skewed.vote_id])
+
+    def test_verification_does_not_search_the_skew_window(self):
+        Vote.objects.filter(pk=self.votes[1].pk).update(candidate=self.ballots[0][1])
+        with mock.patch.object(hashing, "_legacy_hash", wraps=hashing._legacy_hash) as legacy_hash:
+            self.assertEqual(self.verify(1), [self.votes[1].vote_id])
+        self.assertLessEqual(legacy_hash.call_count, len(self.votes))
+
+# ---------------------- Vote replay ----------------------
+
+@override_settings(DATABASE_REPLICA_ALIAS="default")
+class VoteReplayTests(TestCase):
+    databases = {"default"}
+
+    def setUp(self):
+        self.site = seed_site("replay", **SMALL)
+        session = self.client.session
+        session["voter_id"] = self.site["voter"].voter_id
+        session.save()
+
+    def vote(self, token=None, position=None):
+        position = position or self.site["position"]
+        candidate = Candidate.objects.filter(position=position, is_approved=True).first()
+        url = reverse("vote_candidate", args=[position.election_id, position.position_id, candidate.candidate_id])
+        with CaptureQueriesContext(connections["default"]) as ctx:
+            response = self.client.get(url, {"request_token": token} if token else None)
+        self.queries = [q["sql"] for q in ctx.captured_queries]
+        # Redirects are not followed, so earlier messages are still queued: take the newest
+        return response, [str(m) for m in get_messages(response.wsgi_request)][-1]
+
+    def votes_cast(self):
+        return Vote.objects.filter(voter=self.site["voter"]).count()
+
+    def test_replay_answers_as_the_first_time_without_voting(self):
+        first = self.vote("double-click")
+        replay = self.vote("double-click")
+        self.assertEqual((replay[0].url, replay[1]), (first[0].url, first[1]))
+        self.assertEqual(self.votes_cast(), 1)
+        self.assertFalse([sql for sql in self.queries if '"votes"' in sql], "a replay must not touch votes")
+
+    def test_token_covers_each_position_once(self):
+        self.vote("ballot-page")
+        self.vote("ballot-page", position=self.site["other_position"])
+        self.assertEqual(self.votes_cast(), 2)
+
+    def test_second_vote_without_token_is_refused_cleanly(self):
+        self.vote()
+        response, message = self.vote()
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(message, "Your vote for this position has already been recorded.")
+        self.assertEqual(self.votes_cast(), 1)
+
+# ---------------------- Vote journal ----------------------
+
+def _journal_vote(vote_id):
+    return SimpleNamespace(
+        vote_id=vote_id, voter_id=1, position_id=2, candidate_id=3,
+        timestamp=datetime(2026, 1, 1, 12, 0, 0, vote_id), vote_hash=f"{vote_id:064x}", previous_vote_hash="",
+    )
+
+
+def _journal_worker(directory, first_id):
+    writer = journal.JournalWriter(directory)
+    for i in range(0, 40, 2):
+        writer.append([_journal_vote(first_id + i), _journal_vote(first_id + i + 1)])
+    writer.close()
+
+
+class VoteJournalTests(SimpleTestCase):
+    RECORDS_PER_SEGMENT = 3
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        record = len(journal.encode_vote(_journal_vote(1)))
+        limit = mock.patch.object(journal, "SEGMENT_MAX_BYTES", record * self.RECORDS_PER_SEGMENT)
+        limit.start()
+        self.addCleanup(limit.stop)
+
+    def writer(self):
+        writer = journal.JournalWriter(self.dir)
+        self.addCleanup(writer.close)
+        return writer
+
+    def ids(self):
+        return [record.vote_id for record in journal.read_journal(self.dir)]
+
+    def segment(self, number):
+        return os.path.join(self.dir, f"segment-{number:08d}.log")
+
+    def test_segments_roll_and_chain(self):
+        self.writer().append([_journal_vote(i) for i in range(1, 8)])
+        self.assertEqual([os.path.basename(p) for p in journal.segment_paths(self.dir)],
+                         ["segment-00000001.log", "segment-00000002.log", "segment-00000003.log"])
+        self.assertEqual(self.ids(), list(range(1, 8)))
+        self.assertEqual(journal.check_segment_digests(self.dir), [])
+        record = next(journal.read_journal(self.dir))
+        self.assertEqual(record.timestamp, datetime(2026, 1, 1, 12, 0, 0, 1, tzinfo=dt_timezone.utc))
+
+    def test_edited_sealed_segment_is_reported(self):
+        self.writer().append([_journal_vote(i) for i in range(1, 8)])
+        with open(self.segment(1), "r+b") as f:
+            f.seek(10)
+            f.write(b"\xff")
+        self.assertEqual(journal.check_segment_digests(self.dir), ["segment-00000001.log"])
+
+    def test_torn_tail_is_kept_and_sealed_on_open(self):
+        self.writer().append([_journal_vote(1), _journal_vote(2)])
+        with open(self.segment(1), "ab") as f:
+            f.write(journal.encode_vote(_journal_vote(3))[:20])
+
+        with mock.patch("builtins.print"):
+            self.writer().append([_journal_vote(4)])
+        self.assertEqual(journal.damaged_segments(self.dir), ["segment-00000001.log"])
+        size = os.path.getsize(self.segment(1))
+        with open(self.segment(1)[:-4] + ".damaged") as f:
+            self.assertEqual(f.read(), f"{size - 20}-{size}\n")
+        self.assertEqual(self.ids(), [1, 2, 4])
+        self.assertEqual(journal.check_segment_digests(self.dir), [])
+
+    def test_reader_resyncs_after_damaged_bytes(self):
+        self.writer().append([_journal_vote(i) for i in range(1, 4)])
+        record = len(journal.encode_vote(_journal_vote(1)))
+        with open(self.segment(1), "r+b") as f:
+            f.seek(record + 30)
+            f.write(b"XX")
+        self.assertEqual(self.ids(), [1, 3])
+
+    def test_writers_follow_a_segment_sealed_by_another(self):
+        first, second = self.writer(), self.writer()
+        first.append([_journal_vote(i) for i in range(1, 4)])
+        second.append([_journal_vote(4)])  # segment 1 is full: seals it
+        first.append([_journal_vote(5)])   # must not write into the sealed segment
+        self.assertEqual(self.ids(), [1, 2, 3, 4, 5])
+        self.assertEqual(len(journal.segment_paths(self.dir)), 2)
+        self.assertEqual(journal.check_segment_digests(self.dir), [])
+
+    def test_processes_append_whole_records(self):
+        context = multiprocessing.get_context("fork")
+        workers = [context.Process(target=_journal_worker, args=(self.dir, n * 1000)) for n in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+            self.assertEqual(worker.exitcode, 0)
+
+        self.assertEqual(sorted(self.ids()), [n * 1000 + i for n in range(3) for i in range(40)])
+        self.assertEqual(journal.damaged_segments(self.dir), [])
+        self.assertEqual(journal.check_segment_digests(self.dir), [])
+        limit = journal.SEGMENT_MAX_BYTES
+        self.assertTrue(all(os.path.getsize(p) <= limit for p in journal.segment_paths(self.dir)))
+
+    def test_cross_check_flags_a_changed_row(self):
+        records = [_journal_vote(i) for i in range(1, 4)]
+        rows = [_journal_vote(i) for i in range(1, 4)]
+        rows[1].candidate_id = 9
+        report = journal.cross_check(rows, records)
+        self.assertFalse(report["ok"])
+        self.assertEqual(report["mismatched"], [{"vote_id": 2, "fields": ["candidate_id"]}])
+
+# ---------------------- Archival ----------------------
+
+def _merkle_root(leaves):
+    """RFC 6962 Merkle tree hash, written the recursive way."""
+    if len(leaves) == 1:
+        return archive._leaf(leaves[0])
+    split = 1 << (len(leaves) - 1).bit_length() - 1
+    return archive._node(_merkle_root(leaves[:split]), _merkle_root(leaves[split:]))
+
+
+@override_settings(DATABASE_REPLICA_ALIAS="default")
+class ArchiveSealTests(TestCase):
+    databases = {"default"}
+
+    def setUp(self):
+        self.site = seed_site("archive", **SMALL)
+        self.election = self.site["election"]
+        other = Candidate.objects.filter(position=self.site["other_position"], is_approved=True).first()
+        for voter in (self.site["voter"], self.site["newcomer"], self.site["admin"]):
+            Vote(voter=voter, position=self.site["other_position"], candidate=other).save()
+        self.tallies = election_tally_counts(self.election.election_id)
+        self.hot_ids = list(Vote.objects.filter(election=self.election).order_by("vote_id").values_list("vote_id", flat=True))
+
+    def close(self):
+        Election.objects.filter(pk=self.election.pk).update(end_date=timezone.now() - timedelta(minutes=1))
+        return archive.archive_election(self.election.election_id)
+
+    def test_merkle_root_matches_the_tree_definition(self):
+        for n in (1, 2, 3, 5, 8):
+            rows = [_journal_vote(i) for i in range(1, n + 1)]
+            seal = archive.Seal()
+            for row in rows:
+                seal.add(row)
+            self.assertEqual(seal.merkle_root, _merkle_root([journal.pack_vote(r) for r in rows]).hex(), n)
+
+    def test_open_election_is_not_archived(self):
+        with self.assertRaises(archive.ArchiveError):
+            archive.archive_election(self.election.election_id)
+
+    def test_votes_move_under_a_matching_seal(self):
+        sealed = self.close()
+        self.assertFalse(Vote.objects.filter(election=self.election).exists())
+        self.assertEqual(
+            list(ArchivedVote.objects.filter(election_id=self.election.election_id).order_by("vote_id").values_list("vote_id", flat=True)),
+            self.hot_ids,
+        )
+        self.assertEqual((sealed.vote_count, sealed.first_vote_id, sealed.last_vote_id),
+                         (len(self.hot_ids), self.hot_ids[0], self.hot_ids[-1]))
+        self.assertEqual(sealed.tampered_votes, [])
+        self.assertEqual(election_tally_counts(self.election.election_id), self.tallies)
+        self.assertEqual(verification.verify_votes_for_election(self.election.election_id), [])
+
+    def test_edited_archived_vote_changes_the_root(self):
+        sealed = self.close()
+        ArchivedVote.objects.filter(pk=self.hot_ids[1]).update(candidate_id=self.site["candidate"].candidate_id + 1000)
+        seal, tampered = archive.seal_archived_votes(self.election.election_id)
+        self.assertNotEqual(seal.merkle_root, sealed.merkle_root)
+        self.assertEqual(tampered, [self.hot_ids[1]])
+
+    def test_archiving_again_only_finishes_the_purge(self):
+        sealed = self.close()
+        self.assertEqual(archive.archive_election(self.election.election_id).pk, sealed.pk)
+        self.assertEqual(ElectionArchive.objects.filter(election=self.election).count(), 1)
+
+# ---------------------- Turnout counters ----------------------
+
+class TurnoutTests(TestCase):
+    def setUp(self):
+        self.site = seed_site("turnout", **SMALL)
+        self.election = self.site["election"]
+
+    def counters(self):
+        turnout_row = ElectionTurnout.objects.get(election=self.election)
+        registration = ElectionVoter.objects.get(election=self.election, voter=self.site["voter"])
+        return turnout_row.voters_voted, turnout_row.votes_cast, registration.has_voted, registration.voted_positions
+
+    def cast(self, position):
+        candidate = Candidate.objects.filter(position=position, is_approved=True).first()
+        with transaction.atomic():
+            vote = Vote(voter=self.site["voter"], position=position, candidate=candidate)
+            vote.save()
+            turnout.record_votes([vote])
+
+    def test_first_vote_counts_the_voter_once(self):
+        voters, votes, _, _ = self.counters()
+        self.cast(self.site["position"])
+        self.cast(self.site["other_position"])
+        self.assertEqual(self.counters(), (voters + 1, votes + 2, True, 2))
+
+    def test_vote_page_moves_the_counters(self):
+        voters, votes, _, _ = self.counters()
+        session = self.client.session
+        session["voter_id"] = self.site["voter"].voter_id
+        session.save()
+        position, candidate = self.site["position"], self.site["candidate"]
+        self.client.get(reverse("vote_candidate", args=[position.election_id, position.position_id, candidate.candidate_id]))
+        self.assertEqual(self.counters(), (voters + 1, votes + 1, True, 1))
+
+    def test_reconcile_recounts_after_a_delete(self):
+        self.cast(self.site["position"])
+        voters, votes, _, _ = self.counters()
+        Vote.objects.filter(voter=self.site["voter"]).delete()  # counters stay high
+
+        result = turnout.reconcile(self.election.election_id)
+        self.assertEqual(result["stale_registrations"], 1)
+        self.assertTrue(result["turnout_changed"])
+        self.assertEqual(self.counters(), (voters - 1, votes - 1, False, 0))
+        self.assertFalse(turnout.reconcile(self.election.election_id)["turnout_changed"])
+
+# ---------------------- Photos ----------------------
+
+def _photo_bytes(size=(800, 600)):
+    """A JPEG carrying EXIF (orientation and a camera make) to be stripped."""
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotated 90°: derivatives come out portrait
+    exif[0x010F] = "Camera"
+    buf = io.BytesIO()
+    Image.new("RGB", size, "red").save(buf, "JPEG", exif=exif)
+    return buf.getvalue()
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        storage = override_settings(MEDIA_ROOT=media)
+        storage.enable()
+        self.addCleanup(storage.disable)
+        self.photo = _photo_bytes()
+
+    def voter(self, tag):
+        return Voter.objects.create(
+            name=tag, email=f"{tag}@example.com", password_hash="x",
+            voter_image=SimpleUploadedFile(f"{tag}.jpg", self.photo, content_type="image/jpeg"),
+        )
+
+    def process(self, voter):
+        return images.process_image(Voter, voter.pk, *signals.IMAGE_FIELDS[Voter])
+
+    def test_every_size_and_format_is_rendered_without_metadata(self):
+        digest = self.process(self.voter("photo"))
+        self.assertEqual(digest, hashlib.sha256(self.photo).hexdigest())
+        for size, px in images.SIZES.items():
+            for fmt in images.FORMATS:
+                with default_storage.open(images.derivative_name(digest, size, fmt)) as f:
+                    derivative = Image.open(f)
+                    derivative.load()
+                self.assertEqual(derivative.size, (px * 3 // 4, px))
+                self.assertEqual(dict(derivative.getexif()), {})
+
+    def test_identical_uploads_share_one_set_of_files(self):
+        self.process(self.voter("first"))
+        second = self.voter("second")
+        with mock.patch.object(default_storage, "save") as save:
+            self.assertEqual(self.process(second), hashlib.sha256(self.photo).hexdigest())
+        save.assert_not_called()
+
+    def test_processing_leaves_the_voters_row_alone(self):
+        voter = self.voter("watched")
+        before = list(Voter.objects.filter(pk=voter.pk).values())
+        digest = self.process(voter)
+
+        self.assertEqual(list(Voter.objects.filter(pk=voter.pk).values()), before)
+        self.assertEqual(VoterImage.objects.get(voter=voter).digest, digest)
+        # What the tamper detector would see: the same row, so no chunk to alert on
+        snapshot = lambda rows: {"voters": detector.serialize_snapshot(rows)}
+        self.assertEqual(detector.chunk_digests(snapshot(list(Voter.objects.filter(pk=voter.pk).values()))),
+                         detector.chunk_digests(snapshot(before)))
+
+    def test_derivative_is_served_as_immutable(self):
+        digest = self.process(self.voter("served"))
+        name = images.derivative_name(digest, "thumb", "webp")[len(images.DERIVATIVE_DIR) + 1:]
+        response = self.client.get(reverse("image_derivative", args=[name]))
+        self.assertEqual(response["Content-Type"], "image/webp")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(self.client.get(reverse("image_derivative", args=["ab/" + "a" * 64 + "-v1-96.webp"])).status_code, 404)
+
+# ---------------------- Background monitors ----------------------
+
+class MonitorStartupTests(SimpleTestCase):
+    def starts(self, argv, **environ):
+        return monitors.start_in_web_process(argv, environ)
+
+    def test_gunicorn_workers_need_the_opt_in(self):
+        argv = ["/venv/bin/gunicorn", "Online_Voting_System.wsgi", "--workers", "4"]
+        self.assertFalse(self.starts(argv))
+        self.assertTrue(self.starts(argv, VOTING_MONITORS_IN_WORKERS="1"))
+        self.assertFalse(self.starts(["uwsgi", "--ini", "site.ini"]))
+
+    def test_runserver_starts_them_in_the_serving_process_only(self):
+        argv = ["manage.py", "runserver"]
+        self.assertFalse(self.starts(argv), "autoreloader parent")
+        self.assertTrue(self.starts(argv, RUN_MAIN="true"))
+        self.assertTrue(self.starts(argv + ["--noreload"]))
+        self.assertFalse(self.starts(argv, RUN_MAIN="true", VOTING_MONITORS_IN_WORKERS="0"))
+
+    def test_other_commands_never_start_them(self):
+        self.assertFalse(self.starts(["manage.py", "migrate"], VOTING_MONITORS_IN_WORKERS="1"))
+        self.assertFalse(self.starts(["manage.py", "test"], RUN_MAIN="true"))
+
+# ---------------------- Election status ----------------------
+
+class StatusSchedulerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+        hour = timedelta(hours=1)
+        self.upcoming = self.election("upcoming", self.now + hour, self.now + 2 * hour, status="running")
+        self.running = self.election("running", self.now - hour, self.now + timedelta(minutes=10), status="upcoming")
+        self.closed = self.election("closed", self.now - 2 * hour, self.now - hour, status="running")
+
+    def election(self, name, start, end, status):
+        return Election.objects.create(
+            election_name=name, start_date=start, end_date=end, candidate_deadline=start, status=status,
+        )
+
+    def test_transitions_move_only_stale_rows_and_bump_versions(self):
+        list_version = get_elections_list_version()
+        running_version = get_election_version(self.running.pk)
+
+        changed = scheduler.apply_status_transitions(self.now)
+        self.assertEqual(changed, {"upcoming": [self.upcoming.pk], "running": [self.running.pk], "closed": [self.closed.pk]})
+        self.assertEqual(
+            dict(Election.objects.values_list("election_name", "status")),
+            {"upcoming": "upcoming", "running": "running", "closed": "closed"},
+        )
+        self.assertGreater(get_elections_list_version(), list_version)
+        self.assertGreater(get_election_version(self.running.pk), running_version)
+
+        with self.assertNumQueries(3):
+            self.assertEqual(scheduler.apply_status_transitions(self.now), {})
+
+    def test_sleeps_until_the_next_boundary(self):
+        self.assertEqual(scheduler.next_boundary(self.now), self.running.end_date)
+        self.assertAlmostEqual(
+            scheduler.seconds_until_next_boundary(self.now),
+            (self.running.end_date - self.now + scheduler.BOUNDARY_MARGIN).total_seconds(),
+        )
+        Election.objects.all().delete()
+        self.assertIsNone(scheduler.next_boundary(self.now))
+        self.assertEqual(scheduler.seconds_until_next_boundary(self.now), scheduler.MAX_SLEEP_SECONDS)
+
+    def test_wake_interrupts_the_sleep(self):
+        stop = threading.Event()
+        with mock.patch.object(scheduler, "apply_status_transitions") as apply, \
+                mock.patch.object(scheduler, "seconds_until_next_boundary", return_value=3600):
+            thread = threading.Thread(target=scheduler.run_status_scheduler, args=(stop,), daemon=True)
+            thread.start()
+            for _ in range(100):
+                if apply.call_count:
+                    break
+                time.sleep(0.01)
+            stop.set()
+            scheduler.wake_scheduler()
+            thread.join(timeout=5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(apply.call_count, 1)
+
+# ---------------------- Synthetic elections ----------------------
+
+@override_settings(VOTE_JOURNAL_ENABLED=False, DATABASE_REPLICA_ALIAS="default")
+class GenerateElectionTests(TestCase):
+    databases = {"default"}
+
+    def generate(self, *args):
+        out = io.StringIO()
+        call_command(
+            "generate_election", "--voters", "30", "--positions", "2", "--candidates", "3", "--turnout", "0.5",
+            "--json", *args, stdout=out,
+        )
+        return json.loads(out.getvalue())
+
+    def test_votes_are_chained_in_time_order_within_the_window(self):
+        summary = self.generate("--distribution", "rush", "--chunk-size", "7", "--hours", "2")
+        election = Election.objects.get(pk=summary["election_id"])
+        votes = list(Vote.objects.filter(election=election).order_by("vote_id"))
+
+        self.assertEqual(summary["votes"], len(votes))
+        self.assertEqual(len(votes), 2 * len({v.voter_id for v in votes}))
+        timestamps = [v.timestamp for v in votes]
+        self.assertEqual(timestamps, sorted(timestamps))
+        self.assertTrue(all(election.start_date <= t <= election.end_date for t in timestamps))
+        self.assertEqual(verification.verify_votes_for_election(election.pk), [])
+        self.assertEqual(ElectionTurnout.objects.get(election=election).votes_cast, len(votes))
+
+    def test_same_seed_same_election(self):
+        runs = []
+        for _ in range(2):
+            # Same seed, same emails: roll the first run back before the second
+            with transaction.atomic():
+                summary = self.generate("--seed", "7", "--start", "2026-01-01T08:00:00+00:00")
+                runs.append(sorted(
+                    (position.split()[-1], candidate.rsplit("-", 1)[1], ts)
+                    for position, candidate, ts in Vote.objects.filter(election_id=summary["election_id"]).values_list(
+                        "position__position_name", "candidate__candidate_name", "timestamp",
+                    )
+                ))
+                transaction.set_rollback(True)
+        self.assertTrue(runs[0])
+        self.assertEqual(runs[0], runs[1])
+
+    def test_bad_turnout_is_rejected(self):
+        with self.assertRaises(CommandError):
+            self.generate("--turnout", "1.5")
+
+# ---------------------- Integrity benchmark ----------------------
+
+class IntegrityBenchmarkTests(SimpleTestCase):
+    def test_synthetic_inputs_exercise_the_real_checks(self):
+        rows = integrity_benchmark.synthetic_chain(50)
+        self.assertEqual(verification.verify_chain(rows, integrity_benchmark.SYNTHETIC_ELECTION), [])
+        rows[20] = rows[20]._replace(candidate_id=rows[20].candidate_id + 1)
+        self.assertEqual(verification.verify_chain(rows, integrity_benchmark.SYNTHETIC_ELECTION), [21])
+
+        snapshot = integrity_benchmark.synthetic_snapshot(10)
+        self.assertEqual(len(snapshot["voters"]), 2)
+        diff = detector.diff_snapshots(snapshot, integrity_benchmark.tampered_copy(snapshot))
+        self.assertEqual(len([line for line in diff.splitlines() if line.startswith("+ ")]), 1)
+
+    def test_compare_flags_growth_beyond_the_threshold(self):
+        def run(seconds, peak):
+            return {"results": [{"workload": "chain_verify", "size": 10, "seconds": seconds, "peak_bytes": peak}]}
+
+        baseline = run(1.0, 1000)
+        self.assertEqual(integrity_benchmark.compare(run(1.15, 1100), baseline, 0.2), [])
+        regressions = integrity_benchmark.compare(run(1.5, 1100), baseline, 0.2)
+        self.assertEqual([(r["metric"], round(r["change"], 2)) for r in regressions], [("seconds", 0.5)])
+
+    def test_command_writes_results_and_fails_on_regression(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        output = os.path.join(tmp.name, "run.json")
+        args = ["benchmark_integrity", "--sizes", "20", "--repeat", "1"]
+        call_command(*args, "--output", output, stdout=io.StringIO())
+        with open(output) as f:
+            results = json.load(f)
+        self.assertEqual([r["workload"] for r in results["results"]], list(integrity_benchmark.WORKLOADS))
+
+        # A baseline nothing can beat: every metric has regressed
+        for r in results["results"]:
+            r["seconds"], r["peak_bytes"] = 1e-12, 1
+        baseline = os.path.join(tmp.name, "baseline.json")
+        with open(baseline, "w") as f:
+            json.dump(results, f)
+        with self.assertRaisesMessage(CommandError, "8 regression(s)"):
+            call_command(*args, "--compare", baseline, stdout=io.StringIO())
+
+# ---------------------- Read replica ----------------------
+
+@override_settings(DATABASE_REPLICA_ALIAS="reporting", DATABASE_REPLICA_PIN_SECONDS=15)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.router = db_router.ReplicaRouter()
+
+    def configured(self):
+        return mock.patch.dict(settings.DATABASES, {"reporting": {}})
+
+    def request(self):
+        return SimpleNamespace(session=SignedCookieSession())
+
+    def reader(self, kind):
+        def read(request):
+            return self.router.db_for_read(Vote)
+
+        async def aread(request):
+            return self.router.db_for_read(Vote)
+
+        request = self.request()
+        if kind == "async":
+            wrapped = db_router.replica_view(aread)
+            return lambda: async_to_sync(wrapped)(request), request
+        wrapped = db_router.replica_view(read)
+        return lambda: wrapped(request), request
+
+    def test_only_replica_blocks_read_from_the_replica(self):
+        with self.configured():
+            self.assertEqual(self.router.db_for_read(Vote), "default")
+            with db_router.replica_reads():
+                self.assertEqual(self.router.db_for_read(Vote), "reporting")
+                self.assertEqual(self.router.db_for_write(Vote), "default")
+                with db_router.primary_reads():
+                    self.assertEqual(self.router.db_for_read(Vote), "default")
+                self.assertEqual(db_router.read_alias(), "reporting")
+            self.assertFalse(self.router.allow_migrate("reporting", "voting_site"))
+            self.assertTrue(self.router.allow_migrate("default", "voting_site"))
+
+    def test_without_a_replica_everything_stays_on_the_primary(self):
+        with db_router.replica_reads():
+            self.assertEqual(self.router.db_for_read(Vote), "default")
+            self.assertEqual(db_router.replica_or_primary(), "default")
+
+    def test_views_read_their_own_writes_while_pinned(self):
+        with self.configured():
+            for kind in ("sync", "async"):
+                call, request = self.reader(kind)
+                self.assertEqual(call(), "reporting", kind)
+                db_router.pin_to_primary(request)
+                self.assertEqual(call(), "default", kind)
+                request.session[db_router.PIN_SESSION_KEY] = time.time() - 1
+                self.assertEqual(call(), "reporting", kind)
+
+# ---------------------- Vote election backfill ----------------------
+
+class VoteElectionBackfillTests(TransactionTestCase):
+    """Migration 0014 against rows written before it: migrate back, insert, migrate forward."""
+    databases = {"default"}
+    before = [("voting_site", "0013_election_archive")]
+    after = [("voting_site", "0014_vote_election")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connections["default"])
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connections["default"]).loader.graph.leaf_nodes("voting_site"))
+
+    def test_backfill_copies_the_position_election_in_chunks(self):
+        apps = self.migrate(self.before)
+        Voter, Election, Position, Candidate, Vote = (
+            apps.get_model("voting_site", name) for name in ("Voter", "Election", "Position", "Candidate", "Vote")
+        )
+        now = timezone.now()
+        positions = []
+        for i in range(2):
+            election = Election.objects.create(
+                election_name=f"backfill {i}", start_date=now, end_date=now, candidate_deadline=now,
+            )
+            positions.append(Position.objects.create(election=election, position_name="chair"))
+        voters = [Voter.objects.create(name=f"v{i}", email=f"backfill-{i}@example.com", password_hash="x") for i in range(5)]
+        for i, voter in enumerate(voters):
+            position = positions[i % 2]
+            candidate = Candidate.objects.create(position=position, candidate_name=f"c{i}")
+            Vote.objects.create(voter=voter, position=position, candidate=candidate, vote_hash=f"h{i}")
+
+        migration = importlib.import_module("voting_site.migrations.0014_vote_election")
+        with mock.patch.object(migration, "BACKFILL_CHUNK", 2), CaptureQueriesContext(connections["default"]) as queries:
+            apps = self.migrate(self.after)
+        updates = [q["sql"] for q in queries if q["sql"].startswith('UPDATE "votes"')]
+        self.assertEqual(len(updates), 3, "5 votes in ranges of 2")
+        Vote = apps.get_model("voting_site", "Vote")
+        self.assertEqual(
+            sorted(Vote.objects.values_list("vote_id", "election_id")),
+            sorted(Vote.objects.values_list("vote_id", "position__election_id")),
+        )
+        self.assertEqual(Vote.objects.filter(election__isnull=True).count(), 0)
+
+# ---------------------- Candidate applications ----------------------
+
+@override_settings(DATABASE_REPLICA_ALIAS="default")
+class CandidacyTests(TestCase):
+    databases = {"default"}
+
+    def setUp(self):
+        cache.clear()
+        self.site = seed_site("candidacy", **SMALL)
+        self.voter = self.site["voter"]
+        session = self.client.session
+        session["voter_id"] = self.voter.voter_id
+        session.save()
+
+    def apply(self, position):
+        url = reverse("apply_for_position", args=[self.site["election"].pk, position.pk])
+        return list(get_messages(self.client.post(url).wsgi_request))[-1].message
+
+    def test_application_is_linked_to_the_voter_once(self):
+        position = self.site["other_position"]
+        # Someone else already standing under the same name does not block it
+        Candidate.objects.create(position=position, candidate_name=self.voter.name)
+        self.assertIn("successfully applied", self.apply(position))
+        self.assertEqual(self.apply(position), "You have already applied for this position.")
+        self.assertEqual(Candidate.objects.filter(position=position, voter=self.voter).count(), 1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Candidate.objects.create(position=position, voter=self.voter, candidate_name="again")
+
+        response = self.client.get(reverse("registered_election_detail", args=[self.site["election"].pk]))
+        self.assertEqual(response.context["voter_candidate_positions"], {position.pk})
+
+    def test_migration_links_unambiguous_names_only(self):
+        migration = importlib.import_module("voting_site.migrations.0016_candidate_voter")
+        election, position = self.site["election"], self.site["other_position"]
+        twin = Voter.objects.create(name="twin", email="twin-1@example.com", password_hash="x")
+        other_twin = Voter.objects.create(name="twin", email="twin-2@example.com", password_hash="x")
+        ElectionVoter.objects.bulk_create([ElectionVoter(voter=v, election=election) for v in (twin, other_twin)])
+        linked = Candidate.objects.create(position=position, candidate_name=self.voter.name)
+        duplicate = Candidate.objects.create(position=position, candidate_name=self.voter.name)
+        ambiguous = Candidate.objects.create(position=position, candidate_name="twin")
+        entered = Candidate.objects.create(position=position, candidate_name="Nobody Registered")
+
+        migration.backfill_candidate_voter(django_apps, None)
+        self.assertEqual(
+            dict(Candidate.objects.filter(pk__in=[linked.pk, duplicate.pk, ambiguous.pk, entered.pk]).values_list("pk", "voter_id")),
+            {linked.pk: self.voter.pk, duplicate.pk: None, ambiguous.pk: None, entered.pk: None},
+        )
@@ -0,0 +1,148 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+
+# Login throttling, checked before any password hashing so a credential-
+# stuffing burst cannot keep every worker busy in PBKDF2.
+#
+# Two token buckets per attempt: one per client IP and one per email. Each
+# attempt takes a token from both; a successful login gives the email token
+# back. Buckets live in process memory by default; set
+# LOGIN_THROTTLE_CACHE = '<cache alias>' to share them between workers
+# through a Django cache (best effort: read-modify-write, not atomic).
+
+# ---------------------- Configuration ----------------------
+
+DEFAULT_RATES = {
+    'ip': (30, 60),      # burst of 30, refilled over 60 seconds
+    'email': (5, 300),   # burst of 5, refilled over 5 minutes
+}
+MAX_LOCAL_KEYS = 100000
+
+def rates():
+    return dict(DEFAULT_RATES, **getattr(settings, 'LOGIN_THROTTLE_RATES', {}))
+
+def cache_alias():
+    return getattr(settings, 'LOGIN_THROTTLE_CACHE', None)
+
+def trusted_proxies():
+    """Reverse proxies in front of the site that append to X-Forwarded-For (0: trust none)."""
+    if not getattr(settings, 'LOGIN_THROTTLE_TRUST_X_FORWARDED_FOR', False):
+        return 0
+    return getattr(settings, 'LOGIN_THROTTLE_TRUSTED_PROXIES', 1)
+
+# ---------------------- Buckets ----------------------
+
+def _refill(state, capacity, period, now):
+    tokens, updated = state
+    return min(capacity, tokens + (now - updated) * capacity / period)
+
+
+class LocalBuckets:
+    """Per-process token buckets, least recently used evicted past MAX_LOCAL_KEYS."""
+
+    def __init__(self, max_keys=MAX_LOCAL_KEYS):
+        self.max_keys = max_keys
+        self._state = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, period, n=1.0, now=None):
+        """Take n tokens if available. Returns seconds to wait (0 when allowed)."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens = _refill(self._state.get(key, (capacity, now)), capacity, period, now)
+            if tokens >= n:
+                self._state[key] = (tokens - n, now)
+                wait = 0
+            else:
+                self._state[key] = (tokens, now)
+                wait = (n - tokens) * period / capacity
+            self._state.move_to_end(key)
+            while len(self._state) > self.max_keys:
+                self._state.popitem(last=False)
+            return wait
+
+    def give(self, key, capacity, period, n=1.0, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if key in self._state:
+                tokens = _refill(self._state[key], capacity, period, now)
+                self._state[key] = (min(capacity, tokens + n), now)
+
+
+class CacheBuckets:
+    """Token buckets kept in a shared Django cache, so all workers see one count."""
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def take(self, key, capacity, period, n=1.0, now=None):
+        now = time.time() if now is None else now
+        cache_key = f"login-throttle:{key}"
+        tokens = _refill(self.cache.get(cache_key, (capacity, now)), capacity, period, now)
+        wait = 0 if tokens >= n else (n - tokens) * period / capacity
+        if not wait:
+            tokens -= n
+        self.cache.set(cache_key, (tokens, now), period)
+        return wait
+
+    def give(self, key, capacity, period, n=1.0, now=None):
+        now = time.time() if now is None else now
+        cache_key = f"login-throttle:{key}"
+        state = self.cache.get(cache_key)
+        if state is not None:
+            self.cache.set(cache_key, (min(capacity, _refill(state, capacity, period, now) + n), now), period)
+
+
+_buckets = None
+_buckets_lock = threading.Lock()
+
+def get_buckets():
+    global _buckets
+    with _buckets_lock:
+        if _buckets is None:
+            alias = cache_alias()
+            _buckets = CacheBuckets(alias) if alias else LocalBuckets()
+        return _buckets
+
+# ---------------------- Login API ----------------------
+
+def client_ip(request):
+    # Clients can send any X-Forwarded-For they like; only the entries our own
+    # proxies appended, counted from the right, can be trusted.
+    proxies = trusted_proxies()
+    if proxies:
+        forwarded = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def take_login_attempt(ip, email):
+    """
+    Charge one attempt to the IP and the email. Returns seconds to wait, or
+    0 if the attempt may go ahead. A rejected IP does not charge the email.
+    """
+    buckets, limits = get_buckets(), rates()
+    wait = buckets.take(f"ip:{ip}", *limits['ip'])
+    if wait:
+        return wait
+    return buckets.take(f"email:{email.strip().lower()}", *limits['email'])
+
+
+def login_succeeded(email):
+    """A correct password returns the email's token."""
+    get_buckets().give(f"email:{email.strip().lower()}", *rates()['email'])
+
+
+_dummy_hash = None
+
+def dummy_password_hash():
+    """A real hash to check unknown emails against, so they take as long as known ones."""
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = make_password('not-a-real-password')
+    return _dummy_hash
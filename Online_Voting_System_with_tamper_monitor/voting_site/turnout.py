@@ -0,0 +1,110 @@
+from collections import Counter, defaultdict
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from .models import ArchivedVote, ElectionArchive, ElectionTurnout, ElectionVoter, Vote
+
+# Turnout counters, kept in step with `votes` by the transaction that inserts
+# them (vote_candidate, the queued chain writer, generate_election):
+#
+#   ElectionVoter.voted_positions   votes cast under this registration
+#   ElectionVoter.has_voted         set on the registration's first vote
+#   ElectionTurnout                 per election: voters_voted, votes_cast
+#
+# so "has this voter voted" and "how many have voted" are single-row reads
+# instead of scans of `votes`. Every change is an UPDATE ... SET n = n + k,
+# so concurrent vote transactions add up rather than overwrite each other.
+# Both record_votes() and reconcile() lock the election's turnout row before
+# any registration row, so the two cannot deadlock on each other.
+#
+# Votes removed other than by archiving (deleting a position, edits made in
+# the database) leave the counters high until reconcile() recounts them;
+# `manage.py reconcile_turnout` does that for every election.
+
+
+def record_votes(votes):
+    """
+    Count newly inserted votes (Vote instances) in the turnout counters.
+    Call inside the transaction that inserted them.
+    """
+    per_election = defaultdict(Counter)  # election_id -> {voter_id: new votes}
+    for vote in votes:
+        per_election[vote.election_id][vote.voter_id] += 1
+    for election_id, per_voter in per_election.items():
+        _add_votes(election_id, per_voter)
+
+
+def _add_votes(election_id, per_voter):
+    turnout = ElectionTurnout.objects.filter(election_id=election_id)
+    votes_cast = sum(per_voter.values())
+    if not turnout.update(votes_cast=F('votes_cast') + votes_cast):
+        _create_turnout(election_id, votes_cast)
+
+    voters_by_count = defaultdict(list)  # new votes -> [voter_id]
+    for voter_id, count in per_voter.items():
+        voters_by_count[count].append(voter_id)
+
+    registrations = ElectionVoter.objects.filter(election_id=election_id)
+    first_votes = 0
+    for count, voter_ids in voters_by_count.items():
+        # Only one transaction can flip has_voted, so each voter is counted once
+        first_votes += registrations.filter(voter_id__in=voter_ids, has_voted=False).update(has_voted=True)
+        registrations.filter(voter_id__in=voter_ids).update(voted_positions=F('voted_positions') + count)
+    if first_votes:
+        turnout.update(voters_voted=F('voters_voted') + first_votes)
+
+
+def _create_turnout(election_id, votes_cast):
+    try:
+        with transaction.atomic():
+            ElectionTurnout.objects.create(election_id=election_id, votes_cast=votes_cast)
+    except IntegrityError:
+        # Another transaction created it first
+        ElectionTurnout.objects.filter(election_id=election_id).update(votes_cast=F('votes_cast') + votes_cast)
+
+
+def _votes_of(election_id):
+    if ElectionArchive.objects.filter(election_id=election_id).exists():
+        return ArchivedVote.objects.filter(election_id=election_id)
+    return Vote.objects.filter(election_id=election_id)
+
+
+def reconcile(election_id):
+    """
+    Recount one election's counters from its votes (the archived copies once
+    the election is archived). Returns a dict with the corrected counts and
+    how many registrations were off.
+    """
+    with transaction.atomic():
+        locked = ElectionTurnout.objects.select_for_update().filter(election_id=election_id)
+        turnout = locked.first()
+        if turnout is None:
+            _create_turnout(election_id, 0)
+            turnout = locked.get()
+
+        votes = _votes_of(election_id)
+        voter_votes = votes.filter(voter_id=OuterRef('voter_id'))
+        counted = Coalesce(Subquery(voter_votes.order_by().values('voter_id').annotate(n=Count('*')).values('n')), 0)
+        registrations = ElectionVoter.objects.filter(election_id=election_id)
+
+        stale = (
+            registrations.annotate(counted=counted, voted=Exists(voter_votes))
+            .exclude(voted_positions=F('counted'), has_voted=F('voted'))
+            .count()
+        )
+        if stale:
+            registrations.update(voted_positions=counted, has_voted=Exists(voter_votes))
+
+        before = (turnout.voters_voted, turnout.votes_cast)
+        turnout.voters_voted = registrations.filter(has_voted=True).count()
+        turnout.votes_cast = votes.count()
+        if (turnout.voters_voted, turnout.votes_cast) != before:
+            turnout.save(update_fields=['voters_voted', 'votes_cast'])
+
+    return {
+        "election_id": election_id,
+        "voters_voted": turnout.voters_voted,
+        "votes_cast": turnout.votes_cast,
+        "stale_registrations": stale,
+        "turnout_changed": (turnout.voters_voted, turnout.votes_cast) != before,
+    }
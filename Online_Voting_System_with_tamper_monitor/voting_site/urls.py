@@ -1,5 +1,5 @@
-from django.urls import path
-from . import views
+from django.urls import path, re_path
+from . import views, api
 
 urlpatterns = [
     path('', views.home, name="home"),
@@ -11,6 +11,8 @@ urlpatterns = [
     path("dashboard/election/<int:election_id>/apply/<int:position_id>/", views.apply_for_position, name="apply_for_position"),
     path("election/<int:election_id>/vote/", views.vote_page, name="vote_page"),
     path("election/<int:election_id>/position/<int:position_id>/candidate/<int:candidate_id>/vote/", views.vote_candidate, name="vote_candidate"),
+    path("vote/receipt/<int:receipt_id>/", views.vote_receipt, name="vote_receipt"),
+    re_path(r"^img/(?P<name>[0-9a-f]{2}/[0-9a-f]{64}-v\d+-\d+\.(?:webp|jpg))$", views.image_derivative, name="image_derivative"),
     path("logout/", views.logout_view, name="logout"),
 
     # Admin URLs
@@ -24,5 +26,11 @@ urlpatterns = [
     path('election_admin/dashboard/delete/<int:position_id>/', views.delete_position, name='delete_position'),
     path('election_admin/dashboard/approve_candidate/<int:candidate_id>/', views.approve_candidate, name='approve_candidate'),
     path('election_admin/dashboard/manage/<int:election_id>/verify_votes/', views.admin_verify_votes, name='admin_verify_votes'),
+    path('election_admin/dashboard/manage/<int:election_id>/export/<str:dataset>/', views.admin_export_election, name='admin_export_election'),
+
+    # Read-only JSON API
+    path("api/elections/", api.elections_list, name="api_elections"),
+    path("api/elections/<int:election_id>/", api.election_detail, name="api_election_detail"),
+    path("api/elections/<int:election_id>/results/", api.election_results, name="api_election_results"),
 ]
 
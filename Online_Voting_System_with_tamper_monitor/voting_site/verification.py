@@ -0,0 +1,120 @@
+import heapq
+from collections import defaultdict
+from itertools import islice
+from .db_router import replica_reads
+from .hashing import CURRENT_VERSION, LEGACY_VERSION, hash_many, legacy_hash_with_skew
+from .models import Vote, ArchivedVote, ElectionArchive, LegacyHashSkew
+
+# Columns needed to recompute a vote's hash; fetched as named tuples so that
+# verification streams rows without building model instances or following
+# foreign keys.
+CHAIN_FIELDS = ('vote_id', 'voter_id', 'position_id', 'candidate_id', 'timestamp', 'vote_hash', 'previous_vote_hash', 'hash_version')
+BATCH_SIZE = 5000
+
+
+def legacy_links(election_id):
+    """
+    {vote_id: vote_hash of the legacy vote before it} for the election's
+    legacy (version 1) votes. They formed one chain across all elections,
+    live and archived, so the vote before may belong to another election.
+    """
+    streams = [
+        model.objects.filter(hash_version=LEGACY_VERSION).order_by('vote_id')
+        .values_list('vote_id', 'election_id', 'vote_hash').iterator(chunk_size=BATCH_SIZE)
+        for model in (Vote, ArchivedVote)
+    ]
+    links = {}
+    previous_id, previous_hash = None, ''
+    for vote_id, row_election_id, vote_hash in heapq.merge(*streams, key=lambda row: row[0]):
+        if vote_id == previous_id:
+            continue  # mid-archival, the row is in both tables
+        if row_election_id == election_id:
+            links[vote_id] = previous_hash
+        previous_id, previous_hash = vote_id, vote_hash or ''
+    return links
+
+
+def verify_chain(rows, election_id, batch_size=BATCH_SIZE, legacy=None):
+    """
+    Walk one election's rows (ordered by vote_id) and return the vote_ids
+    whose stored hash does not match the recomputed one.
+
+    Current-version rows are hashed against the previous row of the election,
+    so an edited, inserted or deleted row breaks the next one too. Legacy
+    rows belong to the old cross-election chain: given `legacy` (called on
+    the first legacy row, returning legacy_links) each must point at the
+    legacy vote before it, so deleting one breaks the next. One that follows
+    a current-version row, or an unknown version, is tampered by definition.
+    """
+    previous_hash = ''
+    seen_current = False
+    links = None
+    tampered_votes = []
+
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        by_version = defaultdict(list)  # version -> [(vote_id, stored hash, hash inputs)]
+        for row in batch:
+            version = row.hash_version
+            if version == CURRENT_VERSION:
+                seen_current = True
+                broken = False
+            elif version == LEGACY_VERSION and not seen_current:
+                if legacy is not None and links is None:
+                    links = legacy()
+                broken = links is not None and (row.previous_vote_hash or '') != links.get(row.vote_id, '')
+            else:
+                broken = True
+            if broken:
+                tampered_votes.append(row.vote_id)
+                previous_hash = row.vote_hash or ''
+                continue
+            prev = previous_hash if version == CURRENT_VERSION else row.previous_vote_hash
+            by_version[version].append(
+                (row.vote_id, row.vote_hash, (row.voter_id, election_id, row.position_id, row.candidate_id, row.timestamp, prev))
+            )
+            previous_hash = row.vote_hash or ''
+
+        for version, entries in by_version.items():
+            expected = hash_many([inputs for _, _, inputs in entries], version)
+            mismatched = [entry for entry, expected_hash in zip(entries, expected) if entry[1] != expected_hash]
+            if version == LEGACY_VERSION and mismatched:
+                mismatched = _without_known_skew(mismatched)
+            tampered_votes.extend(vote_id for vote_id, _, _ in mismatched)
+
+    tampered_votes.sort()
+    return tampered_votes
+
+
+def _without_known_skew(entries):
+    """Legacy entries whose hash does not match at the skew recorded for them either."""
+    skews = dict(
+        LegacyHashSkew.objects.filter(vote_id__in=[vote_id for vote_id, _, _ in entries]).values_list('vote_id', 'micros')
+    )
+    return [
+        (vote_id, stored, inputs) for vote_id, stored, inputs in entries
+        if vote_id not in skews
+        or legacy_hash_with_skew(inputs[0], inputs[2], inputs[3], inputs[4], inputs[5], skews[vote_id]) != stored
+    ]
+
+
+def election_chain_rows(election_id, chunk_size=5000):
+    if ElectionArchive.objects.filter(election_id=election_id).exists():
+        votes = ArchivedVote.objects.filter(election_id=election_id)
+    else:
+        votes = Vote.objects.filter(election_id=election_id)
+    return (
+        votes
+        .order_by('vote_id')
+        .values_list(*CHAIN_FIELDS, named=True)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def verify_votes_for_election(election_id):
+    """
+    Verify vote integrity for a specific election.
+    Returns a list of tampered vote IDs (empty list if all votes are intact)
+    """
+    with replica_reads():
+        return verify_chain(election_chain_rows(election_id), election_id, legacy=lambda: legacy_links(election_id))
@@ -0,0 +1,66 @@
+import time
+from django.core.cache import cache
+
+# Per-election version counters, kept in Django's cache so that conditional
+# GETs can be answered without touching the database.
+#
+#   'content' - election fields, positions, approved candidates
+#   'results' - vote tallies
+#
+# plus one counter for the alert recipients (voting_site.recipients), so a
+# process holding them in memory knows another process changed them.
+#
+# Counters are seeded from the clock (not 1) so a cache restart can never
+# hand out a version number a client has already seen.
+
+LIST_KEY = 'voting:elections:version'
+RECIPIENTS_KEY = 'voting:recipients:version'
+
+
+def _key(election_id, kind):
+    return f'voting:election:{election_id}:{kind}:version'
+
+
+def _seed():
+    return int(time.time() * 1000)
+
+
+def _get(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _seed(), None)
+        version = cache.get(key, _seed())
+    return version
+
+
+def _bump(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Key was evicted: reseed past anything handed out before.
+        cache.set(key, _seed(), None)
+        return cache.get(key)
+
+
+def get_election_version(election_id, kind='content'):
+    return _get(_key(election_id, kind))
+
+
+def bump_election_version(election_id, kind='content'):
+    return _bump(_key(election_id, kind))
+
+
+def get_elections_list_version():
+    return _get(LIST_KEY)
+
+
+def bump_elections_list_version():
+    return _bump(LIST_KEY)
+
+
+def get_recipients_version():
+    return _get(RECIPIENTS_KEY)
+
+
+def bump_recipients_version():
+    return _bump(RECIPIENTS_KEY)
@@ -1,12 +1,23 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.hashers import make_password, check_password
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.cache import cache_page
 from django.utils import timezone
 from .forms import RegistrationForm, LoginForm, PositionForm
-from .models import Voter, Election, ElectionVoter, Position, Candidate, Vote
-import hashlib
-
-# Landing page
+from .models import Voter, Election, ElectionVoter, Position, Candidate, Vote, VoteSubmission
+from . import exports, images, ingest, page_cache, throttle, turnout
+from .db_router import pin_to_primary, replica_view
+from .verification import verify_votes_for_election
+import math
+import uuid
+
+# Landing page (static)
+@cache_page(60 * 60)
 def home(request):
     return render(request, "voting_site/index.html")
 
@@ -27,53 +38,95 @@ def register(request):
 
 
 # Login
+LOGIN_FAILED = "Invalid email or password."
+
 def login_view(request):
     if request.method == "POST":
         form = LoginForm(request.POST)
         if form.is_valid():
             email = form.cleaned_data['email']
             password = form.cleaned_data['password']
-            try:
-                voter = Voter.objects.get(email=email)
-                if check_password(password, voter.password_hash):
-                    request.session['voter_id'] = voter.voter_id
-                    if voter.is_admin:
-                        messages.success(request, f"Welcome Admin {voter.name}!")
-                        return redirect("admin_dashboard")
-                    else:
-                        messages.success(request, f"Welcome {voter.name}!")
-                        return redirect("dashboard")
+
+            # Throttle before hashing anything
+            wait = throttle.take_login_attempt(throttle.client_ip(request), email)
+            if wait:
+                messages.error(request, f"Too many login attempts. Please try again in {math.ceil(wait)} seconds.")
+                response = render(request, "voting_site/login.html", {"form": form}, status=429)
+                response["Retry-After"] = str(math.ceil(wait))
+                return response
+
+            voter = Voter.objects.filter(email=email).first()
+            # Unknown emails are checked against a dummy hash: same time, same answer
+            if check_password(password, voter.password_hash if voter else throttle.dummy_password_hash()) and voter:
+                throttle.login_succeeded(email)
+                request.session['voter_id'] = voter.voter_id
+                if voter.is_admin:
+                    messages.success(request, f"Welcome Admin {voter.name}!")
+                    return redirect("admin_dashboard")
                 else:
-                    messages.error(request, "Invalid password")
-            except Voter.DoesNotExist:
-                messages.error(request, "Email not found")
+                    messages.success(request, f"Welcome {voter.name}!")
+                    return redirect("dashboard")
+            messages.error(request, LOGIN_FAILED)
     else:
         form = LoginForm()
     return render(request, "voting_site/login.html", {"form": form})
 
 
+# The read-heavy voter pages below are async views: under ASGI a request
+# waiting on the database does not hold a worker thread. Every queryset is
+# evaluated before render(), since templates cannot query from async code.
+# Elections, positions and candidates come from voting_site.page_cache; only
+# the voter's own state is queried per request.
+
+async def _election_ballot_or_404(election_id):
+    ballot = await page_cache.election_ballot(election_id)
+    if ballot is None:
+        raise Http404("Election not found")
+    return ballot
+
+
+async def _voted_position_ids(election_id, voter_id, voted_positions, positions):
+    """
+    Positions the voter has voted for. The registration's voted_positions
+    counter (None without a registration) answers "none" and "all of them"
+    without reading `votes`.
+    """
+    if voted_positions == 0:
+        return set()
+    if voted_positions == len(positions):
+        return {position.position_id for position in positions}
+    return {position_id async for position_id in Vote.objects.filter(
+        election_id=election_id, voter_id=voter_id,
+    ).values_list('position_id', flat=True)}
+
+
 # Dashboard (for normal voters)
-def dashboard(request):
-    voter_id = request.session.get("voter_id")
+@replica_view
+async def dashboard(request):
+    voter_id = await request.session.aget("voter_id")
     if not voter_id:
         return redirect("login")
 
     try:
-        voter = Voter.objects.get(voter_id=voter_id)
+        voter = await Voter.objects.aget(voter_id=voter_id)
     except Voter.DoesNotExist:
         messages.error(request, "Voter not found. Please login again.")
         return redirect("login")
 
+    elections = await page_cache.all_elections()
+    registrations = {
+        election_id: is_approved async for election_id, is_approved in
+        ElectionVoter.objects.filter(voter_id=voter_id).values_list("election_id", "is_approved")
+    }
+
     # Elections the voter is registered in (approved only)
-    registered_elections = Election.objects.filter(
-        voters__voter_id=voter_id,
-        voters__is_approved=True
-    ).distinct()
+    registered_elections = [e for e in elections if registrations.get(e.election_id)]
 
     # Filter upcoming elections for this voter
-    upcoming_elections = Election.objects.exclude(
-        voters__voter_id=voter_id
-    ).order_by("start_date")
+    upcoming_elections = sorted(
+        (e for e in elections if e.election_id not in registrations),
+        key=lambda e: e.start_date,
+    )
 
     # Annotate elections with current status
     for election in registered_elections:
@@ -99,53 +152,61 @@ def request_registration(request, election_id):
         messages.info(request, "You have already requested registration for this election.")
     else:
         ElectionVoter.objects.create(election=election, voter=voter, is_approved=False)
+        pin_to_primary(request)
         messages.success(request, f"Registration request sent for '{election.election_name}'. Wait for admin approval.")
 
     return redirect("dashboard")
 
 
 # Election detail page (info only, with link to vote page)
-def registered_election_detail(request, election_id):
-    voter_id = request.session.get("voter_id")
+@replica_view
+async def registered_election_detail(request, election_id):
+    voter_id = await request.session.aget("voter_id")
     if not voter_id:
         return redirect("login")
 
-    election = get_object_or_404(Election, pk=election_id)
+    election, positions, content_version = await _election_ballot_or_404(election_id)
 
-    if not ElectionVoter.objects.filter(election=election, voter_id=voter_id, is_approved=True).exists():
+    voted_positions = await ElectionVoter.objects.filter(
+        election_id=election_id, voter_id=voter_id, is_approved=True,
+    ).values_list('voted_positions', flat=True).afirst()
+    if voted_positions is None:
         messages.error(request, "You are not approved for this election.")
         return redirect("dashboard")
 
-    positions = Position.objects.filter(election=election).prefetch_related("candidates")
-    for position in positions:
-        position.approved_candidates = position.candidates.filter(is_approved=True)
-
-    now = timezone.now()
     voting_open = election.current_status() == 'running' and not election.is_paused
 
     # Track positions the voter has already applied for as candidate
-    voter_candidate_positions = Candidate.objects.filter(
-        position__election=election,
-        candidate_name=request.session.get('voter_name')  # or use voter_id
-    ).values_list('position_id', flat=True)
+    voter_candidate_positions = {position_id async for position_id in Candidate.objects.filter(
+        position__election_id=election_id,
+        voter_id=voter_id,
+    ).values_list('position_id', flat=True)}
+    already_voted_positions = await _voted_position_ids(election_id, voter_id, voted_positions, positions)
+    for position in positions:
+        # Part of the cached candidate list's key: it decides Vote vs Already Voted
+        position.voted = position.position_id in already_voted_positions
 
     return render(request, "voting_site/registered_election_detail.html", {
         "election": election,
         "positions": positions,
+        "content_version": content_version,
+        "fragment_timeout": page_cache.TIMEOUT,
         "voting_open": voting_open,
         "voter_candidate_positions": voter_candidate_positions,
+        "already_voted_positions": already_voted_positions,
         "current_status": election.current_status(),
     })
 
 
 
 # Voting page (separate)
-def vote_page(request, election_id):
-    voter_id = request.session.get("voter_id")
+@replica_view
+async def vote_page(request, election_id):
+    voter_id = await request.session.aget("voter_id")
     if not voter_id:
         return redirect("login")
 
-    election = get_object_or_404(Election, pk=election_id)
+    election, positions, _ = await _election_ballot_or_404(election_id)
 
     if election.is_paused:
         messages.error(request, "This election is currently paused by admin.")
@@ -158,58 +219,145 @@ def vote_page(request, election_id):
         messages.error(request, "Voting is not open for this election.")
         return redirect("registered_election_detail", election_id=election_id)
 
-    positions = Position.objects.filter(election=election)
-    for position in positions:
-        position.approved_candidates = position.candidates.filter(is_approved=True)
-
-    already_voted_positions = set(
-        Vote.objects.filter(voter_id=voter_id, candidate__position__election=election)
-        .values_list("candidate__position_id", flat=True)
-    )
+    voted_positions = await ElectionVoter.objects.filter(
+        election_id=election_id, voter_id=voter_id,
+    ).values_list('voted_positions', flat=True).afirst()
+    already_voted_positions = await _voted_position_ids(election_id, voter_id, voted_positions, positions)
 
     return render(request, "voting_site/vote.html", {
         "election": election,
         "positions": positions,
         "already_voted_positions": already_voted_positions,
+        # Fresh per page render; a double-click or retry re-sends the same one.
+        "request_token": uuid.uuid4().hex,
     })
 
 
+def _vote_request_token(request, position_id):
+    """
+    Client-supplied idempotency token (form field, query param or header),
+    scoped to the position so one ballot page token covers each position once.
+    """
+    token = (
+        request.POST.get("request_token")
+        or request.GET.get("request_token")
+        or request.headers.get("Idempotency-Key")
+        or ""
+    ).strip()[:48]
+    return f"{token}:{position_id}" if token else ""
+
+
+def _replay_submission(request, submission):
+    messages.add_message(request, submission.message_level, submission.message)
+    return redirect(submission.redirect_url)
+
+
 # Cast a vote
 def vote_candidate(request, election_id, position_id, candidate_id):
     voter_id = request.session.get("voter_id")
     if not voter_id:
         return redirect("login")
 
+    # Replayed request: answer exactly as the first time, without touching votes
+    token = _vote_request_token(request, position_id)
+    if token:
+        previous = VoteSubmission.objects.filter(voter_id=voter_id, token=token).first()
+        if previous:
+            return _replay_submission(request, previous)
+
     voter = get_object_or_404(Voter, pk=voter_id)  # Get Voter from session
     position = get_object_or_404(Position, pk=position_id)
     candidate = get_object_or_404(Candidate, pk=candidate_id, position=position)
+    vote_page_url = reverse("vote_page", kwargs={"election_id": election_id})
 
-    # Prevent multiple votes for the same position
-    if Vote.objects.filter(voter=voter, position=position).exists():
-        messages.error(request, "You have already voted for this position.")
-        return redirect("vote_page", election_id=election_id)
-
-    # Compute previous vote hash (latest vote in DB)
-    last_vote = Vote.objects.order_by('-vote_id').first()
-    previous_hash = last_vote.vote_hash if last_vote else ''
-
-    # Compute hash for this vote
-    vote_data = f"{voter.voter_id}-{position.position_id}-{candidate.candidate_id}-{timezone.now().isoformat()}-{previous_hash}"
-    vote_hash = hashlib.sha256(vote_data.encode()).hexdigest()
-
-    # Save vote
-    Vote.objects.create(
-        voter=voter,
-        position=position,
-        candidate=candidate,
-        previous_vote_hash=previous_hash,
-        vote_hash=vote_hash
-    )
+    if ingest.ingest_mode() == 'queue':
+        return _queue_vote(request, voter, position, candidate, token, vote_page_url)
+
+    # Save vote; Vote.save chains it to the election's latest vote and hashes
+    # the timestamp it stores. The (voter, position) unique constraint is the
+    # duplicate check, and the turnout counters move in the same transaction.
+    try:
+        with transaction.atomic():
+            vote = Vote.objects.create(
+                voter=voter,
+                election_id=position.election_id,
+                position=position,
+                candidate=candidate,
+            )
+            turnout.record_votes([vote])
+            message = f"You voted for {candidate.candidate_name} in {position.position_name}."
+            if token:
+                VoteSubmission.objects.create(
+                    voter=voter, token=token, vote=vote, redirect_url=vote_page_url,
+                    message=message, message_level=messages.SUCCESS,
+                )
+    except IntegrityError:
+        # Lost a race with our own retry: replay whatever it stored.
+        if token:
+            previous = VoteSubmission.objects.filter(voter_id=voter_id, token=token).first()
+            if previous:
+                return _replay_submission(request, previous)
+        messages.info(request, "Your vote for this position has already been recorded.")
+        return redirect(vote_page_url)
+
+    pin_to_primary(request)
+    messages.success(request, message)
+    return redirect(vote_page_url)
+
+
+
+def _queue_vote(request, voter, position, candidate, token, vote_page_url):
+    """Queued ingestion: store the ballot locally and hand back a pending receipt."""
+    receipt_id, created = ingest.enqueue_ballot(voter.voter_id, position.position_id, candidate.candidate_id)
+    if created:
+        message = (
+            f"Your vote for {candidate.candidate_name} in {position.position_name} was received "
+            f"(receipt #{receipt_id}) and is being recorded."
+        )
+        level = messages.SUCCESS
+    else:
+        message = f"Your vote for this position was already received (receipt #{receipt_id})."
+        level = messages.INFO
+    if token:
+        VoteSubmission.objects.get_or_create(
+            voter=voter, token=token,
+            defaults={"redirect_url": vote_page_url, "message": message, "message_level": level},
+        )
+    pin_to_primary(request)
+    messages.add_message(request, level, message)
+    return redirect(vote_page_url)
+
+
+def vote_receipt(request, receipt_id):
+    """Status of a queued ballot, for the voter who cast it."""
+    voter_id = request.session.get("voter_id")
+    if not voter_id:
+        return redirect("login")
 
-    messages.success(request, f"You voted for {candidate.candidate_name} in {position.position_name}.")
-    return redirect("vote_page", election_id=election_id)
+    receipt = ingest.get_receipt(receipt_id)
+    if not receipt or receipt["voter_id"] != voter_id:
+        raise Http404("Receipt not found")
+    return JsonResponse({
+        "receipt_id": receipt["receipt_id"],
+        "position_id": receipt["position_id"],
+        "status": receipt["status"],
+        "vote_hash": receipt["vote_hash"],
+        "detail": receipt["detail"],
+    })
 
 
+# Resized photo (content-addressed, so cacheable forever)
+def image_derivative(request, name):
+    path = f"{images.DERIVATIVE_DIR}/{name}"
+    if not default_storage.exists(path):
+        raise Http404("Image not found")
+    response = FileResponse(
+        default_storage.open(path, "rb"),
+        content_type="image/webp" if name.endswith(".webp") else "image/jpeg",
+    )
+    response["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
 
 # Candidate application
 def apply_for_position(request, election_id, position_id):
@@ -231,16 +379,23 @@ def apply_for_position(request, election_id, position_id):
         return redirect("registered_election_detail", election_id=election_id)
 
     # Check if already applied
-    if Candidate.objects.filter(position=position, candidate_name=voter.name).exists():
+    if Candidate.objects.filter(position=position, voter=voter).exists():
         messages.info(request, "You have already applied for this position.")
         return redirect("registered_election_detail", election_id=election_id)
 
-    # Create candidate
-    Candidate.objects.create(
-        position=position,
-        candidate_name=voter.name,
-        party=""  # optional, leave empty
-    )
+    # Create candidate; the (position, voter) unique index catches a double submit
+    try:
+        with transaction.atomic():
+            Candidate.objects.create(
+                position=position,
+                voter=voter,
+                candidate_name=voter.name,
+                party=""  # optional, leave empty
+            )
+    except IntegrityError:
+        messages.info(request, "You have already applied for this position.")
+        return redirect("registered_election_detail", election_id=election_id)
+    pin_to_primary(request)
     messages.success(request, f"You have successfully applied for '{position.position_name}'. Awaiting approval.")
     return redirect("registered_election_detail", election_id=election_id)
 
@@ -256,6 +411,15 @@ def logout_view(request):
 
 # ---------------- Admin Section ---------------- #
 
+def _pending_for_election(election):
+    """Positions with `pending_candidates`, and pending registrations with their voters."""
+    positions = Position.objects.filter(election=election).prefetch_related(
+        Prefetch("candidates", queryset=Candidate.objects.filter(is_approved=False), to_attr="pending_candidates")
+    )
+    pending_voters = election.voters.filter(is_approved=False).select_related("voter")
+    return positions, pending_voters
+
+
 def admin_dashboard(request):
     voter_id = request.session.get("voter_id")
     if not voter_id:
@@ -265,9 +429,11 @@ def admin_dashboard(request):
     if not voter.is_admin:
         return redirect("dashboard")
 
-    elections = Election.objects.all()
-    for election in elections:
-        election.pending_voters = election.voters.filter(is_approved=False)
+    elections = Election.objects.select_related("turnout").prefetch_related(Prefetch(
+        "voters",
+        queryset=ElectionVoter.objects.filter(is_approved=False).select_related("voter"),
+        to_attr="pending_voters",
+    ))
 
     return render(request, "voting_site/admin_dashboard.html", {
         "voter": voter,
@@ -284,12 +450,8 @@ def manage_election(request, election_id):
     if not voter.is_admin:
         return redirect("dashboard")
 
-    election = get_object_or_404(Election, pk=election_id)
-    positions = Position.objects.filter(election=election)
-    for position in positions:
-        position.pending_candidates = position.candidates.filter(is_approved=False)
-
-    pending_voters = election.voters.filter(is_approved=False)
+    election = get_object_or_404(Election.objects.select_related("turnout"), pk=election_id)
+    positions, pending_voters = _pending_for_election(election)
 
     return render(request, "voting_site/manage_election.html", {
         "voter": voter,
@@ -323,7 +485,7 @@ def edit_position(request, position_id):
         if form.is_valid():
             form.save()
             messages.success(request, f"Position '{position.position_name}' updated successfully!")
-            return redirect("manage_election", election_id=position.election.election_id)
+            return redirect("manage_election", election_id=position.election_id)
     else:
         form = PositionForm(instance=position)
     return render(request, "voting_site/edit_position.html", {"form": form, "position": position})
@@ -331,15 +493,16 @@ def edit_position(request, position_id):
 
 def delete_position(request, position_id):
     position = get_object_or_404(Position, pk=position_id)
-    election_id = position.election.election_id
+    election_id = position.election_id
     position.delete()
+    turnout.reconcile(election_id)  # its votes went with it
     messages.success(request, f"Position '{position.position_name}' deleted successfully!")
     return redirect("manage_election", election_id=election_id)
 
 
 def approve_voter(request, election_voter_id):
     try:
-        ev = ElectionVoter.objects.get(pk=election_voter_id)
+        ev = ElectionVoter.objects.select_related("voter", "election").get(pk=election_voter_id)
         ev.is_approved = True
         ev.save()
         messages.success(request, f"Voter {ev.voter.name} approved for {ev.election.election_name}")
@@ -397,34 +560,13 @@ def approve_candidate(request, candidate_id):
     if not voter.is_admin:
         return redirect("dashboard")
     
-    candidate = get_object_or_404(Candidate, pk=candidate_id)
+    candidate = get_object_or_404(Candidate.objects.select_related("position"), pk=candidate_id)
     candidate.is_approved = True
     candidate.save()
     messages.success(request, f"{candidate.candidate_name} has been approved for '{candidate.position.position_name}'")
     return redirect("admin_dashboard")
 
 
-def verify_votes_for_election(election_id):
-    """
-    Verify vote integrity for a specific election.
-    Returns a list of tampered vote IDs (empty list if all votes are intact)
-    """
-    votes = Vote.objects.filter(position__election__election_id=election_id).order_by('vote_id')
-    previous_hash = ''
-    tampered_votes = []
-
-    for vote in votes:
-        vote_data = f"{vote.voter.voter_id}-{vote.position.position_id}-{vote.candidate.candidate_id}-{vote.timestamp.isoformat()}-{previous_hash}"
-        expected_hash = hashlib.sha256(vote_data.encode()).hexdigest()
-
-        if vote.vote_hash != expected_hash:
-            tampered_votes.append(vote.vote_id)
-        
-        previous_hash = vote.vote_hash
-
-    return tampered_votes
-
-
 def admin_verify_votes(request, election_id):
     """
     Admin checks vote integrity for a specific election
@@ -437,7 +579,7 @@ def admin_verify_votes(request, election_id):
     if not voter.is_admin:
         return redirect("dashboard")
 
-    election = get_object_or_404(Election, election_id=election_id)
+    election = get_object_or_404(Election.objects.select_related("turnout"), election_id=election_id)
 
     tampered_votes = verify_votes_for_election(election_id)
 
@@ -449,10 +591,7 @@ def admin_verify_votes(request, election_id):
         verification_ok = True
 
     # Fetch positions and pending voters to render manage_election template
-    positions = Position.objects.filter(election=election)
-    for position in positions:
-        position.pending_candidates = position.candidates.filter(is_approved=False)
-    pending_voters = election.voters.filter(is_approved=False)
+    positions, pending_voters = _pending_for_election(election)
 
     return render(request, "voting_site/manage_election.html", {
         "voter": voter,
@@ -463,3 +602,33 @@ def admin_verify_votes(request, election_id):
         "verification_ok": verification_ok,
     })
 
+
+
+def admin_export_election(request, election_id, dataset):
+    """
+    Stream an election's votes (with their hash chain), tallies or
+    registrations as CSV or JSON Lines; ?gzip=1 compresses on the fly.
+    """
+    voter_id = request.session.get("voter_id")
+    if not voter_id:
+        return redirect("login")
+
+    voter = get_object_or_404(Voter, voter_id=voter_id)
+    if not voter.is_admin:
+        return redirect("dashboard")
+
+    election = get_object_or_404(Election, election_id=election_id)
+    if dataset not in exports.DATASETS:
+        raise Http404("Unknown export")
+    fmt = request.GET.get("format", "csv")
+    if fmt not in exports.FORMATS:
+        fmt = "csv"
+    compress = request.GET.get("gzip") in ("1", "true", "yes")
+
+    response = StreamingHttpResponse(
+        exports.export_stream(election.election_id, dataset, fmt, compress),
+        content_type="application/gzip" if compress else exports.FORMATS[fmt],
+    )
+    filename = exports.export_filename(election.election_id, dataset, fmt, compress)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response